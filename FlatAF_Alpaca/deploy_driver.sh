@@ -44,6 +44,8 @@ rsync -av \
   --exclude='update_version.sh' \
   --exclude='.gitignore' \
   --exclude='.venv' \
+  --exclude='test' \
+  --exclude='discovery_cache.json' \
   "." "$STAGING_DIR/$PROJECT_ROOT/"
 
 # === Create ZIP ===
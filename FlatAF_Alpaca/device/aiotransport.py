@@ -0,0 +1,213 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# aiotransport.py - Non-blocking keep-alive HTTP transport to FlatAF panels
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 asyncio counterpart of transport.py for the ASGI mode
+#               (asgi_app.py). A request waiting on the panel costs a
+#               coroutine, not a thread. Speaks just enough HTTP/1.1 for the
+#               firmware, on asyncio streams, so no new package is needed. Same
+#               per-operation timeouts and pool size as transport.py. Counts
+#               the connections it opens, as transport.py does, for the
+#               metrics.
+#
+import asyncio
+import json
+import time
+from urllib.parse import urlencode, urlsplit
+from transport import OP_READ, OP_WRITE, timeout_for
+from config import Config
+import metrics
+
+class TransportError(Exception):
+    """The panel could not be reached or sent a malformed response"""
+    pass
+
+
+class AsyncResponse:
+    """The parts of a ``requests.Response`` the driver uses"""
+
+    def __init__(self, status_code: int, headers: dict, content: bytes):
+        self.status_code = status_code
+        self.headers = headers          # Lower-cased names
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+
+class AsyncDeviceTransport:
+    """Pooled, keep-alive asyncio HTTP client for a single FlatAF panel
+
+    One instance exists per panel base URL per event loop (see
+    :py:func:`get_async_transport`). At most ``pool_size`` requests are
+    on the wire at once; further callers wait their turn without a thread.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = None):
+        self.base_url = base_url.rstrip('/')
+        parts = urlsplit(self.base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.netloc = parts.netloc
+        self.path = parts.path
+        self.pool_size = pool_size or Config.pool_size
+        self._idle = []                 # (reader, writer) kept open by the panel
+        self.connections_opened = 0
+        self._slots = None              # Semaphore, created on first use in the loop
+
+    async def request(self, method: str, route: str, op: str = OP_READ,
+                      params: dict = None, json_body=None) -> AsyncResponse:
+        """Issue a request to ``{base_url}/{route}``
+
+        Args:
+            method: HTTP method
+            route: Firmware route relative to the panel base URL, e.g. 'state'
+            op: One of OP_STATUS, OP_READ, OP_WRITE; selects the timeout
+            params: Query string parameters
+            json_body: Object sent as a JSON body
+        """
+        target = f'{self.path}/{route}'
+        if params:
+            target += '?' + urlencode(params)
+        body = b'' if json_body is None else json.dumps(json_body).encode('utf-8')
+        head = f'{method} {target} HTTP/1.1\r\nHost: {self.netloc}\r\nContent-Length: {len(body)}\r\n'
+        if json_body is not None:
+            head += 'Content-Type: application/json\r\n'
+        message = (head + '\r\n').encode('latin-1') + body
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            start = time.perf_counter()
+            try:
+                response = await self._exchange_retrying(method, message, op)
+            except Exception:
+                metrics.device_failures.inc(route, method)
+                raise
+            metrics.device_seconds.observe(time.perf_counter() - start, route, method)
+            return response
+
+    async def _exchange_retrying(self, method: str, message: bytes, op: str) -> AsyncResponse:
+        conn = self._take_idle()
+        try:
+            return await self._exchange(conn, message, op)
+        except (OSError, asyncio.IncompleteReadError):
+            # A kept-alive connection the panel has since dropped; safe to
+            # repeat only for reads
+            if conn is None or method != 'GET':
+                raise
+        return await self._exchange(None, message, op)
+
+    async def get(self, route: str, op: str = OP_READ, **kwargs) -> AsyncResponse:
+        return await self.request('GET', route, op, **kwargs)
+
+    async def put(self, route: str, op: str = OP_WRITE, **kwargs) -> AsyncResponse:
+        return await self.request('PUT', route, op, **kwargs)
+
+    def _take_idle(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+        return None
+
+    async def _exchange(self, conn, message: bytes, op: str) -> AsyncResponse:
+        connect_timeout, read_timeout = timeout_for(op)
+        if conn is None:
+            try:
+                conn = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), connect_timeout)
+            except asyncio.TimeoutError:
+                raise TransportError(f'Connect to {self.netloc} timed out')
+            self.connections_opened += 1
+        reader, writer = conn
+        try:
+            writer.write(message)
+            response, keep_alive = await asyncio.wait_for(self._read_response(reader), read_timeout)
+        except asyncio.TimeoutError:
+            writer.close()
+            raise TransportError(f'No response from {self.netloc} within {read_timeout}s')
+        except BaseException:
+            writer.close()
+            raise
+        if keep_alive and len(self._idle) < self.pool_size:
+            self._idle.append(conn)
+        else:
+            writer.close()
+        return response
+
+    @staticmethod
+    async def _read_response(reader) -> tuple:
+        """Read one response; returns (AsyncResponse, connection reusable)"""
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            version, status = lines[0].split(' ', 2)[:2]
+            status_code = int(status)
+        except ValueError:
+            raise TransportError(f'Bad status line {lines[0]!r}')
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b''.join(chunks)
+        else:
+            content = await reader.read()          # Body runs to end of connection
+            keep_alive = False
+        return AsyncResponse(status_code, headers, content), keep_alive
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+# ------------------
+# Transport registry
+# ------------------
+# Connections belong to the event loop that opened them, and the registry is
+# only touched from that loop, so no lock is needed.
+_transports = {}
+
+def get_async_transport(base_url: str) -> AsyncDeviceTransport:
+    """Return the shared async transport for a panel, creating it on first use"""
+    key = (base_url.rstrip('/'), id(asyncio.get_running_loop()))
+    transport = _transports.get(key)
+    if transport is None:
+        transport = AsyncDeviceTransport(key[0])
+        _transports[key] = transport
+    return transport
+
+def close_all():
+    """Close every idle connection (e.g. at shutdown)"""
+    for transport in _transports.values():
+        transport.close()
+    _transports.clear()
+
+def connections_opened(base_url: str) -> int:
+    """TCP connections opened to a panel, over every event loop"""
+    key = base_url.rstrip('/')
+    return sum(t.connections_opened for (url, _), t in list(_transports.items()) if url == key)
@@ -64,26 +64,41 @@
 #               GitHub issue #12
 # 03-Jan-2025   rbd 1.1 Clarify devices vs device types at import site. Comment only,
 #               no logic changes.
+# 18-Oct-2026   dr 0.0.3 /management/v1/metrics route and request timing middleware.
+# 18-Oct-2026   dr 0.0.3 Startup timing (startup.py is imported first), logged when
+#               listening and at /management/v1/startup. Responder classes
+#               found from vars(module) instead of inspect.getmembers().
+# 18-Oct-2026   dr 0.0.3 Static files served by staticfiles.py (cached, ETag/304); the
+#               WSGI server hands file responses to sendfile().
+# 18-Oct-2026   dr 0.0.3 /management/v1/cache route (panel state cache counters).
+# 18-Oct-2026   dr 0.0.3 Worker pool reports wsgi.multithread and bounds the
+#               connections waiting for a worker.
 #
+import startup  # First, so that the rest of the imports are timed
 import sys
+import threading
 import traceback
-import inspect
-from wsgiref.simple_server import WSGIRequestHandler, make_server
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer, make_server
 from enum import IntEnum
-from pathlib import Path
 
 # -- isort wants the above line to be blank --
 # Controller classes (for routing)
 import discovery  # Logger injected into discovery.logger
 import exceptions
-from falcon import Request, Response, App, HTTPInternalServerError, HTTPNotFound # type: ignore
+from falcon import Request, Response, App, HTTPInternalServerError # type: ignore
 import management # type: ignore
 import setup
+import shadow
+import discovery_cache
+import circuitbreaker
+import metrics
 import log
 from config import Config
 from discovery import DiscoveryResponder
 from shr import set_shr_logger
-import mimetypes
+from staticfiles import StaticFileServer
 
 ##############################
 # FOR EACH ASCOM DEVICE TYPE #
@@ -94,6 +109,27 @@ import covercalibrator
 API_VERSION = 1
 #--------------
 
+class SendfileServerHandler(ServerHandler):
+    """wsgiref handler that sends ``wsgi.file_wrapper`` responses with sendfile()
+
+    Falcon wraps a response stream that is a real file (see
+    :py:class:`staticfiles.StaticFileServer`) in ``wsgi.file_wrapper``.
+    The stock handler then copies it through Python in 8 KB blocks; here
+    the socket sends it straight from the file.
+    """
+
+    def sendfile(self):
+        filelike = getattr(self.result, 'filelike', None)
+        try:
+            filelike.fileno()
+        except (AttributeError, OSError, ValueError):
+            return False                # Not a real file; wsgiref iterates it
+        if not self.headers_sent:
+            self.send_headers()
+        self._flush()
+        self.bytes_sent += self.request_handler.connection.sendfile(filelike)
+        return True
+
 class LoggingWSGIRequestHandler(WSGIRequestHandler):
     """Subclass of  WSGIRequestHandler allowing us to control WSGI server's logging"""
 
@@ -131,10 +167,71 @@ class LoggingWSGIRequestHandler(WSGIRequestHandler):
         #if args[1] != '200':  # Log this only on non-200 responses
         #    log.logger.info(f'{self.client_address[0]} <- {format%args}')
 
+    def handle(self):
+        """As ``WSGIRequestHandler.handle()``, with :py:class:`SendfileServerHandler`"""
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            return
+        if not self.parse_request():    # An error code has been sent, just exit
+            return
+        handler = SendfileServerHandler(self.rfile, self.wfile, self.get_stderr(), self.get_environ(),
+                                        multithread=getattr(self.server, 'multithread', False))
+        handler.request_handler = self  # Backpointer for logging and sendfile()
+        handler.run(self.server.get_app())
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """wsgiref server that handles each request on a fixed pool of worker threads
+
+    The stock simple_server answers one request at a time, so a slow panel
+    round trip for one Alpaca client stalls every other client. Here the
+    listening thread only accepts; requests run on up to ``workers`` threads.
+
+    At most ``queued`` accepted connections wait for a worker. Beyond that
+    the listening thread stops accepting, so an overload backs up into the
+    listen backlog and then the clients, instead of into memory here.
+
+    Args:
+        workers (int): Number of requests handled at the same time
+        queued (int): Accepted connections waiting for a worker (default ``workers``)
+    """
+
+    request_queue_size = 64     # Listen backlog for bursts of client connections
+    multithread = True          # wsgi.multithread for the app
+
+    def __init__(self, server_address, handler_class, workers: int = 8, queued: int = None):
+        WSGIServer.__init__(self, server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='WSGIWorker')
+        self._slots = threading.BoundedSemaphore(workers + (workers if queued is None else queued))
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()           # Waits while the pool and its queue are full
+        try:
+            self.pool.submit(self._process_request_worker, request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        WSGIServer.server_close(self)
+        self.pool.shutdown(wait=False)
+
 #-----------------------
 # Magic routing function
 # ----------------------
-def init_routes(app: App, devname: str, module):
+def init_routes(app: App, devname: str, module, wrap=None):
     """Initialize Falcon routing from URI to responser classses
 
     Inspects a module and finds all classes, assuming they are Falcon
@@ -143,7 +240,7 @@ def init_routes(app: App, devname: str, module):
     URI template from the responder class name.
 
     Note that it is sufficient to create the controller instance
-    directly from the type returned by inspect.getmembers() since
+    directly from the class found in the module's namespace since
     the instance is saved within Falcon as its resource controller.
     The responder methods are called with an additional 'devno'
     parameter, containing the device number from the URI. Reject
@@ -153,6 +250,8 @@ def init_routes(app: App, devname: str, module):
         app (App): The instance of the Falcon processor app
         devname (str): The name of the device (e.g. 'rotator")
         module (module): Module object containing responder classes
+        wrap (callable): Optional adapter applied to each responder instance
+            before it is routed (e.g. :py:func:`asgi_app.async_resource`)
 
     Notes:
         * The call to app.add_route() creates the single instance of the
@@ -165,11 +264,40 @@ def init_routes(app: App, devname: str, module):
 
     """
 
-    memlist = inspect.getmembers(module, inspect.isclass)
-    for cname,ctype in memlist:
+    for cname,ctype in sorted(vars(module).items()):
         # Only classes *defined* in the module and not the enum classes
-        if ctype.__module__ == module.__name__ and not issubclass(ctype, IntEnum):
-            app.add_route(f'/api/v{API_VERSION}/{devname}/{{devnum:int(min=0)}}/{cname.lower()}', ctype())  # type() creates instance!
+        if isinstance(ctype, type) and ctype.__module__ == module.__name__ and not issubclass(ctype, IntEnum):
+            resource = ctype()                      # type() creates instance!
+            if wrap is not None:
+                resource = wrap(resource)
+            app.add_route(f'/api/v{API_VERSION}/{devname}/{{devnum:int(min=0)}}/{cname.lower()}', resource)
+
+def add_routes(app: App, wrap=None):
+    """Route every device and Alpaca support endpoint
+
+    Args:
+        app (App): The Falcon WSGI or ASGI app
+        wrap (callable): Optional adapter applied to each resource instance
+            (see :py:func:`init_routes`)
+    """
+    wrap = wrap or (lambda resource: resource)
+    #
+    # Initialize routes for each endpoint the magic way
+    #
+    #########################
+    # FOR EACH ASCOM DEVICE #
+    #########################
+    init_routes(app, 'covercalibrator', covercalibrator, wrap)
+    #
+    # Initialize routes for Alpaca support endpoints
+    app.add_route('/management/apiversions', wrap(management.apiversions()))
+    app.add_route(f'/management/v{API_VERSION}/description', wrap(management.description()))
+    app.add_route(f'/management/v{API_VERSION}/configureddevices', wrap(management.configureddevices()))
+    app.add_route(f'/management/v{API_VERSION}/cache', wrap(management.cache()))
+    app.add_route(f'/management/v{API_VERSION}/metrics', wrap(management.metrics()))
+    app.add_route(f'/management/v{API_VERSION}/startup', wrap(management.startup()))
+    app.add_route(f'/setup/v{API_VERSION}/covercalibrator/{{devnum}}/setup', wrap(setup.devsetup()))
+    app.add_route("/resources/images/{filename}", wrap(StaticFileServer()))
 
 
 def custom_excepthook(exc_type, exc_value, exc_traceback):
@@ -227,12 +355,17 @@ def falcon_uncaught_exception_handler(req: Request, resp: Response, ex: BaseExce
 # ===========
 # APP STARTUP
 # ===========
-def main():
-    """ Application startup"""
+def start_services():
+    """Logging, discovery responder and panel state tasks shared by both server modes
 
+    Returns:
+        The shared logger
+    """
     logger = log.init_logging()
+    startup.mark('logging')
     # Share this logger throughout
     log.logger = logger
+    startup.logger = logger
     discovery.logger = logger
     exceptions.logger = logger
     set_shr_logger(logger)
@@ -241,6 +374,9 @@ def main():
     # FOR EACH ASCOM DEVICE #
     #########################
     covercalibrator.logger = logger
+    circuitbreaker.logger = logger
+    shadow.logger = logger
+    discovery_cache.logger = logger
 
     # -----------------------------
     # Last-Chance Exception Handler
@@ -252,52 +388,59 @@ def main():
     # ---------
     _DSC = DiscoveryResponder(Config.ip_address, Config.port)
 
+    # ----------------------------
+    # PANEL LOCATION (WARM START)
+    # ----------------------------
+    # Serve from the saved panel location at once; probe/rediscover in background
+    covercalibrator.warm_start()
+
+    # ------------------
+    # SHADOW STATE POLLER
+    # ------------------
+    # Optional: property GETs answer from a shadow refreshed in the background
+    if Config.shadow_enabled:
+        covercalibrator.start_shadow_poller(Config.shadow_poll_interval)
+        logger.info(f'==STARTUP== Shadow poller every {Config.shadow_poll_interval}s')
+    startup.mark('services')
+    return logger
+
+def main():
+    """ Application startup"""
+
+    startup.mark('imports')
+    logger = start_services()
+
     # ----------------------------------
     # MAIN HTTP/REST API ENGINE (FALCON)
     # ----------------------------------
     # falcon.App instances are callable WSGI apps
-    falc_app = App()
-    #
-    # Initialize routes for each endpoint the magic way
-    #
-    #########################
-    # FOR EACH ASCOM DEVICE #
-    #########################
-    init_routes(falc_app, 'covercalibrator', covercalibrator)
-    #
-    # Initialize routes for Alpaca support endpoints
-    falc_app.add_route('/management/apiversions', management.apiversions())
-    falc_app.add_route(f'/management/v{API_VERSION}/description', management.description())
-    falc_app.add_route(f'/management/v{API_VERSION}/configureddevices', management.configureddevices())
-    falc_app.add_route(f'/setup/v{API_VERSION}/covercalibrator/{{devnum}}/setup', setup.devsetup())
-    falc_app.add_route("/resources/images/{filename}", StaticFileServer())
+    falc_app = App(middleware=[metrics.RequestMetrics()])
+    add_routes(falc_app)
 
     #
     # Install the unhandled exception processor. See above,
     #
     falc_app.add_error_handler(Exception, falcon_uncaught_exception_handler)
+    startup.mark('routes')
 
     # ------------------
     # SERVER APPLICATION
     # ------------------
-    # Using the lightweight built-in Python wsgi.simple_server
-    with make_server(Config.ip_address, Config.port, falc_app, handler_class=LoggingWSGIRequestHandler) as httpd:
-        logger.info(f'==STARTUP== Serving on {Config.ip_address}:{Config.port}. Time stamps are UTC.')
+    # Using the lightweight built-in Python wsgi.simple_server, single threaded
+    # or with a pool of worker threads ([server] worker_threads)
+    workers = Config.worker_threads or 1
+    if workers > 1:
+        server_class = partial(ThreadPoolWSGIServer, workers=workers)
+    else:
+        server_class = WSGIServer
+    with make_server(Config.ip_address, Config.port, falc_app, server_class=server_class,
+                     handler_class=LoggingWSGIRequestHandler) as httpd:
+        startup.mark('listen')
+        logger.info(f'==STARTUP== Serving on {Config.ip_address}:{Config.port} with {workers} worker thread(s). Time stamps are UTC.')
+        startup.ready()
         # Serve until process is killed
         httpd.serve_forever()
         
-"""Serve static files from resources/images directory."""
-class StaticFileServer:
-
-    def on_get(self, req, resp, filename):
-        path = Path("resources") / "images" / filename
-        if not path.is_file():
-            raise HTTPNotFound()
-        resp.content_type = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
-        resp.set_header("Cache-Control", "public, max-age=86400")
-        with open(path, "rb") as f:
-            resp.data = f.read()
-
 # ========================
 if __name__ == '__main__':
     main()
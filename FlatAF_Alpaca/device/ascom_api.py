@@ -10,19 +10,18 @@
 ##############################
 
 
-import requests # type: ignore
+from transport import get_transport, OP_STATUS, OP_WRITE
 
 """Client interface for communicating with the ASCOM Alpaca driver."""
 class ASCOMDeviceClient:
     """Gets the device connection status."""
     def get_connection_status(self, client_id=0, client_transaction_id=1234):
-        url = f"{self.base_url}/connected"
         params = {
             "ClientID": client_id,
             "ClientTransactionID": client_transaction_id
         }
         try:
-            response = requests.get(url, params=params, timeout=2)
+            response = self.transport.get("connected", OP_STATUS, params=params)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -36,13 +35,12 @@ class ASCOMDeviceClient:
 
     """Sets the device connection state."""
     def set_device_connected(self, state, client_transaction_id=1234):
-        url = f"{self.base_url}/connected"
         payload = {
             "Connected": state,
             "ClientTransactionID": client_transaction_id
         }
         try:
-            response = requests.put(url, json=payload, timeout=2)
+            response = self.transport.put("connected", OP_WRITE, json=payload)
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -56,3 +54,4 @@ class ASCOMDeviceClient:
 
     def __init__(self, base_url: str):
         self.base_url = base_url.rstrip('/')
+        self.transport = get_transport(self.base_url)
@@ -0,0 +1,195 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# asgi_app.py - FlatAF Alpaca Driver asyncio (ASGI) Entry Point
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 Alternative to app.main() for a driver process
+#               fronting several panels and many polling clients. The same
+#               responder classes are routed through app.init_routes() as async
+#               resources. A property GET first reads the panel over
+#               aiotransport, so an in-flight request costs a coroutine, not a
+#               thread. It then runs the shared sync responder against that
+#               state. PUTs are rare, so they run the sync responder on a
+#               worker thread. A file a sync responder streams (a large static
+#               file) is read there too.
+# 18-Oct-2026   dr 0.0.3 A GET's ClientID and ClientTransactionID are checked
+#               before the panel is read, and a panel that could not be read
+#               gives the same Alpaca error as in WSGI mode.
+#
+#   Needs an ASGI server:   pip install -r requirements-asgi.txt
+#   Run:                    python asgi_app.py
+#
+import startup  # First, so that the rest of the imports are timed
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import falcon # type: ignore
+import falcon.asgi # type: ignore
+
+import app
+import covercalibrator
+import metrics
+from config import Config
+from shr import AlpacaRequestContext
+
+# Responders whose answer depends on panel state read over the network
+PANEL_READS = {'connected', 'brightness', 'calibratorstate', 'maxbrightness',
+               'devicestate', 'coverstate', 'covermoving', 'calibratorchanging'}
+
+# Threads for the (blocking) PUT responders, sized like the WSGI worker pool
+_executor = ThreadPoolExecutor(max_workers=Config.worker_threads or 1, thread_name_prefix='ASGIWorker')
+
+class SyncRequest:
+    """WSGI-style view of a ``falcon.asgi.Request`` whose body has been read
+
+    The shared responders and :py:mod:`shr` helpers call ``req.get_media()``
+    and ``req.media`` synchronously, as on WSGI. Everything else is the
+    underlying ASGI request.
+    """
+
+    def __init__(self, req, media=None, media_error: Exception = None):
+        self._req = req
+        self._media = media
+        self._media_error = media_error
+
+    def __getattr__(self, name):
+        return getattr(self._req, name)
+
+    def get_media(self, default_when_empty=None):
+        if self._media_error is not None:
+            if default_when_empty is not None and isinstance(self._media_error, falcon.MediaNotFoundError):
+                return default_when_empty
+            raise self._media_error
+        return self._media
+
+    @property
+    def media(self):
+        return self.get_media()
+
+async def _sync_request(req) -> SyncRequest:
+    if req.method != 'PUT':
+        return SyncRequest(req)
+    try:
+        return SyncRequest(req, await req.get_media())
+    except Exception as ex:                 # Raised (as on WSGI) when the responder asks
+        return SyncRequest(req, media_error=ex)
+
+class AsyncFileStream:
+    """``async read()`` over a blocking file, for a sync responder's ``resp.stream``
+
+    ``falcon.asgi`` awaits ``stream.read()``; the reads run on the worker
+    threads so a large file does not hold up the event loop.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.get_running_loop().run_in_executor(_executor, self._stream.read, size)
+
+    async def close(self):
+        self._stream.close()
+
+def _valid(req) -> bool:
+    """Parse the request's Alpaca parameters before any panel read
+
+    A bad ClientID or ClientTransactionID then costs no panel round trip;
+    the responder's hook logs and answers it. A good one is parsed only
+    once (the hook reuses it).
+    """
+    try:
+        req.context.alpaca = AlpacaRequestContext(req, log_errors=False)
+    except falcon.HTTPBadRequest:
+        return False
+    return True
+
+def async_resource(resource):
+    """Adapt a sync Falcon resource for ``falcon.asgi`` (see module notes)
+
+    Args:
+        resource: Instance of a responder class with ``on_get``/``on_put``
+
+    Returns:
+        An instance of a same-named class with coroutine responders
+    """
+    reads_panel = type(resource).__name__.lower() in PANEL_READS
+    responders = {}
+
+    if hasattr(resource, 'on_get'):
+        async def on_get(self, req, resp, **params):
+            sreq = await _sync_request(req)
+            if not reads_panel or params['devnum'] > covercalibrator.maxdev or not _valid(sreq):
+                resource.on_get(sreq, resp, **params)   # (Bad requests: 400 from its hook)
+                if resp.stream is not None and not asyncio.iscoroutinefunction(getattr(resp.stream, 'read', None)):
+                    resp.stream = AsyncFileStream(resp.stream)
+                return
+            state = await covercalibrator.get_panel_state_async(covercalibrator.device(params['devnum']))
+            token = covercalibrator.request_state.set(state)
+            try:
+                resource.on_get(sreq, resp, **params)
+            finally:
+                covercalibrator.request_state.reset(token)
+        responders['on_get'] = on_get
+
+    if hasattr(resource, 'on_put'):
+        async def on_put(self, req, resp, **params):
+            sreq = await _sync_request(req)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(_executor, partial(resource.on_put, sreq, resp, **params))
+        responders['on_put'] = on_put
+
+    return type(type(resource).__name__, (), responders)()
+
+async def uncaught_exception_handler(req, resp, ex: BaseException, params):
+    """Async form of :py:func:`app.falcon_uncaught_exception_handler`"""
+    app.falcon_uncaught_exception_handler(req, resp, ex, params)
+
+def create_app() -> falcon.asgi.App:
+    """The Alpaca API as a ``falcon.asgi`` app (routes as in :py:func:`app.main`)"""
+    falc_app = falcon.asgi.App(middleware=[metrics.RequestMetrics()])
+    app.add_routes(falc_app, async_resource)
+    falc_app.add_error_handler(Exception, uncaught_exception_handler)
+    return falc_app
+
+class _StartupReady:
+    """Ends the startup timing when the ASGI server starts the app (lifespan)"""
+
+    async def process_startup(self, scope, event):
+        startup.mark('listen')
+        startup.ready()
+
+# ===========
+# APP STARTUP
+# ===========
+def main():
+    """ Application startup, ASGI mode"""
+    try:
+        import uvicorn # type: ignore
+    except ImportError:
+        print('[ERROR] The ASGI mode needs an ASGI server. Install it with: pip install -r requirements-asgi.txt')
+        sys.exit(1)
+
+    startup.mark('imports')
+    logger = app.start_services()
+    host = Config.ip_address or '0.0.0.0'
+    falc_app = create_app()
+    falc_app.add_middleware(_StartupReady())
+    startup.mark('routes')
+    logger.info(f'==STARTUP== Serving (ASGI) on {host}:{Config.port}. Time stamps are UTC.')
+    # log_config=None leaves our rotating file logger in charge
+    uvicorn.run(falc_app, host=host, port=Config.port, log_config=None, access_log=False)
+
+# ========================
+if __name__ == '__main__':
+    main()
+# ========================
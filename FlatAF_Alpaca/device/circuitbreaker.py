@@ -0,0 +1,149 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# circuitbreaker.py - Fast failure while a panel is offline
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 With the panel switched off or out of Wi-Fi range
+#               every Alpaca call waited out a transport timeout (or a
+#               discovery broadcast). After a run of failures the breaker opens
+#               and calls fail at once. After a backoff one call is let through
+#               as a probe. If it works the breaker closes; if not, the backoff
+#               doubles, up to a limit.
+# 18-Oct-2026   dr 0.0.3 Only exceptions count as failures. A cancelled call
+#               (or KeyboardInterrupt/SystemExit) says nothing about the
+#               panel: it hands back a half-open probe and is not counted.
+#
+import threading
+import time
+from logging import Logger
+
+logger: Logger = None
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a panel that is known to be offline"""
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker around the calls to one panel
+
+    Args:
+        name: Used in log messages (e.g. 'panel 0')
+        failure_threshold: Consecutive failures that open the breaker
+            (0 = never open)
+        reset_timeout: Seconds open before the first probe
+        max_reset_timeout: Longest backoff between probes
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 2.0,
+                 max_reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0                   # Consecutive failures
+        self.opened = 0                     # Times opened since startup
+        self.rejected = 0                   # Calls failed fast since startup
+        self._backoff = reset_timeout
+        self._retry_at = 0.0                # time.monotonic() of the next probe
+        self._lock = threading.Lock()
+
+    def _admit(self, force: bool) -> bool:
+        """Whether a call may go to the panel now (and take the probe if due)"""
+        with self._lock:
+            if self.state == CLOSED or force:
+                return True
+            if self.state == OPEN and time.monotonic() >= self._retry_at:
+                self.state = HALF_OPEN
+                if logger:
+                    logger.info(f'Circuit for {self.name} half-open, probing the panel')
+                return True
+            self.rejected += 1
+            return False
+
+    def _success(self):
+        with self._lock:
+            if self.state != CLOSED and logger:
+                logger.info(f'Circuit for {self.name} closed, panel is answering again')
+            self.state = CLOSED
+            self.failures = 0
+            self._backoff = self.reset_timeout
+
+    def _release(self):
+        """A call ended without an outcome (cancelled); let the next one probe"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self._retry_at = time.monotonic()
+
+    def _failure(self, ex: Exception):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self._backoff = min(self._backoff * 2, self.max_reset_timeout)
+            elif self.state == OPEN or not self.failure_threshold or self.failures < self.failure_threshold:
+                return
+            else:
+                self.opened += 1
+            self.state = OPEN
+            self._retry_at = time.monotonic() + self._backoff
+            if logger:
+                logger.warning(f'Circuit for {self.name} open after {self.failures} failures '
+                               f'({ex}), next probe in {self._backoff:.0f}s')
+
+    def call(self, fn, force: bool = False):
+        """Return ``fn()``, or raise :py:class:`CircuitOpenError` without calling it
+
+        Args:
+            fn: One exchange with the panel; raising an Exception counts as
+                a failure, cancellation does not
+            force: Call even if open (an explicit Connect), still recording
+                the outcome
+        """
+        if not self._admit(force):
+            raise CircuitOpenError(f'{self.name} is not answering')
+        try:
+            result = fn()
+        except Exception as ex:
+            self._failure(ex)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._success()
+        return result
+
+    async def call_async(self, coro_fn, force: bool = False):
+        """:py:meth:`call` for a coroutine function"""
+        if not self._admit(force):
+            raise CircuitOpenError(f'{self.name} is not answering')
+        try:
+            result = await coro_fn()
+        except Exception as ex:
+            self._failure(ex)
+            raise
+        except BaseException:
+            self._release()
+            raise
+        self._success()
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
@@ -43,20 +43,30 @@
 #               (manually merged). Remove comment about "slimy hack".
 # 20-Ferb-2024  rbd 0.7 Add sync_write_connected to control sync/async
 #               write-Connected behavior.
+# 18-Oct-2026   dr 0.0.3 Parse with the standard library tomllib on Python 3.11 and
+#               later (faster to load and to parse); toml package before.
+# 18-Oct-2026   dr 0.0.3 Add [device] fade.
 #
 import sys
-import toml # type: ignore
 import logging
+try:
+    import tomllib
+    def _load_toml(path: str) -> dict:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+except ImportError:
+    import toml # type: ignore
+    _load_toml = toml.load
 
 _dict = {}
-_dict = toml.load(f'{sys.path[0]}/config.toml')    # Errors here are fatal.
+_dict = _load_toml(f'{sys.path[0]}/config.toml')    # Errors here are fatal.
 _dict2 = {}
 try:
     # ltf - this file, if it exists can override or supplement definitions
     # in the normal config.toml. This facilitates putting the driver in a
     # docker container where installation specific configuration can be
     # put in a file that isn't pulled from a repository
-    _dict2 = toml.load('/alpyca/config.toml')
+    _dict2 = _load_toml('/alpyca/config.toml')
 except:
     _dict2 = {}
     # file is optional so it's ok if it isn't there
@@ -89,6 +99,7 @@ class Config:
     # --------------
     location: str = get_toml('server', 'location')
     verbose_driver_exceptions: bool = get_toml('server', 'verbose_driver_exceptions')
+    worker_threads: int = get_toml('server', 'worker_threads')
     # --------------
     # Device Section
     # --------------
@@ -96,6 +107,42 @@ class Config:
     step_size: float = get_toml('device', 'step_size')
     steps_per_sec: int = get_toml('device', 'steps_per_sec')
     sync_write_connected: bool = get_toml('device', 'sync_write_connected')
+    num_panels: int = get_toml('device', 'num_panels')
+    panel_urls: list = get_toml('device', 'panel_urls')
+    brightness_settle: float = get_toml('device', 'brightness_settle')
+    fade: float = get_toml('device', 'fade')
+    # -----------------
+    # Transport Section
+    # -----------------
+    pool_size: int = get_toml('transport', 'pool_size')
+    connect_timeout: float = get_toml('transport', 'connect_timeout')
+    status_timeout: float = get_toml('transport', 'status_timeout')
+    read_timeout: float = get_toml('transport', 'read_timeout')
+    write_timeout: float = get_toml('transport', 'write_timeout')
+    # -------------
+    # Cache Section
+    # -------------
+    connected_ttl: float = get_toml('cache', 'connected_ttl')
+    brightness_ttl: float = get_toml('cache', 'brightness_ttl')
+    # -----------------
+    # Discovery Section
+    # -----------------
+    discovery_cache_file: str = get_toml('discovery', 'cache_file')
+    discovery_probe_timeout: float = get_toml('discovery', 'probe_timeout')
+    rediscovery_interval: float = get_toml('discovery', 'rediscovery_interval')
+    discovery_interfaces: list = get_toml('discovery', 'interfaces')
+    discovery_targets: list = get_toml('discovery', 'targets')
+    # --------------
+    # Shadow Section
+    # --------------
+    shadow_enabled: bool = get_toml('shadow', 'enabled')
+    shadow_poll_interval: float = get_toml('shadow', 'poll_interval')
+    # ---------------
+    # Breaker Section
+    # ---------------
+    breaker_failure_threshold: int = get_toml('breaker', 'failure_threshold')
+    breaker_reset_timeout: float = get_toml('breaker', 'reset_timeout')
+    breaker_max_reset_timeout: float = get_toml('breaker', 'max_reset_timeout')
     # ---------------
     # Logging Section
     # ---------------
@@ -103,3 +150,6 @@ class Config:
     log_to_stdout: str = get_toml('logging', 'log_to_stdout')
     max_size_mb: int = get_toml('logging', 'max_size_mb')
     num_keep_logs: int = get_toml('logging', 'num_keep_logs')
+    log_queue: bool = get_toml('logging', 'queue')
+    log_format: str = get_toml('logging', 'format')
+    log_endpoint_interval: dict = get_toml('logging', 'endpoint_interval')
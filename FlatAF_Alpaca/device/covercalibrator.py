@@ -13,43 +13,115 @@
 #   Generated by Python Interface Generator for AlpycaDevice
 #
 # 03-10-2025   Initial Development
+# 18-Oct-2026   dr 0.0.3 Panel calls go through transport.py, over pooled
+#               keep-alive connections.
+# 18-Oct-2026   dr 0.0.3 Connected and brightness served from the per-panel
+#               state cache within their staleness bounds; writes update or
+#               invalidate it.
+# 18-Oct-2026   dr 0.0.3 Optional shadow poller ([shadow] in config.toml); GETs
+#               read the shadow instead of the panel.
+# 18-Oct-2026   dr 0.0.3 DeviceState reads the panel's aggregated state route
+#               in one round trip.
+# 18-Oct-2026   dr 0.0.3 The panel location found by discovery is saved and
+#               reused at startup (discovery_cache.py).
+# 18-Oct-2026   dr 0.0.3 Module globals replaced by a DeviceContext, so
+#               responders can run on worker threads at the same time.
+# 18-Oct-2026   dr 0.0.3 ASGI mode (asgi_app.py): panel state read without
+#               blocking, then handed to the sync responders.
+# 18-Oct-2026   dr 0.0.3 Responders read request parameters from
+#               shr.AlpacaRequestContext.
+# 18-Oct-2026   dr 0.0.3 Several panels served as Alpaca device numbers 0..N-1,
+#               each with its own DeviceContext (panel location, cache, locks).
+# 18-Oct-2026   dr 0.0.3 Brightness and off writes go through the per-panel
+#               WriteCoalescer: one panel write per [device] brightness_settle.
+# 18-Oct-2026   dr 0.0.3 Panel reads go through the per-panel SingleFlight, so
+#               concurrent requests for the same property share one read.
+# 18-Oct-2026   dr 0.0.3 Per-panel circuit breaker: NotConnected at once while
+#               the panel is offline.
+# 18-Oct-2026   dr 0.0.3 Per-panel cache, single-flight, write and breaker
+#               counters collected for /management/v1/metrics.
+# 18-Oct-2026   dr 0.0.3 Faster cold start: the unused serial import is gone,
+#               random is replaced by a counter and requests is left to
+#               transport.py, which imports it when the first panel request is
+#               made.
+# 18-Oct-2026   dr 0.0.3 TCP connections opened to each panel are reported in
+#               the metrics, to show how often the firmware kept one alive.
+# 18-Oct-2026   dr 0.0.3 With [device] fade, brightness changes fade on the
+#               panel; CalibratorChanging is true and CalibratorState NotReady
+#               until the panel reports the fade over.
+# 18-Oct-2026   dr 0.0.3 A panel read overtaken by a driver write is kept out
+#               of the cache.
+# 18-Oct-2026   dr 0.0.3 In ASGI mode a panel that could not be read gives the
+#               same Alpaca error as in WSGI mode.
+# 18-Oct-2026   dr 0.0.3 Disconnect reads its query string again, and
+#               DeviceState, InterfaceVersion and SupportedActions again refuse
+#               an empty ClientTransactionID.
+# 18-Oct-2026   dr 0.0.3 With a shadow, Brightness is NotConnected while the
+#               panel is offline instead of the brightness last polled.
+# 18-Oct-2026   dr 0.0.3 A pinned panel answering discovery is not counted as
+#               one of the panels being searched for.
 
 import json
-import serial # type: ignore
 import os
-import requests # type: ignore
 import falcon # type: ignore
-import random
-
-from ascom_api import ASCOMDeviceClient
-from dynamic_discovery import discover_flataf
+import asyncio
+import threading
+import uuid
+from contextvars import ContextVar
+from functools import partial
+from itertools import count
+
+from config import Config
+import metrics
+from circuitbreaker import CLOSED, HALF_OPEN, OPEN, CircuitOpenError
+from devicecache import MISS
+from devicecontext import DeviceContext
+from shadow import PanelShadow, ShadowPoller
+import aiotransport
+import transport as sync_transport
+from transport import get_transport, OP_STATUS, OP_READ, OP_WRITE
+from aiotransport import get_async_transport
+from dynamic_discovery import discover_all
+from discovery_cache import Rediscovery, load_cached_panels, save_cached_panels
 from falcon import Request, Response, HTTPBadRequest, before, HTTP_200, HTTP_400, HTTP_500 # type: ignore
 from logging import Logger
 from pathlib import Path
 from shr import PropertyResponse, MethodResponse, PreProcessRequest, \
-                StateValue, get_request_field, to_bool
+                StateValue, alpaca_context, to_bool
 from exceptions import *        # Nothing but exception classes
 
 logger: Logger = None
 
-# connected state
-connection_state = False
-
-# device discovered URL
-discovered_url = ""
-
-
-# Brightness
-last_brightness: int = 0
-device_brightness: int = 32767
-
-# Serial Connection
-ser: serial.Serial = None
+# Panel location, cached/shadow state and last written values, one per
+# Alpaca device number, shared by the request threads (see devicecontext.py)
+_ttls = {
+    'connected': Config.connected_ttl,
+    'brightness': Config.brightness_ttl,
+    'state': min(Config.connected_ttl, Config.brightness_ttl)
+}
+_breaker = {
+    'failure_threshold': Config.breaker_failure_threshold if Config.breaker_failure_threshold != '' else 3,
+    'reset_timeout': Config.breaker_reset_timeout or 2.0,
+    'max_reset_timeout': Config.breaker_max_reset_timeout or 30.0
+}
+devices = [DeviceContext(n, _ttls, Config.brightness_settle or 0.0, _breaker)
+           for n in range(max(Config.num_panels or 1, 1))]
+for _ctx, _url in zip(devices, Config.panel_urls or []):
+    if _url:
+        _ctx.set_url(_url)
+        _ctx.pinned = True
+
+def device(devnum: int) -> DeviceContext:
+    """The context of the panel served as Alpaca device number ``devnum``"""
+    return devices[devnum]
+
+# ClientTransactionIDs for the driver's own calls to the panel
+_panel_ctid = count(1)
 
 # ----------------------
 # MULTI-INSTANCE SUPPORT
 # ----------------------
-maxdev = 0                      # Single instance
+maxdev = len(devices) - 1       # One device number per panel ([device] num_panels)
 
 class BadRequestException(Exception):
     pass
@@ -76,6 +148,18 @@ class CovercalibratorMetadata:
     MaxDeviceNumber = maxdev
     InterfaceVersion = 2  # ICoverCalibratorV2
 
+def device_name(devnum: int) -> str:
+    """Alpaca DeviceName; panels after the first are numbered"""
+    if devnum == 0:
+        return CovercalibratorMetadata.Name
+    return f'{CovercalibratorMetadata.Name} {devnum + 1}'
+
+def device_unique_id(devnum: int) -> str:
+    """Alpaca UniqueID, stable for each device number"""
+    if devnum == 0:
+        return CovercalibratorMetadata.DeviceID
+    return str(uuid.uuid5(uuid.UUID(CovercalibratorMetadata.DeviceID), str(devnum)))
+
 # --------------
 # SYMBOLIC ENUMS
 # --------------
@@ -124,19 +208,21 @@ class commandstring:
 @before(PreProcessRequest(maxdev))
 class connect:
     def on_put(self, req: Request, resp: Response, devnum: int):
+        ctx = device(devnum)
         try:
             # Try the initial connection check
-            connected = get_device_connected()
+            connected = get_device_connected(ctx)
+            if not connected and ctx.breaker.state != CLOSED:
+                connected = _read_device_connected(ctx, force=True)   # Probe now, don't wait out the backoff
 
-            if not connected:
+            if not connected and not ctx.pinned:
                 try:
-                    new_url = discover_flataf()
+                    new_url = discover_now(ctx)
                     if new_url:
-                        global discovered_url
-                        discovered_url = new_url
+                        ctx.set_url(new_url)
                         import time
                         time.sleep(1.2)  # Allow device to finalize connection
-                        connected = get_device_connected()
+                        connected = _read_device_connected(ctx, force=True)
                 except Exception as ex:
                     print(f"Rediscovery exception: {ex}")
 
@@ -145,18 +231,96 @@ class connect:
             resp.text = MethodResponse(req, DriverException(0x500, 'Covercalibrator.Connect failed', ex)).json
 
 
-def load_config():
-    global discovered_url
+# ---------
+# DISCOVERY
+# ---------
+# One broadcast finds every panel; assign_panels() hands them out to the
+# device numbers that are not pinned to a URL in config.toml.
+_discovery_lock = threading.RLock()
+rediscovery: Rediscovery = None
 
-    if not discovered_url:
-        """Load configuration dynamically via network discovery."""
-        discovered_url = discover_flataf()
+def discover_now(ctx: DeviceContext, only_if_unknown: bool = False) -> str:
+    """Blocking broadcast discovery, saving what it finds for the next start
 
-        if not discovered_url:
-            raise Exception("FlatAF device not found on the network. Cannot continue.")
+    Returns the panel URL for ``ctx``. Fails fast instead of starting a
+    second broadcast while the background rediscovery task is already
+    searching. With ``only_if_unknown``, a location found by another
+    thread's discovery while this one waited is used as it is.
+    """
+    with _discovery_lock:
+        if only_if_unknown and ctx.url:
+            return ctx.url
+        if rediscovery is not None and rediscovery.searching.is_set():
+            raise Exception("FlatAF discovery already in progress")
+        pinned = {d.url for d in devices if d.pinned}
+        assign_panels(discover_all(expected=sum(1 for d in devices if not d.pinned), ignore=pinned))
+    if not ctx.url:
+        raise Exception(f"No FlatAF panel found on the network for device {ctx.devnum}")
+    ctx.cache.invalidate()
+    return ctx.url
+
+def resolve_url(ctx: DeviceContext) -> str:
+    """The panel URL for ``ctx``, discovering it first if not known yet"""
+    return ctx.resolve_url(partial(discover_now, ctx, only_if_unknown=True))
+
+def assign_panels(panels: list):
+    """Give the device numbers that are not pinned the panels from a discovery
+
+    A device number keeps its panel (by UniqueID) if that panel answered.
+    Device numbers with no panel yet, or whose panel did not answer, take the
+    remaining panels in discovery order. The result is saved for the next
+    start.
+    """
+    with _discovery_lock:
+        pinned = {d.url for d in devices if d.pinned}
+        spare = {p['UniqueID']: p for p in panels if p['BaseURL'] not in pinned}
+        waiting = []
+        for ctx in devices:
+            if ctx.pinned:
+                continue
+            info = spare.pop(ctx.panel['UniqueID'], None) if ctx.panel else None
+            if info is None:
+                waiting.append(ctx)
+            else:
+                _use_panel(ctx, info)
+        for ctx, info in zip(waiting, list(spare.values())):
+            _use_panel(ctx, info)
+        save_cached_panels([d.panel for d in devices])
+
+def _use_panel(ctx: DeviceContext, info: dict):
+    ctx.panel = info
+    if ctx.set_url(info["BaseURL"]) and logger:
+        logger.info(f'FlatAF panel for device {ctx.devnum} at {ctx.url}')
+
+def warm_start() -> Rediscovery:
+    """Start serving from the last known panel locations without waiting
+
+    The saved locations (if any) are used immediately. A background task
+    probes them, broadcasts only if a probe fails, and keeps them fresh.
+    Not started when every panel is pinned in config.toml.
+    """
+    global rediscovery
+    for ctx, info in zip(devices, load_cached_panels()):
+        if info and not ctx.pinned and not ctx.url:
+            ctx.panel = info
+            ctx.set_url(info["BaseURL"])
+            if logger:
+                logger.info(f'Using saved FlatAF panel location {ctx.url} for device {ctx.devnum}')
+    if all(ctx.pinned for ctx in devices):
+        return None
+    rediscovery = Rediscovery(lambda: [d.url for d in devices if not d.pinned], assign_panels,
+                              lambda: [d.url for d in devices if d.pinned])
+    rediscovery.start()
+    return rediscovery
+
+def load_config(ctx: DeviceContext):
+    """Load configuration dynamically via network discovery."""
+    url = resolve_url(ctx)
+    if not url:
+        raise Exception("FlatAF device not found on the network. Cannot continue.")
 
     config = {
-        "BaseURL": discovered_url,
+        "BaseURL": url,
         "MAX_BRIGHTNESS": 32767,  # Still helpful to keep maximum brightness configurable
     }
 
@@ -169,7 +333,7 @@ def load_config():
 class connected:
     def on_get(self, req: Request, resp: Response, devnum: int):
         try:
-            is_conn = get_device_connected()
+            is_conn = get_device_connected(device(devnum))
             if is_conn is None:
                 is_conn = False
             resp.text = PropertyResponse(is_conn, req).json
@@ -177,19 +341,13 @@ class connected:
             resp.text = MethodResponse(req, DriverException(0x500, 'Covercalibrator.Connected failed', ex)).json
 
     def on_put(self, req: Request, resp: Response, devnum: int):
+        ctx = device(devnum)
         try:
-            ctid_str = get_request_field('ClientTransactionID', req, default="0").strip()
-            if not ctid_str:
-                print(f"[ERROR] ClientTransactionID is empty after stripping whitespace")
-                raise falcon.HTTPBadRequest(description="ClientTransactionID cannot be empty or whitespace.")
-            try:
-                ctid_val = int(ctid_str)
-            except ValueError:
-                print(f"[ERROR] Invalid ClientTransactionID: '{ctid_str}' is not an integer")
-                raise falcon.HTTPBadRequest(description=f"Invalid ClientTransactionID: '{ctid_str}' must be an integer.")
-
-            if "Connected" in req.media:
-                conn_val = get_request_field('Connected', req, default="")
+            actx = alpaca_context(req)
+            ctid_val = actx.client_transaction_id
+
+            if actx.has("Connected"):
+                conn_val = actx.field('Connected', default="")
                 if isinstance(conn_val, bool):
                     conn = conn_val
                 elif isinstance(conn_val, str):
@@ -208,14 +366,15 @@ class connected:
             else:
                 conn = None
 
-            config = load_config()
-            base_url = config["BaseURL"]
-            url = f"{base_url}/connected"
             payload = {"Connected": conn, "ClientTransactionID": ctid_val}
-            headers = {"Content-Type": "application/json"}
-            r = requests.put(url, json=payload, headers=headers, timeout=5)
+            # An explicit (dis)connect always tries the panel, open breaker or not
+            r = ctx.breaker.call(partial(_put_connected, ctx, payload), force=True)
+            ctx.cache.invalidate()
             if r.status_code == 200:
                 resp_data = r.json()
+                if conn is not None:
+                    ctx.connection_state = conn
+                    ctx.remember(connected=conn)
                 resp_data["ClientTransactionID"] = ctid_val
                 resp.text = PropertyResponse(resp_data.get("Value", True), req).json
             else:
@@ -224,37 +383,55 @@ class connected:
         except falcon.HTTPBadRequest as bre:
             print(f"[ERROR] Bad Request: {bre}")
             raise
-        except requests.exceptions.RequestException as ex:
+        except OSError as ex:                   # requests' RequestException is an OSError
             print(f"[ERROR] Network error: {ex}")
             raise falcon.HTTPServiceUnavailable(description='Network error when contacting device')
         except Exception as ex:
             print(f"[ERROR] Unexpected error: {ex}")
             raise falcon.HTTPInternalServerError(description="Covercalibrator.Connected failed")
 
-def get_device_connected():
-    global discovered_url
-    if not discovered_url:
-        try:
-            discovered_url = discover_flataf()
-        except Exception as ex:
-            print(f"[ERROR] Failed to discover FlatAF device: {ex}")
-            return False
-    if not discovered_url:
-        print("[ERROR] Cannot resolve device URL — no discovered_url available")
-        return False
-    device_base_url = discovered_url
-    device_client = ASCOMDeviceClient(device_base_url)
+def _put_connected(ctx: DeviceContext, payload: dict):
+    config = load_config(ctx)
+    response = get_transport(config["BaseURL"]).put("connected", OP_WRITE, json=payload)
+    if response.status_code >= 500:
+        raise Exception(f"Device PUT /connected failed with status {response.status_code}")
+    return response
+
+def get_device_connected(ctx: DeviceContext):
+    state = request_state.get()
+    if state is not None:
+        return state['connected']
+    if ctx.shadow is not None:
+        return ctx.shadow.connected
+    cached = ctx.cache.lookup('connected')
+    if cached is not MISS:
+        return cached
+    return ctx.reads.do('connected', partial(_read_device_connected, ctx))
+
+def _read_device_connected(ctx: DeviceContext, force: bool = False):
+    generation = ctx.cache.generation()     # A write made during the read wins
     try:
-        response = device_client.get_connection_status(
-            client_id=0,
-            client_transaction_id=random.randint(1, 99999)
-        )
+        connected = ctx.breaker.call(partial(_query_connected, ctx), force=force)
+    except CircuitOpenError:
+        return False                    # Panel known to be offline, already logged
     except Exception as ex:
-        print(f"Error retrieving connection status: {ex}")
+        print(f"[ERROR] Failed to read connection status: {ex}")
         return False
-    if response.get("Value") is not None:
-        return response["Value"]
-    return False
+    ctx.cache.put('connected', connected, generation)
+    return connected
+
+def _query_connected(ctx: DeviceContext):
+    """Ask the panel whether it is connected; raises if it cannot be asked"""
+    url = resolve_url(ctx)
+    if not url:
+        raise Exception("Cannot resolve device URL — no panel URL available")
+    response = ctx.client().get_connection_status(
+        client_id=0,
+        client_transaction_id=next(_panel_ctid)
+    )
+    if response.get("Value") is None:
+        raise Exception(response.get("ErrorMessage", "Panel did not report its connected state"))
+    return response["Value"]
 
 @before(PreProcessRequest(maxdev))
 class connecting:
@@ -274,42 +451,48 @@ class description:
         resp.text = PropertyResponse(CovercalibratorMetadata.Description, req).json
         
 
-def is_calibrator_changing():
-    return False
+def is_calibrator_changing(ctx: DeviceContext, state: dict = None):
+    if state is None:
+        state = get_panel_state(ctx)
+    return bool(state.get("changing", False))
 
 # ------------- ADD calibratorchanging endpoint -------------
 @before(PreProcessRequest(maxdev))
 class calibratorchanging:
     def on_get(self, req: Request, resp: Response, devnum: int):
         try:
-            val = is_calibrator_changing()
+            val = is_calibrator_changing(device(devnum))
             resp.text = PropertyResponse(val, req).json
         except Exception as ex:
             resp.text = PropertyResponse(None, req, DriverException(0x500, 'Covercalibrator.CalibratorChanging failed', ex)).json
 
+def _reject_empty_ctid(req: Request, message: str):
+    """400 for a ClientTransactionID sent empty
+
+    PreProcessRequest takes an empty one as 0; these responders have always
+    refused it.
+    """
+    actx = alpaca_context(req)
+    if actx.has("ClientTransactionID") and actx.field("ClientTransactionID") is None:
+        raise HTTPBadRequest(title="400 Bad Request", description=message)
+
 @before(PreProcessRequest(maxdev))
 class devicestate:
     def on_get(self, req: Request, resp: Response, devnum: int):
-        params = {k.lower(): v for k, v in req.params.items()}
-        client_transaction_id = params.get("clienttransactionid", "0").strip()
-        if client_transaction_id == "":
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID cannot be empty.")
-        try:
-            client_transaction_id = int(client_transaction_id)
-        except ValueError:
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID must be an integer.")
-        if client_transaction_id < 0:
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID cannot be negative.")
-        if not get_device_connected():
+        _reject_empty_ctid(req, "ClientTransactionID cannot be empty.")
+        # One panel round trip (or none, if cached) for the whole property set
+        ctx = device(devnum)
+        state = get_panel_state(ctx)
+        if not state["connected"]:
             resp.text = PropertyResponse(None, req, NotConnectedException()).json
             return
         try:
             val = [
-                StateValue("CalibratorState", int(get_calibrator_state())),
+                StateValue("CalibratorState", int(get_calibrator_state(ctx, state))),
                 StateValue("CoverState", int(get_cover_state())),
-                StateValue("CalibratorChanging", is_calibrator_changing()),
+                StateValue("CalibratorChanging", is_calibrator_changing(ctx, state)),
                 StateValue("CoverMoving", is_cover_moving()),
-                StateValue("Brightness", int(get_device_brightness())),
+                StateValue("Brightness", int(state["brightness"])),
             ]
             resp.text = PropertyResponse(val, req).json
         except Exception as ex:
@@ -319,6 +502,7 @@ class devicestate:
 class Disconnect:
     def on_put(self, req: Request, resp: Response, devnum: int):
         try:
+            # Read from the query string, as before the request context
             params = {k.lower(): v for k, v in req.params.items()}
             client_transaction_id_raw = params.get("clienttransactionid", "").strip()
             if not client_transaction_id_raw:
@@ -365,7 +549,6 @@ class Disconnect:
 class driverinfo:
     def on_get(self, req: Request, resp: Response, devnum: int):
         try:
-            ctid_str = get_request_field('ClientTransactionID', req, default="0").strip()
             resp.text = PropertyResponse("FlatAF Wi-Fi CoverCalibrator (ASCOM Alpaca)", req).json
         except BadRequestException as e:
             resp.text = MethodResponse(req, DriverException(0x400, 'Covercalibrator.DriverInfo invalid param', e)).json
@@ -375,14 +558,7 @@ class driverinfo:
 @before(PreProcessRequest(maxdev))
 class interfaceversion:
     def on_get(self, req: Request, resp: Response, devnum: int):
-        params = {k.lower(): v for k, v in req.params.items()}
-        client_transaction_id = params.get("clienttransactionid", "0").strip()
-        try:
-            client_transaction_id = int(client_transaction_id)
-        except ValueError:
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID must be an integer.")
-        if client_transaction_id < 0:
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID cannot be negative.")
+        _reject_empty_ctid(req, "ClientTransactionID must be an integer.")
         resp.text = PropertyResponse(CovercalibratorMetadata.InterfaceVersion, req).json
 
 @before(PreProcessRequest(maxdev))
@@ -393,43 +569,43 @@ class driverversion():
 @before(PreProcessRequest(maxdev))
 class name():
     def on_get(self, req: Request, resp: Response, devnum: int):
-        resp.text = PropertyResponse(CovercalibratorMetadata.Name, req).json
+        resp.text = PropertyResponse(device_name(devnum), req).json
 
 @before(PreProcessRequest(maxdev))
 class supportedactions:
     def on_get(self, req: Request, resp: Response, devnum: int):
-        params = {k.lower(): v for k, v in req.params.items()}
-        client_transaction_id = params.get("clienttransactionid", "0").strip()
-        if client_transaction_id == "":
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID cannot be empty.")
-        try:
-            client_transaction_id = int(client_transaction_id)
-        except ValueError:
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID must be an integer.")
-        if client_transaction_id < 0:
-            raise HTTPBadRequest("400 Bad Request", "ClientTransactionID cannot be negative.")
+        _reject_empty_ctid(req, "ClientTransactionID cannot be empty.")
         resp.text = PropertyResponse([], req).json
         
 @before(PreProcessRequest(maxdev))
 class calibratorstate:
     def on_get(self, req: Request, resp: Response, devnum: int):
         try:
-            val = get_calibrator_state()
+            val = get_calibrator_state(device(devnum))
             resp.text = PropertyResponse(val, req).json
         except Exception as ex:
             resp.text = PropertyResponse(None, req, DriverException(0x500, "Covercalibrator.CalibratorState failed", ex)).json
 
-def get_calibrator_state():
+def get_calibrator_state(ctx: DeviceContext, state: dict = None):
     """
     Returns the current CalibratorState:
     - NotPresent if device is not connected
     - Off if brightness is 0 or device disconnected
+    - NotReady while the brightness is changing (a fade)
     - Ready if brightness > 0
+
+    Pass an already-read panel state to avoid another read.
     """
-    if not get_device_connected():
+    if state is None:
+        state = get_panel_state(ctx)
+
+    if not state["connected"]:
         return CalibratorStatus.Off  # Treat disconnected as "Off"
 
-    if device_brightness == 0:
+    if state.get("changing"):
+        return CalibratorStatus.NotReady
+
+    if not state["brightness"]:
         return CalibratorStatus.Off
 
     return CalibratorStatus.Ready
@@ -438,14 +614,16 @@ def get_calibrator_state():
 class brightness:
     def on_get(self, req: Request, resp: Response, devnum: int):
         try:
-            val = get_device_brightness()
+            val = get_device_brightness(device(devnum))
             resp.text = PropertyResponse(val, req).json
+        except CircuitOpenError:
+            resp.text = PropertyResponse(None, req, NotConnectedException()).json
         except Exception as ex:
             resp.text = PropertyResponse(None, req, DriverException(0x500, "Covercalibrator.Brightness failed", ex)).json
             
     def on_put(self, req: Request, resp: Response, devnum: int):
         try:
-            brightness_raw = get_request_field('Brightness', req)
+            brightness_raw = alpaca_context(req).field('Brightness')
             
             if brightness_raw is None:
                 raise HTTPBadRequest(title="Bad Request", description="Missing 'Brightness' parameter.")
@@ -463,7 +641,7 @@ class brightness:
             if brightness < 0 or brightness > 32767:
                 raise InvalidValueException("Brightness must be between 0 and 32767.", 1280)
 
-            set_device_brightness(brightness)
+            brightness = set_device_brightness(device(devnum), brightness)
             resp.text = PropertyResponse(brightness, req).json
             
         except HTTPBadRequest as e:
@@ -473,6 +651,9 @@ class brightness:
         except InvalidValueException as e:
             resp.text = MethodResponse(req, e).json
 
+        except CircuitOpenError:
+            resp.text = MethodResponse(req, NotConnectedException()).json
+
         except Exception as e:
             resp.text = MethodResponse(req, ServerException(str(e))).json
 
@@ -480,11 +661,12 @@ class brightness:
 @before(PreProcessRequest(maxdev))
 class maxbrightness:
     def on_get(self, req: Request, resp: Response, devnum: int):
-        if not get_device_connected():
+        ctx = device(devnum)
+        if not get_device_connected(ctx):
             resp.text = PropertyResponse(None, req, NotConnectedException()).json
             return
         try:
-            val = get_max_brightness()
+            val = get_max_brightness(ctx)
             resp.text = PropertyResponse(val, req).json
         except Exception as ex:
             resp.text = PropertyResponse(None, req, DriverException(0x500, 'Covercalibrator.Maxbrightness failed', ex)).json
@@ -492,16 +674,20 @@ class maxbrightness:
 @before(PreProcessRequest(maxdev))
 class calibratoroff:
     def on_put(self, req: Request, resp: Response, devnum: int):
-        if not get_device_connected():
+        ctx = device(devnum)
+        if not get_device_connected(ctx):
             resp.text = PropertyResponse(None, req, NotConnectedException()).json
             return
         try:
-            set_device_off()
+            set_device_off(ctx)
             resp.text = MethodResponse(req).json
             
         except HTTPBadRequest as e:
             resp.status = falcon.HTTP_400
             resp.text = MethodResponse(req, InvalidValueException(str(e), 1280)).json
+
+        except CircuitOpenError:
+            resp.text = MethodResponse(req, NotConnectedException()).json
             
         except Exception as ex:
             resp.text = MethodResponse(req, DriverException(0x500, 'Covercalibrator.Calibratoroff failed', ex)).json
@@ -510,7 +696,7 @@ class calibratoroff:
 class calibratoron:
     def on_put(self, req: Request, resp: Response, devnum: int):
         try:
-            brightness_raw = get_request_field('Brightness', req)
+            brightness_raw = alpaca_context(req).field('Brightness')
 
             if brightness_raw is None:
                 raise HTTPBadRequest(title="Bad Request", description="Missing 'Brightness' parameter.")
@@ -530,61 +716,325 @@ class calibratoron:
             if brightness < 0 or brightness > 32767:
                 raise HTTPBadRequest(title="Bad Request", description="Brightness must be between 0 and 32767.")
 
-            set_device_brightness(brightness)
+            brightness = set_device_brightness(device(devnum), brightness)
             resp.text = PropertyResponse(brightness, req).json
 
         except HTTPBadRequest as e:
             resp.status = falcon.HTTP_400
             resp.text = MethodResponse(req, InvalidValueException(str(e), 1280)).json
 
+        except CircuitOpenError:
+            resp.text = MethodResponse(req, NotConnectedException()).json
+
         except Exception as e:
             resp.text = MethodResponse(req, ServerException(str(e))).json
 
 
-def get_max_brightness():
-    return load_config().get("MAX_BRIGHTNESS", 32767)
-
-def get_device_brightness():
+def get_max_brightness(ctx: DeviceContext):
+    return load_config(ctx).get("MAX_BRIGHTNESS", 32767)
+
+def _read_device_brightness(ctx: DeviceContext) -> dict:
+    """Read brightness and on/off status from the panel, bypassing cache and shadow"""
+    config = load_config(ctx)
+    base_url = config["BaseURL"]
+    response = get_transport(base_url).get("brightness", OP_READ)
+    if response.status_code != 200:
+        raise DriverException(0x500, f"Failed to get brightness. HTTP {response.status_code}")
+    data = response.json()
+    # Extract the brightness from the device response
+    if data.get("brightness") is None:
+        raise DriverException(0x500, "Brightness field missing from device response")
+    return data
+
+def get_device_brightness(ctx: DeviceContext):
+    state = request_state.get()
+    if state is None and ctx.shadow is not None:
+        state = ctx.shadow.snapshot()
+    if state is not None:
+        if ctx.shadow is not None and not state['connected']:
+            # Not the brightness last polled, while the panel is offline
+            raise CircuitOpenError(f'panel {ctx.devnum} is not connected')
+        if state['brightness'] is None:
+            error = state.get('error')
+            if isinstance(error, CircuitOpenError):
+                raise error                 # NotConnected, as below
+            if error is None:
+                raise DriverException(0x500, "Panel brightness not yet polled")
+            raise DriverException(0x500, f"Exception in get_device_brightness: {error}")
+        return state['brightness']
+    cached = ctx.cache.lookup('brightness')
+    if cached is not MISS:
+        return cached
     try:
-        config = load_config()
-        base_url = config["BaseURL"]
-        url = f"{base_url}/brightness"
-        response = requests.get(url, timeout=5)
-        if response.status_code != 200:
-            raise DriverException(0x500, f"Failed to get brightness. HTTP {response.status_code}")
-        data = response.json()
-        # Extract the brightness from the device response
-        brightness = data.get("brightness")
-        if brightness is None:
-            raise DriverException(0x500, "Brightness field missing from device response")
-        return brightness
+        return ctx.reads.do('brightness', partial(_fetch_device_brightness, ctx))["brightness"]
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print(f"[ERROR] get_device_brightness failed: {e}")
         raise DriverException(0x500, f"Exception in get_device_brightness: {e}") from e
 
+def _fetch_device_brightness(ctx: DeviceContext) -> dict:
+    """One panel brightness read, shared by the requests waiting for it"""
+    generation = ctx.cache.generation()     # A write made during the read wins
+    data = ctx.breaker.call(partial(_read_device_brightness, ctx))
+    if not data.get("changing"):
+        ctx.cache.put('brightness', data["brightness"], generation)     # Not while it is fading
+    return data
+
+def read_panel_state(ctx: DeviceContext) -> dict:
+    """Read connected, brightness, on/off status and changing flag from the panel
 
-def set_device_brightness(value):
+    One GET of the firmware's aggregated ``state`` route, falling back to
+    separate connected and brightness reads on older firmware. Bypasses
+    cache and shadow; raises if the panel cannot be reached.
+    """
+    config = load_config(ctx)
+    if ctx.state_route_supported:
+        response = get_transport(config["BaseURL"]).get("state", OP_STATUS)
+        if response.status_code == 200:
+            return _parse_state(response.json())
+        if response.status_code != 404:
+            raise DriverException(0x500, f"Failed to get panel state. HTTP {response.status_code}")
+        ctx.state_route_supported = False
+    response = ctx.client().get_connection_status(
+        client_id=0,
+        client_transaction_id=next(_panel_ctid)
+    )
+    if response.get("Value") is None:
+        raise Exception(response.get("ErrorMessage", "Panel did not report its connected state"))
+    data = _read_device_brightness(ctx)
+    return {
+        'connected': bool(response["Value"]),
+        'brightness': data["brightness"],
+        'status': data.get("status"),
+        'changing': bool(data.get("changing", False))
+    }
+
+def _parse_state(data: dict) -> dict:
+    """Panel state from the firmware's ``state`` route response"""
+    if not data.get("success", False):
+        raise DriverException(0x500, f"Panel state read failed: {data.get('error')}")
+    return {
+        'connected': bool(data["connected"]),
+        'brightness': data["brightness"],
+        'status': data.get("status"),
+        'changing': bool(data.get("changing", False))
+    }
+
+def _cache_state(ctx: DeviceContext, state: dict, generation: int):
+    ctx.cache.put('connected', state['connected'], generation)
+    if state['changing']:
+        return                  # Brightness is moving; ask again until the fade is over
+    ctx.cache.put('state', state, generation)
+    ctx.cache.put('brightness', state['brightness'], generation)
+
+_DISCONNECTED_STATE = {'connected': False, 'brightness': None, 'status': None, 'changing': False}
+
+def _unread_state(ex: Exception) -> dict:
+    """State of a panel that could not be read, carrying the reason
+
+    Answered from a request's prefetched state (ASGI mode), ``error`` gives
+    the same Alpaca error as the direct read would have.
+    """
+    state = dict(_DISCONNECTED_STATE)
+    state['error'] = ex
+    return state
+
+def get_panel_state(ctx: DeviceContext) -> dict:
+    """Connected, brightness, on/off status and changing flag, from one panel read
+
+    Served from the request's prefetched state (ASGI mode), the shadow or
+    the cache when possible. If the panel cannot be read, or its circuit
+    breaker is open, reports it as not connected.
+    """
+    state = request_state.get()
+    if state is not None:
+        return state
+    if ctx.shadow is not None:
+        return ctx.shadow.snapshot()
+    cached = ctx.cache.lookup('state')
+    if cached is not MISS:
+        return cached
     try:
-        config = load_config()
-        base_url = config["BaseURL"]
-        payload = {"Brightness": value}
-        response = requests.put(f"{base_url}/setbrightness", json=payload, timeout=5)
-        if response.status_code != 200:
-            raise DriverException(0x500, f"Failed to set brightness. HTTP {response.status_code}")
-        
-        global device_brightness
-        device_brightness = value
-        return True
+        return ctx.reads.do('state', partial(_fetch_panel_state, ctx))
+    except CircuitOpenError:
+        return dict(_DISCONNECTED_STATE)
+    except Exception as ex:
+        print(f"[ERROR] get_panel_state failed: {ex}")
+        return dict(_DISCONNECTED_STATE)
+
+def _fetch_panel_state(ctx: DeviceContext) -> dict:
+    """One panel state read, shared by the requests waiting for it"""
+    generation = ctx.cache.generation()     # A write made during the read wins
+    state = ctx.breaker.call(partial(read_panel_state, ctx))
+    _cache_state(ctx, state, generation)
+    return state
+
+# ---------------------------
+# Non-blocking reads (ASGI)
+# ---------------------------
+# Panel state already read without blocking for the request being served in
+# ASGI mode. The sync property helpers above answer from it, so the shared
+# responder classes never wait on the network on the event loop.
+request_state: ContextVar = ContextVar('request_state', default=None)
+
+async def read_panel_state_async(ctx: DeviceContext) -> dict:
+    """Non-blocking :py:func:`read_panel_state` over the asyncio transport"""
+    transport = get_async_transport(ctx.url)
+    if ctx.state_route_supported:
+        response = await transport.get("state", OP_STATUS)
+        if response.status_code == 200:
+            return _parse_state(response.json())
+        if response.status_code != 404:
+            raise DriverException(0x500, f"Failed to get panel state. HTTP {response.status_code}")
+        ctx.state_route_supported = False
+    params = {"ClientID": 0, "ClientTransactionID": next(_panel_ctid)}
+    response = await transport.get("connected", OP_STATUS, params=params)
+    connected = response.json().get("Value") if response.status_code == 200 else None
+    if connected is None:
+        raise Exception(f"Panel did not report its connected state. HTTP {response.status_code}")
+    response = await transport.get("brightness", OP_READ)
+    data = response.json() if response.status_code == 200 else {}
+    if data.get("brightness") is None:
+        raise DriverException(0x500, f"Failed to get brightness. HTTP {response.status_code}")
+    return {
+        'connected': bool(connected),
+        'brightness': data["brightness"],
+        'status': data.get("status"),
+        'changing': bool(data.get("changing", False))
+    }
+
+async def get_panel_state_async(ctx: DeviceContext) -> dict:
+    """Non-blocking :py:func:`get_panel_state`
+
+    Requests that miss the cache together share one panel read. Discovery,
+    when no panel location is known yet, runs on a worker thread.
+    """
+    if ctx.shadow is not None:
+        return ctx.shadow.snapshot()
+    cached = ctx.cache.lookup('state')
+    if cached is not MISS:
+        return cached
+    return await ctx.reads.do_async('state', partial(_fetch_panel_state_async, ctx))
+
+async def _fetch_panel_state_async(ctx: DeviceContext) -> dict:
+    generation = ctx.cache.generation()     # A write made during the read wins
+    try:
+        state = await ctx.breaker.call_async(partial(_resolve_and_read_async, ctx))
+    except CircuitOpenError as ex:
+        return _unread_state(ex)
+    except Exception as ex:
+        print(f"[ERROR] get_panel_state_async failed: {ex}")
+        return _unread_state(ex)
+    _cache_state(ctx, state, generation)
+    return state
+
+async def _resolve_and_read_async(ctx: DeviceContext) -> dict:
+    if not ctx.url:
+        await asyncio.get_running_loop().run_in_executor(None, resolve_url, ctx)
+    return await read_panel_state_async(ctx)
+
+# -------
+# METRICS
+# -------
+# Per-panel counters kept by the DeviceContext helpers, read at scrape time
+_BREAKER_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def _panel_metrics() -> list:
+    cache, calls, saved, submitted, applied = [], [], [], [], []
+    breaker_state, breaker_opened, breaker_rejected, connections = [], [], [], []
+    for ctx in devices:
+        device_label = {'device': ctx.devnum}
+        stats = ctx.cache.stats()
+        cache.append(({'device': ctx.devnum, 'result': 'hit'}, stats['hits']))
+        cache.append(({'device': ctx.devnum, 'result': 'miss'}, stats['misses']))
+        for key, counts in ctx.reads.stats().items():
+            calls.append(({'device': ctx.devnum, 'read': key}, counts['calls']))
+            saved.append(({'device': ctx.devnum, 'read': key}, counts['saved']))
+        stats = ctx.writer.stats()
+        submitted.append((device_label, stats['submitted']))
+        applied.append((device_label, stats['applied']))
+        stats = ctx.breaker.stats()
+        breaker_state.append((device_label, _BREAKER_STATES[stats['state']]))
+        breaker_opened.append((device_label, stats['opened']))
+        breaker_rejected.append((device_label, stats['rejected']))
+        if ctx.url:
+            opened = sync_transport.connections_opened(ctx.url) + aiotransport.connections_opened(ctx.url)
+            connections.append((device_label, opened))
+    return [
+        ('flataf_cache_lookups_total', 'counter', 'Property cache lookups by result', cache),
+        ('flataf_panel_reads_total', 'counter', 'Panel reads made for property requests', calls),
+        ('flataf_panel_reads_saved_total', 'counter', 'Requests answered by a panel read already in flight', saved),
+        ('flataf_writes_submitted_total', 'counter', 'Brightness and off writes asked for', submitted),
+        ('flataf_writes_applied_total', 'counter', 'Brightness and off writes sent to the panel', applied),
+        ('flataf_breaker_state', 'gauge', 'Panel circuit breaker (0 closed, 1 half-open, 2 open)', breaker_state),
+        ('flataf_breaker_opened_total', 'counter', 'Times the panel circuit breaker opened', breaker_opened),
+        ('flataf_breaker_rejected_total', 'counter', 'Calls failed fast by an open breaker', breaker_rejected),
+        ('flataf_panel_connections_total', 'counter',
+         'TCP connections opened to the panel (fewer than requests when kept alive)', connections),
+    ]
+
+metrics.register_collector(_panel_metrics)
+
+def start_shadow_poller(interval: float) -> list:
+    """Switch property reads over to shadows kept by background pollers, one per panel"""
+    for ctx in devices:
+        ctx.shadow = PanelShadow()
+        read = partial(ctx.breaker.call, partial(read_panel_state, ctx))
+        ctx.shadow_poller = ShadowPoller(ctx.shadow, read, interval)
+        ctx.shadow_poller.name = f'ShadowPoller-{ctx.devnum}'
+        ctx.shadow_poller.start()
+    return [ctx.shadow_poller for ctx in devices]
+
+
+def set_device_brightness(ctx: DeviceContext, value):
+    """Set the panel brightness; returns the brightness the panel was left at
+
+    Part of a burst of writes, this may be replaced by a later brightness
+    or off write (see :py:class:`writecoalescer.WriteCoalescer`). The
+    result is then that write's brightness.
+    """
+    try:
+        return ctx.writer.submit(partial(ctx.breaker.call, partial(_write_brightness, ctx, value)))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         print(f"[ERROR] set_device_brightness failed: {e}")
         raise DriverException(0x500, f"Exception in set_device_brightness: {e}") from e
-    
-def set_device_on():
+
+def _write_brightness(ctx: DeviceContext, value) -> int:
+    config = load_config(ctx)
+    base_url = config["BaseURL"]
+    payload = {"Brightness": value}
+    response = None
+    if Config.fade and ctx.fade_route_supported:
+        response = get_transport(base_url).put("fadebrightness", OP_WRITE,
+                                               json={"Brightness": value, "Duration": Config.fade})
+        if response.status_code == 404:
+            ctx.fade_route_supported = False    # Older firmware: set it at once
+            response = None
+    fading = response is not None
+    if response is None:
+        response = get_transport(base_url).put("setbrightness", OP_WRITE, json=payload)
+    ctx.cache.invalidate('brightness')
+    if response.status_code != 200:
+        raise DriverException(0x500, f"Failed to set brightness. HTTP {response.status_code}")
+
+    ctx.brightness = value
+    if fading:
+        # The panel is on its way; its brightness is read until it gets there
+        ctx.remember(status="ON" if value > 0 else "OFF")
+        if ctx.shadow is not None:
+            ctx.shadow.update(changing=True)
+    else:
+        ctx.remember(brightness=value, status="ON" if value > 0 else "OFF")
+    return value
+
+def set_device_on(ctx: DeviceContext):
     try:
-        config = load_config()
+        config = load_config(ctx)
         base_url = config["BaseURL"]
-        device = ASCOMDeviceClient(base_url)
-        response = requests.put(f"{base_url}/calibratoron", timeout=5)
+        response = get_transport(base_url).put("calibratoron", OP_WRITE)
         if response.status_code != 200:
             raise DriverException(0x500, f"Failed to turn calibrator on. HTTP {response.status_code}")
  
@@ -592,19 +1042,27 @@ def set_device_on():
     except Exception as e:
         raise DriverException(0x500, f"Exception in set_device_on: {e}")
     
-def set_device_off():
+def set_device_off(ctx: DeviceContext):
+    """Turn the panel off (merged with brightness writes, as above)"""
     try:
-        config = load_config()
-        base_url = config["BaseURL"]
-        device = ASCOMDeviceClient(base_url)
-        response = requests.put(f"{base_url}/calibratoroff", timeout=5)
-        if response.status_code != 200:
-            raise DriverException(0x500, f"Failed to turn calibrator off. HTTP {response.status_code}")
-
-        return True
+        return ctx.writer.submit(partial(ctx.breaker.call, partial(_write_off, ctx)))
+    except CircuitOpenError:
+        raise
     except Exception as e:
         raise DriverException(0x500, f"Exception in set_device_off: {e}")
 
+def _write_off(ctx: DeviceContext) -> int:
+    config = load_config(ctx)
+    base_url = config["BaseURL"]
+    response = get_transport(base_url).put("calibratoroff", OP_WRITE)
+    ctx.cache.invalidate('brightness')
+    if response.status_code != 200:
+        raise DriverException(0x500, f"Failed to turn calibrator off. HTTP {response.status_code}")
+
+    ctx.brightness = 0
+    ctx.remember(brightness=0, status="OFF")
+    return 0
+
 # def set_calibrator_brightness(brightness):
 #     print(f"Setting calibrator brightness to {brightness}")
 
@@ -626,7 +1084,7 @@ class opencover:
 @before(PreProcessRequest(maxdev))
 class covermoving:
     def on_get(self, req: Request, resp: Response, devnum: int):
-        if not get_device_connected():
+        if not get_device_connected(device(devnum)):
             resp.text = PropertyResponse(None, req, NotConnectedException()).json
             return
         try:
@@ -641,7 +1099,7 @@ def is_cover_moving():
 @before(PreProcessRequest(maxdev))
 class coverstate:
     def on_get(self, req: Request, resp: Response, devnum: int):
-        if not get_device_connected():
+        if not get_device_connected(device(devnum)):
             resp.text = PropertyResponse(None, req, NotConnectedException()).json
             return
         try:
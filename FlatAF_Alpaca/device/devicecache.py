@@ -0,0 +1,102 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# devicecache.py - TTL-bounded cache of panel state
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 Polling clients (NINA at 1 Hz) read values that almost
+#               never change. Each property is served from memory until its
+#               staleness bound expires; driver writes to the panel update or
+#               invalidate the cached value.
+# 18-Oct-2026   dr 0.0.3 A generation counter, bumped by every invalidation,
+#               lets a panel read that was overtaken by a driver write drop its
+#               (older) value.
+#
+import threading
+import time
+
+MISS = object()     # Sentinel returned by lookup() when no fresh value is held
+
+class DeviceStateCache:
+    """Per-property TTL cache with write-through and hit/miss counters
+
+    A read from the panel takes :py:meth:`generation` before its round trip
+    and passes it to :py:meth:`put`. If a write was remembered (or anything
+    invalidated) meanwhile, the value read may predate that write and is
+    dropped rather than cached for a whole TTL.
+
+    Args:
+        ttls: Mapping of property name to staleness bound in seconds. A
+            property with no entry, or a bound of 0, is never cached.
+    """
+
+    def __init__(self, ttls: dict):
+        self.ttls = dict(ttls)
+        self.hits = 0
+        self.misses = 0
+        self.dropped = 0            # Values read before a write landed, not cached
+        self._generation = 0        # Bumped by invalidate()
+        self._values = {}           # name -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def lookup(self, name: str):
+        """Return the cached value of a property, or ``MISS`` if stale or absent"""
+        with self._lock:
+            entry = self._values.get(name)
+            if entry is not None and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return MISS
+
+    def generation(self) -> int:
+        """Current generation, to pass to :py:meth:`put` after a panel read"""
+        with self._lock:
+            return self._generation
+
+    def put(self, name: str, value, generation: int = None):
+        """Store a value just read from, or written to, the panel
+
+        Args:
+            generation: For a value read from the panel, :py:meth:`generation`
+                as taken before the read. The value is dropped if the cache
+                was invalidated since. Omitted for write-through.
+        """
+        ttl = self.ttls.get(name, 0)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self.dropped += 1
+                return
+            self._values[name] = (value, time.monotonic() + ttl)
+
+    def invalidate(self, name: str = None):
+        """Drop one property, or everything if no name is given
+
+        Also starts a new generation, so reads already in flight are not
+        cached.
+        """
+        with self._lock:
+            self._generation += 1
+            if name is None:
+                self._values.clear()
+            else:
+                self._values.pop(name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'dropped': self.dropped,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }
@@ -0,0 +1,103 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# devicecontext.py - Per-panel driver state shared by request threads
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 Replaces the covercalibrator module globals
+#               (discovered_url, device_brightness, connection_state and
+#               friends) so several Alpaca clients can be served on worker
+#               threads at the same time.
+# 18-Oct-2026   dr 0.0.3 One context per Alpaca device number when serving
+#               several panels.
+#
+import threading
+
+from ascom_api import ASCOMDeviceClient
+from circuitbreaker import CircuitBreaker
+from devicecache import DeviceStateCache
+from singleflight import SingleFlight
+from writecoalescer import WriteCoalescer
+
+class DeviceContext:
+    """Everything the driver knows about one panel
+
+    Single attribute reads are safe from any thread. Changes of panel
+    location go through :py:meth:`set_url`, and a blocking discovery is
+    run by one thread at a time through :py:meth:`resolve_url`.
+
+    Args:
+        devnum: Alpaca device number served from this context
+        ttls: Cache staleness bounds (see :py:class:`DeviceStateCache`)
+        settle: Minimum seconds between brightness writes to the panel
+            (see :py:class:`WriteCoalescer`)
+        breaker: Keyword arguments for the panel's :py:class:`CircuitBreaker`
+    """
+
+    def __init__(self, devnum: int = 0, ttls: dict = None, settle: float = 0.0, breaker: dict = None):
+        self.devnum = devnum
+        self.url = ''                       # Panel BaseURL, '' until discovered
+        self.panel = None                   # Discovery info (UniqueID etc.) of the panel at url
+        self.pinned = False                 # url fixed in config.toml, never rediscovered
+        self.brightness = 32767             # Last brightness written by the driver
+        self.connection_state = False       # Last Connected value written by the driver
+        self.cache = DeviceStateCache(ttls or {})
+        self.writer = WriteCoalescer(settle)    # Brightness and on/off writes
+        self.reads = SingleFlight()             # Panel reads shared by concurrent requests
+        self.breaker = CircuitBreaker(f'panel {devnum}', **(breaker or {}))
+        self.shadow = None                  # PanelShadow when [shadow] is enabled
+        self.shadow_poller = None
+        self.state_route_supported = True   # Cleared on firmware without /state
+        self.fade_route_supported = True    # Cleared on firmware without /fadebrightness
+        self._client = None
+        self._lock = threading.Lock()
+        self._discovery_lock = threading.Lock()
+
+    def set_url(self, url: str) -> bool:
+        """Point at a panel location; returns True if it changed"""
+        with self._lock:
+            if url == self.url:
+                return False
+            self.url = url
+            self._client = None
+        self.cache.invalidate()
+        return True
+
+    def resolve_url(self, discover) -> str:
+        """Return the panel URL, running ``discover()`` if none is known
+
+        Threads arriving while a discovery is running wait for it and use
+        its result rather than broadcasting again.
+        """
+        if self.url:
+            return self.url
+        with self._discovery_lock:
+            if not self.url:
+                self.set_url(discover())
+        return self.url
+
+    def client(self) -> ASCOMDeviceClient:
+        """ASCOM client for the current panel URL (pooled transport underneath)"""
+        with self._lock:
+            if self._client is None or self._client.base_url != self.url.rstrip('/'):
+                self._client = ASCOMDeviceClient(self.url)
+            return self._client
+
+    def remember(self, **fields):
+        """Write-through of panel state the driver has just written
+
+        Starts a new cache generation (through the invalidation), so a panel
+        read already in flight does not overwrite these values.
+        """
+        self.cache.invalidate('state')
+        for name, value in fields.items():
+            self.cache.put(name, value)
+        if self.shadow is not None:
+            self.shadow.update(**fields)
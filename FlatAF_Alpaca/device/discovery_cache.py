@@ -0,0 +1,131 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# discovery_cache.py - Persisted panel location and background rediscovery
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 The last panel found by discovery is saved to disk. At
+#               startup the driver uses it right away, checks it with a unicast
+#               probe, and only falls back to a broadcast (up to
+#               DISCOVERY_TIMEOUT) in the background.
+# 18-Oct-2026   dr 0.0.3 Serving several panels, the file holds one entry per
+#               Alpaca device number, so each panel keeps its device number
+#               across restarts.
+# 18-Oct-2026   dr 0.0.3 Replies from panels pinned in config.toml do not end a
+#               rediscovery broadcast early.
+#
+import json
+import threading
+import time
+from logging import Logger
+from pathlib import Path
+from config import Config
+from dynamic_discovery import discover_all, probe_flataf
+
+logger: Logger = None
+
+def _cache_path() -> Path:
+    path = Path(Config.discovery_cache_file)
+    if not path.is_absolute():
+        path = Path(__file__).parent / path
+    return path
+
+def load_cached_panels() -> list:
+    """Return the saved panel info (BaseURL plus identity) by device number
+
+    Entries are None for device numbers with no saved panel. A file
+    written for a single panel (one info object) is device number 0.
+    """
+    try:
+        with open(_cache_path()) as f:
+            data = json.load(f)
+        if 'Panels' in data:
+            return [p if p and p.get('BaseURL') else None for p in data['Panels']]
+        if data.get('BaseURL'):
+            return [data]
+    except FileNotFoundError:
+        pass
+    except Exception as ex:
+        if logger:
+            logger.warning(f'Ignoring unreadable discovery cache: {ex}')
+    return []
+
+def save_cached_panels(panels: list):
+    """Persist panel info by device number. Failures are logged, not raised."""
+    try:
+        data = {
+            'Panels': panels,
+            'Saved': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }
+        path = _cache_path()
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2)
+        tmp.replace(path)
+    except Exception as ex:
+        if logger:
+            logger.warning(f'Could not save discovery cache: {ex}')
+
+
+class Rediscovery(threading.Thread):
+    """Background task that validates and refreshes the panel locations
+
+    Args:
+        current_urls: Callable returning the BaseURLs the driver is using now,
+            one per panel it finds by discovery ('' if not yet known)
+        on_found: Callable taking the list of panel info dicts from a
+            broadcast, when a panel did not answer at its known location
+        pinned_urls: Callable returning the BaseURLs pinned in config.toml,
+            whose replies to a broadcast are not counted as panels found
+    """
+
+    def __init__(self, current_urls, on_found, pinned_urls=lambda: ()):
+        threading.Thread.__init__(self, name='Rediscovery')
+        self.current_urls = current_urls
+        self.on_found = on_found
+        self.pinned_urls = pinned_urls
+        self.validated = threading.Event()      # Set once every panel location is confirmed
+        self.searching = threading.Event()      # Set while a broadcast is in progress
+        self._stop_event = threading.Event()
+        self.daemon = True
+
+    def check(self):
+        """Probe the current locations; broadcast only if a probe fails"""
+        urls = self.current_urls()
+        lost = [url for url in urls if not (url and probe_flataf(url, Config.discovery_probe_timeout))]
+        if not lost:
+            self.validated.set()
+            return
+        if logger:
+            for url in lost:
+                if url:
+                    logger.warning(f'Panel did not answer probe at {url}, rediscovering')
+        self.searching.set()
+        try:
+            panels = discover_all(expected=len(urls), ignore=set(self.pinned_urls()))
+            if not panels:
+                raise Exception('nothing answered the broadcast')
+        except Exception as ex:
+            if logger:
+                logger.warning(f'Rediscovery found no panel: {ex}')
+            return
+        finally:
+            self.searching.clear()
+        self.on_found(panels)
+        self.validated.set()
+
+    def run(self):
+        """Check at startup, then every rediscovery_interval seconds"""
+        while not self._stop_event.is_set():
+            self.check()
+            self._stop_event.wait(Config.rediscovery_interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -7,67 +7,354 @@
 # Copyright (c) 2025 Douglas Reynolds AstroAF
 # -----------------------------------------------------------------------------
 # dynamic_discovery.py
+#
+# Discovery sends a directed broadcast out of every local IPv4 interface at
+# once (plus the limited broadcast from each), collects every FlatAF reply
+# into a registry keyed by panel identity, and returns as soon as the
+# expected number of panels has answered (panels pinned in config.toml are
+# not counted). Blocking and asyncio APIs share the same matching and
+# registry code.
 
+import asyncio
+import os
+import selectors
 import socket
 import json
+import struct
+import threading
 import time
 import logging
+from urllib.parse import urlsplit
+
+import metrics
 
 DISCOVERY_PORT = 32227
 DISCOVERY_TIMEOUT = 3  # seconds
 DISCOVERY_MAGIC = 0x4C504143  # 'ALPACA'
+DISCOVERY_PAYLOAD = json.dumps({"AlpacaDiscovery": 1}).encode('utf-8')
 
-def discover_flataf():
-    """
-    Broadcasts an Alpaca discovery message and listens for a FlatAF device.
-    Returns the device BaseURL if found, otherwise raises Exception.
-    """
-    discovery_message = {
-        "AlpacaDiscovery": 1
+def _is_flataf(response: dict) -> bool:
+    """Match a discovery reply from a FlatAF panel (Manufacturer + DeviceType)"""
+    return bool(response.get('AlpacaPort') and
+                response.get('Manufacturer', '').lower() == 'astroaf' and
+                response.get('DeviceType', '').lower() == 'covercalibrator')
+
+def _panel_info(response: dict, ip: str) -> dict:
+    """Identity and BaseURL of a panel from its discovery reply"""
+    port = response['AlpacaPort']
+    return {
+        'BaseURL': f"http://{ip}:{port}/api/v1/covercalibrator/0",
+        'Address': ip,
+        'AlpacaPort': port,
+        'Manufacturer': response.get('Manufacturer', ''),
+        'DeviceType': response.get('DeviceType', ''),
+        'DeviceName': response.get('DeviceName', ''),
+        # Older firmware has no UniqueID; fall back to where it answered
+        'UniqueID': response.get('UniqueID') or f"{ip}:{port}"
     }
 
-    sock = None
+# ----------------------
+# Local IPv4 interfaces
+# ----------------------
+def _linux_interfaces() -> list:
+    """(address, broadcast) for each configured IPv4 interface, via ioctl"""
+    import fcntl
+    SIOCGIFADDR = 0x8915
+    SIOCGIFBRDADDR = 0x8919
+    result = []
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        # Set up UDP socket
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.settimeout(DISCOVERY_TIMEOUT)
+        for _, name in socket.if_nameindex():
+            req = struct.pack('256s', name.encode()[:15])
+            try:
+                addr = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, req)[20:24])
+            except OSError:
+                continue                        # Interface has no IPv4 address
+            try:
+                bcast = socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFBRDADDR, req)[20:24])
+            except OSError:
+                bcast = None
+            result.append((addr, bcast))
+    finally:
+        sock.close()
+    return result
+
+def _guess_broadcast(addr: str) -> str:
+    """Directed broadcast assuming a /24, the common home/observatory LAN"""
+    return '.'.join(addr.split('.')[:3] + ['255'])
+
+def local_interfaces() -> list:
+    """Return (address, directed broadcast) for every non-loopback IPv4 interface
+
+    Uses ioctl on Linux. Elsewhere (Windows, macOS) uses the addresses bound
+    to the host name plus the default-route address, and assumes /24 subnets.
+    """
+    found = []
+    if hasattr(socket, 'if_nameindex') and os.name == 'posix':
+        try:
+            found = _linux_interfaces()
+        except Exception:
+            found = []
+    if not found:
+        addrs = set()
+        try:
+            for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+                addrs.add(info[4][0])
+        except OSError:
+            pass
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.connect(('10.255.255.255', 1))     # No packet sent; selects the default route
+            addrs.add(s.getsockname()[0])
+            s.close()
+        except OSError:
+            pass
+        found = [(a, _guess_broadcast(a)) for a in addrs]
+    return [(a, b or _guess_broadcast(a)) for a, b in found if not a.startswith('127.')]
 
-        # Send discovery broadcast
-        payload = json.dumps(discovery_message).encode('utf-8')
-        sock.sendto(payload, ('<broadcast>', DISCOVERY_PORT))
-        logging.info("[Discovery] Broadcast sent.")
+# ---------------
+# Panel registry
+# ---------------
+class PanelRegistry:
+    """Discovered panels keyed by identity (UniqueID, else address:port)"""
 
-        start_time = time.time()
+    def __init__(self):
+        self._panels = {}
+        self._lock = threading.Lock()
 
-        while time.time() - start_time < DISCOVERY_TIMEOUT:
+    def add(self, info: dict) -> bool:
+        """Record a panel; returns True if it was not already known"""
+        with self._lock:
+            new = info['UniqueID'] not in self._panels
+            self._panels[info['UniqueID']] = info
+            return new
+
+    def panels(self) -> list:
+        """Panels in a stable order (by address, then port)"""
+        with self._lock:
+            return sorted(self._panels.values(), key=lambda p: (p['Address'], p['AlpacaPort']))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._panels)
+
+    def count(self, ignore=()) -> int:
+        """Panels whose BaseURL is not in ``ignore``"""
+        with self._lock:
+            return sum(1 for p in self._panels.values() if p['BaseURL'] not in ignore)
+
+    def __contains__(self, identity):
+        with self._lock:
+            return identity in self._panels
+
+    def __getitem__(self, identity):
+        with self._lock:
+            return self._panels[identity]
+
+# ----------------
+# Discovery engine
+# ----------------
+class DiscoveryEngine:
+    """Parallel Alpaca discovery across interfaces for FlatAF panels
+
+    Args:
+        interfaces: Local IPv4 addresses to send from. Empty or None means
+            every interface found by :py:func:`local_interfaces`.
+        port: Alpaca discovery port the panels listen on
+        timeout: Longest time to wait for replies, in seconds
+        targets: Extra unicast/broadcast addresses to query from every
+            interface (e.g. panels on a routed subnet)
+    """
+
+    def __init__(self, interfaces: list = None, port: int = DISCOVERY_PORT,
+                 timeout: float = DISCOVERY_TIMEOUT, targets: list = None):
+        self.port = port
+        self.timeout = timeout
+        self.targets = list(targets or [])
+        if interfaces:
+            self.interfaces = [(a, _guess_broadcast(a)) for a in interfaces]
+        else:
+            self.interfaces = local_interfaces()
+        self.registry = PanelRegistry()
+
+    def _destinations(self, bcast: str) -> list:
+        dests = self.targets + ([bcast, '255.255.255.255'] if bcast else [])
+        return list(dict.fromkeys(dests))       # De-duplicate, keep order
+
+    def _open_sockets(self) -> list:
+        """One broadcast-capable UDP socket bound to each interface address"""
+        socks = []
+        bind_list = self.interfaces or [('0.0.0.0', '255.255.255.255')]
+        for addr, bcast in bind_list:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             try:
-                data, addr = sock.recvfrom(1024)
-                response = json.loads(data.decode('utf-8'))
-
-                # Match device based on Manufacturer + DeviceType
-                if (response.get('AlpacaPort') and
-                    response.get('Manufacturer', '').lower() == 'astroaf' and
-                    response.get('DeviceType', '').lower() == 'covercalibrator'):
-
-                    ip = addr[0]
-                    port = response['AlpacaPort']
-                    base_url = f"http://{ip}:{port}/api/v1/covercalibrator/0"
-                    logging.info(f"[Discovery] FlatAF found at {base_url}")
-                    return base_url
-
-            except socket.timeout:
-                break
-            except Exception as e:
-                logging.error(f"[Discovery] Error parsing discovery response: {e}", extra={"location": "dynamic_discovery.discover_flataf"})
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+                sock.bind((addr, 0))
+                sock.setblocking(False)
+            except OSError as e:
+                logging.warning(f"[Discovery] Cannot use interface {addr}: {e}")
+                sock.close()
                 continue
+            socks.append((sock, self._destinations(bcast)))
+        return socks
 
-    except Exception as e:
-        logging.error(f"[Discovery] Error during broadcast: {e}", extra={"location": "dynamic_discovery.discover_flataf"})
+    def _send(self, sock, dests):
+        for dest in dests:
+            try:
+                sock.sendto(DISCOVERY_PAYLOAD, (dest, self.port))
+            except OSError as e:
+                logging.info(f"[Discovery] Send to {dest} from {sock.getsockname()[0]} failed: {e}")
 
-    finally:
-        if sock:
-            sock.close()
+    def _handle(self, data: bytes, addr) -> bool:
+        """Parse a reply; returns True if it added a new panel"""
+        try:
+            response = json.loads(data.decode('utf-8'))
+        except Exception as e:
+            logging.error(f"[Discovery] Error parsing discovery response: {e}", extra={"location": "dynamic_discovery.DiscoveryEngine"})
+            return False
+        if not _is_flataf(response):
+            return False
+        info = _panel_info(response, addr[0])
+        if self.registry.add(info):
+            logging.info(f"[Discovery] FlatAF found at {info['BaseURL']} ({info['UniqueID']})")
+            return True
+        return False
+
+    def _done(self, expected, ignore) -> bool:
+        return expected is not None and self.registry.count(ignore) >= expected
+
+    def discover(self, expected: int = None, ignore=()) -> list:
+        """Blocking discovery
+
+        Args:
+            expected: Return as soon as this many panels have answered.
+                None waits the full timeout and returns all that answered.
+            ignore: BaseURLs of panels not counted towards ``expected``
+                (panels pinned in config.toml). They are still returned.
+
+        Returns:
+            List of panel info dicts (see :py:class:`PanelRegistry`)
+        """
+        start = time.perf_counter()
+        socks = self._open_sockets()
+        sel = selectors.DefaultSelector()
+        try:
+            for sock, dests in socks:
+                sel.register(sock, selectors.EVENT_READ)
+                self._send(sock, dests)
+            deadline = time.monotonic() + self.timeout
+            while not self._done(expected, ignore):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not socks:
+                    break
+                for key, _ in sel.select(remaining):
+                    try:
+                        data, addr = key.fileobj.recvfrom(1024)
+                    except OSError:
+                        continue
+                    self._handle(data, addr)
+        finally:
+            sel.close()
+            for sock, _ in socks:
+                sock.close()
+        return self._finished(start)
+
+    async def discover_async(self, expected: int = None, ignore=()) -> list:
+        """asyncio discovery, same semantics as :py:meth:`discover`"""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+        engine = self
+
+        class _Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                if engine._handle(data, addr) and engine._done(expected, ignore) and not finished.done():
+                    finished.set_result(True)
+
+        transports = []
+        try:
+            for sock, dests in self._open_sockets():
+                transport, _ = await loop.create_datagram_endpoint(_Protocol, sock=sock)
+                transports.append(transport)
+                for dest in dests:
+                    try:
+                        transport.sendto(DISCOVERY_PAYLOAD, (dest, self.port))
+                    except OSError as e:
+                        logging.info(f"[Discovery] Send to {dest} failed: {e}")
+            if not self._done(expected, ignore):
+                try:
+                    await asyncio.wait_for(finished, self.timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for transport in transports:
+                transport.close()
+        return self._finished(start)
+
+    def _finished(self, start: float) -> list:
+        panels = self.registry.panels()
+        metrics.discovery_seconds.observe(time.perf_counter() - start, 'found' if panels else 'none')
+        return panels
+
+# ----------------
+# Module-level API
+# ----------------
+def _engine(timeout: float = DISCOVERY_TIMEOUT) -> DiscoveryEngine:
+    from config import Config
+    return DiscoveryEngine(interfaces=Config.discovery_interfaces or None,
+                           timeout=timeout,
+                           targets=Config.discovery_targets or None)
+
+def discover_all(expected: int = None, timeout: float = DISCOVERY_TIMEOUT, ignore=()) -> list:
+    """Blocking: every FlatAF panel that answers, stopping early at ``expected`` not in ``ignore``"""
+    return _engine(timeout).discover(expected, ignore)
+
+async def discover_all_async(expected: int = None, timeout: float = DISCOVERY_TIMEOUT, ignore=()) -> list:
+    """asyncio: every FlatAF panel that answers, stopping early at ``expected`` not in ``ignore``"""
+    return await _engine(timeout).discover_async(expected, ignore)
+
+def discover_flataf():
+    """
+    Broadcasts an Alpaca discovery message and listens for a FlatAF device.
+    Returns the device BaseURL if found, otherwise raises Exception.
+    """
+    return discover_flataf_info()['BaseURL']
 
+def discover_flataf_info():
+    """
+    Broadcasts an Alpaca discovery message on every interface and returns
+    the first FlatAF panel that answers (BaseURL plus identity), otherwise
+    raises Exception.
+    """
+    panels = discover_all(expected=1)
+    if panels:
+        return panels[0]
     # No valid device found after timeout
     raise Exception("dynamic_discovery.discover_flataf: FlatAF device not found on the network after broadcast timeout. Ensure the device is powered on and connected to the same subnet.")
+
+def probe_flataf(base_url: str, timeout: float = 0.5, port: int = DISCOVERY_PORT):
+    """
+    Sends a unicast Alpaca discovery message to the host of a known BaseURL.
+    Returns the panel info if a FlatAF answers on the same Alpaca port,
+    otherwise None. Costs one UDP round trip instead of a broadcast wait.
+    """
+    parts = urlsplit(base_url)
+    if not parts.hostname:
+        return None
+    sock = None
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(timeout)
+        sock.sendto(DISCOVERY_PAYLOAD, (parts.hostname, port))
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            data, addr = sock.recvfrom(1024)
+            response = json.loads(data.decode('utf-8'))
+            if _is_flataf(response) and response['AlpacaPort'] == parts.port:
+                return _panel_info(response, addr[0])
+    except Exception as e:
+        logging.info(f"[Discovery] Probe of {parts.hostname} failed: {e}")
+    finally:
+        if sock:
+            sock.close()
+    return None
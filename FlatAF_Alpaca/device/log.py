@@ -38,9 +38,18 @@
 # 15-Jan-2023   rbd 0.1 Documentation. No logic changes.
 # 08-Nov-2023   rbd 0.4 Log name is now 'alpyca'
 # 17-Feb-2024   rbd 0.6 Additional documentation.
+# 18-Oct-2026   dr 0.0.3 Handlers moved behind a QueueHandler/QueueListener so request
+#               threads never wait on the disk. Optional JSON-lines format.
+#               Per-endpoint rate limit for request logging of frequent polls.
+# 18-Oct-2026   dr 0.0.3 Roll the old log over at startup only if there is one to roll.
 
+import atexit
+import json
 import logging
 import logging.handlers
+import os
+import queue
+import threading
 import time
 from config import Config
 
@@ -48,6 +57,40 @@ global logger
 #logger: logging.Logger = None  # Master copy (root) of the logger
 logger = None                   # Safe on Python 3.7 but no intellisense in VSCode etc.
 
+_listener: logging.handlers.QueueListener = None
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers and ``jq``
+
+    Keys: ``ts`` (UTC, ISO with milliseconds), ``level``, ``thread``,
+    ``msg`` and, if there is one, ``exc`` (the formatted traceback).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a listener in this process
+
+    The stock ``prepare()`` formats the whole record (as if it were being
+    pickled to another process). Here only the message arguments are merged,
+    in case they change later. Formatting, exception text included, is left
+    to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
 def init_logging():
     """ Create the logger - called at app startup
 
@@ -67,15 +110,26 @@ def init_logging():
         there is an option to cause logged messages to go to the console for
         debugging purposes. A new log is started each time the app is started.
 
+        With ``queue = true`` (the default) in the ``[logging]`` section the
+        stdout and file handlers are run by a background
+        ``QueueListener``. The logger itself only has a ``QueueHandler``, so
+        a request thread pays for building the message, not for the write
+        (or a slow disk, or a log rotation). ``format = 'jsonl'`` selects
+        :py:class:`JsonLinesFormatter` for both handlers.
+
     Returns:
         Customized Python logger.
 
     """
+    global _listener
 
     logging.basicConfig(level=Config.log_level)
     logger = logging.getLogger()                # Root logger, see above
-    formatter = logging.Formatter('%(asctime)s.%(msecs)03d %(levelname)s %(message)s', '%Y-%m-%dT%H:%M:%S')
-    formatter.converter = time.gmtime           # UTC time
+    if Config.log_format == 'jsonl':
+        formatter = JsonLinesFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s.%(msecs)03d %(levelname)s %(message)s', '%Y-%m-%dT%H:%M:%S')
+        formatter.converter = time.gmtime       # UTC time
     logger.handlers[0].setFormatter(formatter)  # This is the stdout handler, level set above
     # Add a logfile handler, same formatter and level
     handler = logging.handlers.RotatingFileHandler('covercalibrator.log',
@@ -85,7 +139,8 @@ def init_logging():
                                                     backupCount=Config.num_keep_logs)
     handler.setLevel(Config.log_level)
     handler.setFormatter(formatter)
-    handler.doRollover()                                            # Always start with fresh log
+    if os.path.isfile(handler.baseFilename) and os.path.getsize(handler.baseFilename) > 0:
+        handler.doRollover()                                        # Always start with fresh log
     logger.addHandler(handler)
     if not Config.log_to_stdout:
         """
@@ -96,4 +151,64 @@ def init_logging():
         """
         logger.debug('Logging to stdout disabled in settings')
         logger.removeHandler(logger.handlers[0])    # This is the stdout handler
-    return logger
\ No newline at end of file
+    if Config.log_queue is not False:
+        _listener = queue_handlers(logger)
+        atexit.register(stop_logging)
+    return logger
+
+def queue_handlers(logger: logging.Logger) -> logging.handlers.QueueListener:
+    """Move the logger's handlers onto a started background listener
+
+    Returns:
+        The ``QueueListener``; ``stop()`` it to write out what is queued.
+    """
+    handlers = list(logger.handlers)
+    for h in handlers:
+        logger.removeHandler(h)
+    listener = logging.handlers.QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+    logger.addHandler(_LocalQueueHandler(listener.queue))
+    logging.logMultiprocessing = False          # Not in our formats; saves work per record
+    logging.logProcesses = False
+    listener.start()
+    return listener
+
+def stop_logging():
+    """Write out anything still queued and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+
+class EndpointRateLimit:
+    """Decides whether a request to a frequently polled endpoint is logged
+
+    Clients poll properties like ``connected`` several times a second.
+    Endpoints listed in ``[logging] endpoint_interval`` are logged at most
+    once per their interval in seconds. The next line logged for an endpoint
+    says how many requests were skipped since the last one. Other
+    endpoints, and every PUT, are always logged.
+
+    Args:
+        intervals: Endpoint name (last path segment, lower case) to seconds
+    """
+
+    def __init__(self, intervals: dict):
+        self.intervals = {k.lower(): float(v) for k, v in (intervals or {}).items()}
+        self._next = {}                         # Endpoint -> monotonic time it may log again
+        self._skipped = {}                      # Endpoint -> requests not logged since
+        self._lock = threading.Lock()
+
+    def admit(self, endpoint: str):
+        """Return None to skip logging, else the number skipped since the last logged request"""
+        interval = self.intervals.get(endpoint)
+        if interval is None:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next.get(endpoint, 0.0):
+                self._skipped[endpoint] = self._skipped.get(endpoint, 0) + 1
+                return None
+            self._next[endpoint] = now + interval
+            return self._skipped.pop(endpoint, 0)
+
+endpoint_rate_limit = EndpointRateLimit(Config.log_endpoint_interval)
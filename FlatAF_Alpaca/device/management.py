@@ -43,12 +43,19 @@
 #               Enhanced logging.
 # 23-May-2023   rbd 0.2 Refactoring for  multiple ASCOM device type support
 #               GitHub issue #1
+# 18-Oct-2026   dr 0.0.3 One ConfiguredDevices entry per FlatAF panel served
+# 18-Oct-2026   dr 0.0.3 Driver metrics (Prometheus text format)
+# 18-Oct-2026   dr 0.0.3 Startup timing report
+# 18-Oct-2026   dr 0.0.3 Panel state cache counters per device (cache)
 #
 from falcon import Request, Response # type: ignore
 from shr import PropertyResponse, DeviceMetadata
 from config import Config
 from logging import Logger
+import metrics as driver_metrics
+import startup as driver_startup
 # For each *type* of device served
+import covercalibrator
 from covercalibrator import CovercalibratorMetadata
 
 logger: Logger = None
@@ -86,10 +93,40 @@ class configureddevices():
     def on_get(self, req: Request, resp: Response):
         confarray = [    # TODO ADD ONE FOR EACH DEVICE TYPE AND INSTANCE SERVED
             {
-            'DeviceName'    : CovercalibratorMetadata.Name,
+            'DeviceName'    : covercalibrator.device_name(devnum),
             'DeviceType'    : CovercalibratorMetadata.DeviceType,
-            'DeviceNumber'  : 0,
-            'UniqueID'      : CovercalibratorMetadata.DeviceID
+            'DeviceNumber'  : devnum,
+            'UniqueID'      : covercalibrator.device_unique_id(devnum)
             }
+            for devnum in range(covercalibrator.maxdev + 1)
         ]
         resp.text = PropertyResponse(confarray, req).json
+
+# -----
+# Cache
+# -----
+# Not part of the Alpaca Management API; panel state cache counters per device
+class cache():
+    def on_get(self, req: Request, resp: Response):
+        counters = [
+            dict(DeviceNumber=ctx.devnum, **ctx.cache.stats())
+            for ctx in covercalibrator.devices
+        ]
+        resp.text = PropertyResponse(counters, req).json
+
+# -------
+# Metrics
+# -------
+# Not part of the Alpaca Management API; for a Prometheus scraper (or curl)
+class metrics():
+    def on_get(self, req: Request, resp: Response):
+        resp.content_type = driver_metrics.CONTENT_TYPE
+        resp.text = driver_metrics.render()
+
+# -------
+# Startup
+# -------
+# Not part of the Alpaca Management API; milliseconds per startup phase
+class startup():
+    def on_get(self, req: Request, resp: Response):
+        resp.text = PropertyResponse(driver_startup.report(), req).json
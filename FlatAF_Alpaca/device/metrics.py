@@ -0,0 +1,210 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# metrics.py - Counters and latency histograms in Prometheus text format
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 Apart from the log there was no way to see how the
+#               driver performs. Request latency per Alpaca endpoint, panel
+#               round trip time per firmware route, discovery time and Alpaca
+#               errors are now recorded as they happen (a lock and a few
+#               additions each). Per-panel cache, single-flight, write
+#               coalescing and breaker counters are read when the metrics are
+#               scraped. Served at /management/v1/metrics; no extra package
+#               needed.
+#
+import re
+import threading
+import time
+from bisect import bisect_left
+import startup
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; from a cached GET (well under 1 ms) to a discovery broadcast (3 s)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_registry = []                          # Counters and histograms, in creation order
+_collectors = []                        # Callables returning scrape-time samples
+
+def _label_text(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return repr(value) if value == value else 'NaN'
+    return str(value)
+
+class Counter:
+    """Monotonic count per label set
+
+    Args:
+        name: Metric name (by convention ending in ``_total``)
+        help: One-line description for the ``# HELP`` line
+        labels: Label names; :py:meth:`inc` takes the values in this order
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *values, n: int = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + n
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, count in values:
+            lines.append(f'{self.name}{_label_text(self.labels, key)} {_number(count)}')
+        return lines
+
+class Histogram:
+    """Observation counts in fixed buckets, plus their sum, per label set
+
+    Args:
+        name: Metric name (by convention ending in ``_seconds``)
+        help: One-line description for the ``# HELP`` line
+        labels: Label names; :py:meth:`observe` takes the values in this order
+        buckets: Ascending upper bounds; +Inf is implied
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}               # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(values)
+            if counts is None:
+                counts = self._values[values] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        names = self.labels + ('le',)
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_label_text(names, key + (bound,))} {cumulative}')
+            labels = _label_text(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_number(counts[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+def register_collector(collect):
+    """Add metrics computed at scrape time
+
+    Args:
+        collect: Callable returning a list of ``(name, type, help, samples)``
+            where type is 'counter' or 'gauge' and samples is a list of
+            ``(labels_dict, value)``
+    """
+    _collectors.append(collect)
+
+def render() -> str:
+    """Every metric in Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_label_text(tuple(labels), tuple(labels.values()))} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+# ---------------
+# Driver metrics
+# ---------------
+request_seconds = Histogram('flataf_request_duration_seconds',
+                            'Time to answer an HTTP request, by route', ('route', 'method', 'status'))
+alpaca_responses = Counter('flataf_alpaca_responses_total',
+                           'Alpaca responses by ErrorNumber (0 = success)', ('error_number',))
+device_seconds = Histogram('flataf_device_request_duration_seconds',
+                           'Round trip time of requests to the panel firmware, by firmware route',
+                           ('route', 'method'))
+device_failures = Counter('flataf_device_request_failures_total',
+                          'Requests to the panel firmware that got no HTTP response', ('route', 'method'))
+discovery_seconds = Histogram('flataf_discovery_duration_seconds',
+                              'Time taken by Alpaca discovery broadcasts', ('result',))
+
+_started = time.time()
+
+def _process_samples() -> list:
+    return [
+        ('process_cpu_seconds_total', 'counter', 'User and system CPU time of the driver process',
+         [({}, time.process_time())]),
+        ('process_start_time_seconds', 'gauge', 'Start time of the driver process (Unix epoch)',
+         [({}, _started)]),
+        ('flataf_threads', 'gauge', 'Threads running in the driver process',
+         [({}, threading.active_count())]),
+    ]
+
+register_collector(_process_samples)
+
+# ------------------------
+# Falcon request middleware
+# ------------------------
+class RequestMetrics:
+    """Falcon middleware timing every request into :py:data:`request_seconds`
+
+    Has both the WSGI and the ASGI (``*_async``) hooks, so one instance
+    serves either app. Routes are labelled by URI template, so device
+    numbers and file names do not each get a series.
+    """
+
+    def __init__(self):
+        self._routes = {}               # URI template -> route label
+
+    def _route(self, template: str) -> str:
+        route = self._routes.get(template)
+        if route is None:
+            # '/{devnum:int(min=0)}/' -> '/{devnum}/'
+            route = self._routes[template] = re.sub(r'\{(\w+)[^}]*\}', r'{\1}', template or 'unrouted')
+        return route
+
+    def process_request(self, req, resp):
+        req.context.metrics_start = time.perf_counter()
+
+    def process_response(self, req, resp, resource, req_succeeded):
+        start = req.context.get('metrics_start')
+        if start is not None:
+            request_seconds.observe(time.perf_counter() - start,
+                                    self._route(req.uri_template), req.method, resp.status_code)
+        startup.request_served()
+
+    async def process_request_async(self, req, resp):
+        self.process_request(req, resp)
+
+    async def process_response_async(self, req, resp, resource, req_succeeded):
+        self.process_response(req, resp, resource, req_succeeded)
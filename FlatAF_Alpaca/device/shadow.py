@@ -0,0 +1,124 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# shadow.py - Background poller keeping a shadow copy of panel state
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 Optional mode ([shadow] in config.toml). One worker
+#               polls the panel at a fixed cadence and every Alpaca GET reads
+#               the shadow, so load on the ESP32 does not grow with the number
+#               of polling clients.
+# 18-Oct-2026   dr 0.0.3 A poll that was overtaken by a driver write is
+#               dropped, so the shadow does not go back to the brightness from
+#               before the write.
+# 18-Oct-2026   dr 0.0.3 A failed poll clears brightness and status. Failed
+#               polls are logged when the panel stops answering and when it
+#               answers again, not on every poll.
+#
+import threading
+import time
+from logging import Logger
+
+logger: Logger = None
+
+class PanelShadow:
+    """Last known panel state, as polled or as written by the driver
+
+    Every update starts a new generation. A poll takes :py:meth:`generation`
+    before reading the panel and passes it to :py:meth:`update`, which drops
+    the poll if the driver wrote in the meantime.
+    """
+
+    def __init__(self):
+        self.connected = False
+        self.brightness = None          # None until the first successful poll
+        self.status = None              # 'ON' / 'OFF' as reported by the firmware
+        self.changing = False           # Brightness change in progress on the panel
+        self.updated_at = 0.0           # time.monotonic() of last update
+        self._generation = 0            # Bumped by updates not from a poll
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Current generation, to pass to :py:meth:`update` after a poll"""
+        with self._lock:
+            return self._generation
+
+    def update(self, generation: int = None, **fields) -> bool:
+        """Set shadow fields; returns False if they were dropped
+
+        Args:
+            generation: For a poll, :py:meth:`generation` as taken before
+                reading the panel. The poll is dropped if the shadow was
+                updated since. Omitted for state the driver has written.
+        """
+        with self._lock:
+            if generation is None:
+                self._generation += 1
+            elif generation != self._generation:
+                return False
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.monotonic()
+            return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'connected': self.connected,
+                'brightness': self.brightness,
+                'status': self.status,
+                'changing': self.changing,
+                'age': time.monotonic() - self.updated_at
+            }
+
+
+class ShadowPoller(threading.Thread):
+    """Daemon thread that refreshes a :py:class:`PanelShadow`
+
+    Args:
+        shadow: The shadow to keep current
+        read_state: Callable returning a dict of shadow fields read from the
+            panel. It should raise if the panel cannot be reached.
+        interval: Seconds between polls
+    """
+
+    def __init__(self, shadow: PanelShadow, read_state, interval: float):
+        threading.Thread.__init__(self, name='ShadowPoller')
+        self.shadow = shadow
+        self.read_state = read_state
+        self.interval = interval
+        self.polls = 0
+        self.failures = 0
+        self.dropped = 0                # Polls overtaken by a driver write
+        self._failing = 0               # Consecutive failed polls
+        self._stop_event = threading.Event()
+        self.daemon = True
+
+    def run(self):
+        """Poll forever loop"""
+        while not self._stop_event.is_set():
+            generation = self.shadow.generation()
+            try:
+                if not self.shadow.update(generation, **self.read_state()):
+                    self.dropped += 1   # The driver wrote during the poll; its state wins
+                if self._failing and logger:
+                    logger.info(f'{self.name}: panel answering again after {self._failing} failed polls')
+                self._failing = 0
+            except Exception as ex:
+                self.failures += 1
+                self.shadow.update(generation, connected=False, brightness=None, status=None)
+                if not self._failing and logger:
+                    logger.warning(f'{self.name}: poll failed, panel not connected until it answers: {ex}')
+                self._failing += 1
+            self.polls += 1
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
@@ -65,12 +65,22 @@
 # 16-Feb-2025   rbd 1.0.2 Issue #17 Correct handling of ClientID and
 #               ClientTransactionID. Add missing keywords to some Falcon
 #               HTTPBadRequest exceptions to prevent deprecation warnings.
-
-from threading import Lock
+# 18-Oct-2026   dr 0.0.3 Dedicated response encoder: __slots__ response types written
+#               from pre-encoded key fragments, lock-free ServerTransactionID.
+# 18-Oct-2026   dr 0.0.3 AlpacaRequestContext: request parameters parsed and validated
+#               once, on req.context, for the responders and responses.
+# 18-Oct-2026   dr 0.0.3 Request logging skipped early when INFO is off, and rate
+#               limited per endpoint (log.endpoint_rate_limit) for polls.
+# 18-Oct-2026   dr 0.0.3 Responses counted by ErrorNumber for /management/v1/metrics.
+
+from itertools import count
 from exceptions import Success
 import json
+from json.encoder import encode_basestring_ascii as _json_str  # What json.dumps uses
 from falcon import Request, Response, HTTPBadRequest # type: ignore
-from logging import Logger
+from logging import Logger, INFO
+import log
+import metrics
 
 logger: Logger = None
 #logger = None                   # Safe on Python 3.7 but no intellisense in VSCode etc.
@@ -95,13 +105,38 @@ class DeviceMetadata:
 # NAME/VALUE PAIRS FOR DEVICESTATE
 # --------------------------------
 class StateValue:
+    __slots__ = ('Name', 'Value')
+
     def __init__(self, name, value):
         self.Name = name
         self.Value = value
 
     @property
     def json(self) -> str:
-        return json.dumps(self.__dict__)
+        return f'{{"Name": {_json_str(self.Name)}, "Value": {_json_value(self.Value)}}}'
+
+# ----------------
+# Response encoder
+# ----------------
+# Writes the same JSON text as json.dumps() with default settings, for the
+# value types the responders return, without building a dict per response.
+def _json_value(value) -> str:
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if value is None:
+        return 'null'
+    vtype = type(value)
+    if vtype is str:
+        return _json_str(value)
+    if vtype is int or (isinstance(value, int) and vtype is not bool):
+        return int.__repr__(value)              # Also IntEnum members, as json.dumps does
+    if vtype is list:
+        return '[' + ', '.join([_json_value(v) for v in value]) + ']'
+    if vtype is StateValue:
+        return value.json
+    return json.dumps(value)                    # dict, float, ... (rare)
 
 # ---------------
 # Data Validation
@@ -162,17 +197,117 @@ def get_request_field(name: str, req: Request, caseless: bool = False, default:
         return default
 
 
+# ---------------------------------------------
+# Alpaca request parameters, parsed once
+# ---------------------------------------------
+def _pos_or_zero(val) -> bool:
+    try:
+        test = int(val)
+        return test >= 0
+    except (ValueError, TypeError):
+        return False
+
+class AlpacaRequestContext:
+    """Alpaca parameters of one request, parsed and validated once
+
+    Built by :py:class:`PreProcessRequest` and kept on ``req.context.alpaca``;
+    get it with :py:func:`alpaca_context`. Parameter names are caseless in a
+    GET query string and exact in a PUT body, as get_request_field() has it.
+    String values are stripped. ClientID and ClientTransactionID are
+    matched caseless in both, and a bad value raises ``400 Bad Request``.
+
+    Args:
+        req: The request
+        log_errors: Log a bad ClientID/ClientTransactionID before raising
+            (off for a check made ahead of :py:class:`PreProcessRequest`,
+            which logs it)
+
+    Attributes:
+        client_id (int): ClientID, 0 if missing
+        client_transaction_id (int): ClientTransactionID echoed in the
+            response, 0 if missing
+        fields (dict): All parameters, names lower-cased for GET
+    """
+    __slots__ = ('client_id', 'client_transaction_id', 'fields', '_caseless')
+
+    def __init__(self, req: Request, log_errors: bool = True):
+        if req.method == 'GET':
+            self._caseless = True
+            self.fields = {k.lower(): (v.strip() if isinstance(v, str) else v) for k, v in req.params.items()}
+            named = self.fields
+        else:
+            self._caseless = False
+            media = req.get_media()
+            if not isinstance(media, dict):
+                media = {}
+            self.fields = {k: (v.strip() if isinstance(v, str) else v) for k, v in media.items()}
+            named = {k.lower(): v for k, v in self.fields.items()}
+
+        cid = named.get('clientid') or '0'
+        if not _pos_or_zero(cid):
+            msg = f'Request has bad Alpaca ClientID value {cid}'
+            if log_errors:
+                logger.error(msg)
+            raise HTTPBadRequest(title=_bad_title, description=msg)
+        ctid = named.get('clienttransactionid') or '0'
+        if not _pos_or_zero(ctid):
+            msg = f'Request has bad Alpaca ClientTransactionID value {ctid}'
+            if log_errors:
+                logger.error(msg)
+            raise HTTPBadRequest(title=_bad_title, description=msg)
+        self.client_id = int(cid)
+        if not self._caseless:
+            # Only the exactly named PUT field (or query parameter) is echoed
+            ctid = self.fields.get('ClientTransactionID') or req.params.get('ClientTransactionID') or 0
+        self.client_transaction_id = int(ctid) if _pos_or_zero(ctid) else 0
+
+    def has(self, name: str) -> bool:
+        """True if the parameter was sent (even if empty)"""
+        return (name.lower() if self._caseless else name) in self.fields
+
+    def field(self, name: str, default=None):
+        """Value of a device-specific parameter, or ``default`` if missing or empty"""
+        value = self.fields.get(name.lower() if self._caseless else name)
+        if value is None or value == '':
+            return default
+        return value
+
+def alpaca_context(req: Request) -> AlpacaRequestContext:
+    """The request's :py:class:`AlpacaRequestContext`, parsing it on first use
+
+    Routes without :py:class:`PreProcessRequest` (management) get theirs
+    here, when their response is built.
+    """
+    actx = getattr(req.context, 'alpaca', None)
+    if actx is None:
+        actx = AlpacaRequestContext(req)
+        req.context.alpaca = actx
+    return actx
+
 #
 # Log the request as soon as the resource handler gets it so subsequent
-# logged messages are in the right order. Logs PUT body as well.
+# logged messages are in the right order. Logs PUT body as well. GETs of
+# endpoints in [logging] endpoint_interval are rate limited; a skipped
+# request also skips its response line (req.context.log_quiet).
 #
 def log_request(req: Request):
+    if not logger.isEnabledFor(INFO):
+        return
+    if req.method == 'GET':
+        skipped = log.endpoint_rate_limit.admit(req.path.rsplit('/', 1)[-1].lower())
+        if skipped is None:
+            req.context.log_quiet = True
+            return
+    else:
+        skipped = 0
     msg = f'{req.remote_addr} -> {req.method} {req.path}'
     if req.query_string != '':
         msg += f'?{req.query_string}'
+    if skipped:
+        msg += f' ({skipped} similar not logged)'
     logger.info(msg)
     if req.method == 'PUT' and req.content_length != 0:
-        logger.info(f'{req.remote_addr} -> {req.media}')
+        logger.info('%s -> %s', req.remote_addr, req.media)
 
 # ------------------------------------------------
 # Incoming Pre-Logging and Request Quality Control
@@ -196,36 +331,12 @@ class PreProcessRequest():
             * Bumps the ServerTransactionID value and returns it in sequence
         """
 
-    #
-    # Quality check of numerical value for trans IDs
-    #
-    @staticmethod
-    def _pos_or_zero(val: str) -> bool:
-        try:
-            test = int(val)
-            return test >= 0
-        except ValueError:
-            return False
-
     def _check_request(self, req: Request, devnum: int):  # Raise on failure
         if devnum > self.maxdev:
             msg = f'Device number {str(devnum)} does not exist. Maximum device number is {self.maxdev}.'
             logger.error(msg)
             raise HTTPBadRequest(title=_bad_title, description=msg)
-        test: str = get_request_field('ClientID', req, True, '0')   # Caseless, default = 0 if missing
-        if not self._pos_or_zero(test):
-            msg = f'Request has bad Alpaca ClientID value {test}'
-            logger.error(msg)
-            raise HTTPBadRequest(title=_bad_title, description=msg)
-        if test == '0':
-            req.params['ClientID'] = '0'                            # In case it's missing
-        test: str = get_request_field('ClientTransactionID', req, True, '0') # Caseless, default = 0 if missing
-        if not self._pos_or_zero(test):
-            msg = f'Request has bad Alpaca ClientTransactionID value {test}'
-            logger.error(msg)
-            raise HTTPBadRequest(title=_bad_title, description=msg)
-        if test == '0':
-            req.params['ClientTransactionID'] = '0'                 # In case it's missing
+        alpaca_context(req)         # Raises to 400 on a bad ClientID/ClientTransactionID
 
     #
     # params contains {'devnum': n } from the URI template matcher
@@ -240,6 +351,8 @@ class PreProcessRequest():
 # ------------------
 class PropertyResponse():
     """JSON response for an Alpaca Property (GET) Request"""
+    __slots__ = ('ServerTransactionID', 'ClientTransactionID', 'Value', 'ErrorNumber', 'ErrorMessage')
+
     def __init__(self, value, req: Request, err = Success()):
         """Initialize a ``PropertyResponse`` object.
 
@@ -254,62 +367,65 @@ class PropertyResponse():
             * Bumps the ServerTransactionID value and returns it in sequence
         """
         self.ServerTransactionID = getNextTransId()
-        self.ClientTransactionID = int(get_request_field('ClientTransactionID', req, False, 0))  #Caseless on GET
+        self.ClientTransactionID = alpaca_context(req).client_transaction_id
         if err.Number == 0 and not value is None:
             self.Value = value
-            logger.info(f'{req.remote_addr} <- {str(value)}')
+            if logger.isEnabledFor(INFO) and not req.context.get('log_quiet'):
+                logger.info('%s <- %s', req.remote_addr, value)
+        else:
+            self.Value = None                   # Omitted from the JSON
         self.ErrorNumber = err.Number
         self.ErrorMessage = err.Message
+        metrics.alpaca_responses.inc(self.ErrorNumber)
 
     @property
     def json(self) -> str:
         """Return the JSON for the Property Response"""
-#       # This trickery allows serializing the StateValue object into the JSON
-        # https://stackoverflow.com/questions/3768895/how-to-make-a-class-json-serializable
-        return json.dumps(self, default=lambda o: o.__dict__)
+        if self.Value is None:
+            value = ''
+        else:
+            value = ', "Value": ' + _json_value(self.Value)
+        return (f'{{"ServerTransactionID": {self.ServerTransactionID}, '
+                f'"ClientTransactionID": {self.ClientTransactionID}{value}, '
+                f'"ErrorNumber": {self.ErrorNumber}, "ErrorMessage": {_json_value(self.ErrorMessage)}}}')
 
 # --------------
 # MethodResponse
 # --------------
 class MethodResponse:
+    __slots__ = ('ServerTransactionID', 'ClientTransactionID', 'ErrorNumber', 'ErrorMessage', 'Value')
+
     def __init__(self, req, err=None):
         self.ServerTransactionID = 1
-        self.ClientTransactionID = 0
         self.ErrorNumber = 0
         self.ErrorMessage = ""
         self.Value = None
-
-        # Try params first (query string)
-        if hasattr(req, "params"):
-            self.ClientTransactionID = int(req.params.get("ClientTransactionID", 0))
-
-        # If still 0, try JSON body (media)
-        if self.ClientTransactionID == 0 and hasattr(req, "media"):
-            try:
-                self.ClientTransactionID = int(req.media.get("ClientTransactionID", 0))
-            except Exception:
-                self.ClientTransactionID = 0
+        try:
+            self.ClientTransactionID = alpaca_context(req).client_transaction_id
+        except Exception:
+            self.ClientTransactionID = 0        # Still answer; this may be the error reply
 
         if err:
             self.ErrorNumber = getattr(err, "Number", 0x500)
             self.ErrorMessage = str(getattr(err, "Message", getattr(err, "description", str(err))))
+        metrics.alpaca_responses.inc(self.ErrorNumber)
 
 
     @property
     def json(self) -> str:
         """Return the JSON for the Method Response"""
-        # Simple scalars here so no need for fancy conversion
-        return json.dumps(self.__dict__)
+        return (f'{{"ServerTransactionID": {self.ServerTransactionID}, '
+                f'"ClientTransactionID": {self.ClientTransactionID}, '
+                f'"ErrorNumber": {self.ErrorNumber}, "ErrorMessage": {_json_value(self.ErrorMessage)}, '
+                f'"Value": {_json_value(self.Value)}}}')
 
 
 # -------------------------------
 # Thread-safe ServerTransactionID
 # -------------------------------
-_lock = Lock()
-_stid = 0
+# next() on an itertools.count is a single C call, atomic under the GIL,
+# so no lock is needed
+_stid = count(1)
 
 def getNextTransId() -> int:
-    with _lock:
-        global _stid
-        _stid += 1
-    return _stid
+    return next(_stid)
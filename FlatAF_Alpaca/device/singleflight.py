@@ -0,0 +1,91 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# singleflight.py - Concurrent identical panel reads share one upstream call
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 With requests served concurrently, several clients
+#               polling the same property at the same moment each reached the
+#               ESP32. The first caller for a key now makes the read; callers
+#               arriving while it is in flight wait for it and get the same
+#               result (or exception).
+#
+import asyncio
+import threading
+
+class _Call:
+    """One in-flight upstream call and its outcome"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException = None
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key
+
+    :py:meth:`do` is for threads, :py:meth:`do_async` for coroutines on one
+    event loop. Nothing is remembered once a call completes; that is the
+    cache's job. Per key, ``calls`` counts upstream calls made and
+    ``saved`` counts callers answered by another caller's call.
+    """
+
+    def __init__(self):
+        self._calls = {}                # key -> _Call in flight (threads)
+        self._tasks = {}                # key -> asyncio.Future in flight
+        self._counts = {}               # key -> [calls, saved]
+        self._lock = threading.Lock()
+
+    def _count(self, key, leader: bool):
+        counts = self._counts.setdefault(key, [0, 0])
+        counts[0 if leader else 1] += 1
+
+    def do(self, key, fn):
+        """Return ``fn()``, or the result of the same call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(key, leader)
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as ex:
+                call.error = ex
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key, coro_fn):
+        """Await ``coro_fn()``, or the same call already in flight
+
+        The call is shielded, so one caller being cancelled (a client
+        giving up) does not cancel it for the others.
+        """
+        task = self._tasks.get(key)
+        leader = task is None or task.done()
+        if leader:
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+        with self._lock:
+            self._count(key, leader)
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """``{key: {'calls': n, 'saved': n}}`` since startup"""
+        with self._lock:
+            return {key: {'calls': c[0], 'saved': c[1]} for key, c in self._counts.items()}
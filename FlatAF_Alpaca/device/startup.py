@@ -0,0 +1,110 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# startup.py - Startup timing report, process start to first request served
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 The driver is started by a scheduled task when the
+#               imaging PC boots and clients gave up waiting for it. app.py
+#               imports this module first and marks each startup phase, so the
+#               time to the first request served is logged and available at
+#               /management/v1/startup. Imports nothing that Python has not
+#               already loaded by the time the driver starts.
+#
+import os
+import sys
+import time
+
+logger = None                           # Injected in app.start_services()
+
+_clock0 = time.perf_counter()           # This module's import, before the driver's
+_last = _clock0
+_phases = []                            # (phase, milliseconds) in the order marked
+_ready = None                           # perf_counter() when the server was listening
+_first_request = None                   # perf_counter() when the first response was sent
+_interpreter = None                     # Milliseconds before _clock0, worked out once
+
+def mark(phase: str):
+    """End a startup phase begun at the previous mark (or at this module's import)"""
+    global _last
+    now = time.perf_counter()
+    _phases.append((phase, round((now - _last) * 1000, 1)))
+    _last = now
+
+def ready():
+    """The server is listening; log the report"""
+    global _ready
+    _ready = time.perf_counter()
+    if logger:
+        logger.info(f'==STARTUP== {summary()}')
+
+def request_served():
+    """Record the first response sent (later calls do nothing)"""
+    global _first_request
+    if _first_request is not None:
+        return
+    _first_request = time.perf_counter()
+    if logger:
+        logger.info(f'==STARTUP== First request served {_since_start(_first_request):.0f} ms after process start')
+
+def _process_age() -> float:
+    """Seconds since this process was created, or None where it is not known"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            with open('/proc/uptime') as f:
+                uptime = float(f.read().split()[0])
+            return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+            times = [wintypes.FILETIME() for _ in range(4)]
+            kernel32 = ctypes.windll.kernel32
+            if not kernel32.GetProcessTimes(kernel32.GetCurrentProcess(), *[ctypes.byref(t) for t in times]):
+                return None
+            created = (times[0].dwHighDateTime << 32) | times[0].dwLowDateTime
+            return time.time() - (created - 116444736000000000) / 1e7   # 100 ns ticks since 1601
+    except Exception:
+        pass
+    return None
+
+def _interpreter_ms() -> float:
+    """Milliseconds from process creation to this module's import (0 if not known)"""
+    global _interpreter
+    if _interpreter is None:
+        age = _process_age()
+        _interpreter = 0.0 if age is None else max(0.0, (age - (time.perf_counter() - _clock0)) * 1000)
+    return _interpreter
+
+def _since_start(when: float) -> float:
+    return _interpreter_ms() + (when - _clock0) * 1000
+
+def report() -> dict:
+    """Startup phases in milliseconds, for the log and /management/v1/startup
+
+    ``interpreter`` is process creation to the driver's first import (Python
+    itself, site packages); 0 where the OS cannot tell. ``ready_ms`` and
+    ``first_request_ms`` count from process creation and are None until
+    reached.
+    """
+    return {
+        'phases': dict([('interpreter', round(_interpreter_ms(), 1))] + _phases),
+        'ready_ms': round(_since_start(_ready), 1) if _ready else None,
+        'first_request_ms': round(_since_start(_first_request), 1) if _first_request else None,
+    }
+
+def summary() -> str:
+    r = report()
+    phases = ', '.join(f'{name} {ms:.0f}' for name, ms in r['phases'].items())
+    text = f'Startup (ms): {phases}'
+    if r['ready_ms'] is not None:
+        text += f'; listening after {r["ready_ms"]:.0f}'
+    return text
@@ -0,0 +1,129 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# staticfiles.py - Static assets (setup page images) served from memory
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 StaticFileServer used to read the whole file on every
+#               request, relative to the working directory. Files are now read
+#               once (found next to this module) and answered from memory, with
+#               an ETag and Last-Modified so a browser that already has the
+#               file gets a 304 with no body. A file larger than CACHE_MAX_SIZE
+#               is not kept; it is streamed from disk (wsgi.file_wrapper, and
+#               sendfile() under app.py's WSGI server). A changed file (mtime
+#               or size) is picked up on the next request.
+#
+import mimetypes
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from falcon import Request, Response, HTTPNotFound, HTTP_304 # type: ignore
+
+IMAGES_DIR = Path(__file__).resolve().parent / 'resources' / 'images'
+CACHE_MAX_SIZE = 256 * 1024             # Bytes; larger files are streamed, not kept
+CACHE_CONTROL = 'public, max-age=86400'
+
+class StaticFile:
+    """What is known about one file as of its last stat()
+
+    ``data`` is the content, or None for a file streamed from ``path``.
+    """
+
+    __slots__ = ('path', 'size', 'mtime_ns', 'etag', 'last_modified', 'content_type', 'data')
+
+    def __init__(self, path: Path, st: os.stat_result, data: bytes = None):
+        self.path = path
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        self.last_modified = datetime.fromtimestamp(int(st.st_mtime), timezone.utc)  # HTTP dates are whole seconds
+        self.content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        self.data = data
+
+class StaticFiles:
+    """The files of one directory, read on first request and kept in memory
+
+    Each lookup costs one ``stat()``. A cached file whose size or mtime has
+    changed is read again.
+
+    Args:
+        root: Directory served; names with a path separator or that leave
+            it are not found
+        max_size: Largest file kept in memory (bytes)
+    """
+
+    def __init__(self, root: Path = IMAGES_DIR, max_size: int = CACHE_MAX_SIZE):
+        self.root = Path(root).resolve()
+        self.max_size = max_size
+        self._files = {}                # Name -> StaticFile
+        self._lock = threading.Lock()
+        self.reads = 0                  # Files read from disk into the cache
+
+    def get(self, name: str) -> StaticFile:
+        """The current :py:class:`StaticFile` for ``name``, or None if there is no such file"""
+        if not name or name in ('.', '..') or '/' in name or '\\' in name:
+            return None
+        path = self.root / name
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        cached = self._files.get(name)
+        if cached is not None and cached.mtime_ns == st.st_mtime_ns and cached.size == st.st_size:
+            return cached
+        if not path.is_file():
+            return None
+        if st.st_size > self.max_size:
+            entry = StaticFile(path, st)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+            st = os.stat(path)          # As of the read, in case it changed meanwhile
+            entry = StaticFile(path, st, data)
+            self.reads += 1
+        with self._lock:
+            self._files[name] = entry
+        return entry
+
+def not_modified(req: Request, entry: StaticFile) -> bool:
+    """True if the client's copy (If-None-Match, else If-Modified-Since) is current"""
+    tags = req.if_none_match
+    if tags is not None:
+        return any(tag == '*' or f'"{tag}"' == entry.etag for tag in tags)
+    since = req.if_modified_since
+    return since is not None and entry.last_modified <= since
+
+class StaticFileServer:
+    """Serve static files from resources/images (next to this module)
+
+    Args:
+        root: Directory served instead (tests)
+    """
+
+    def __init__(self, root: Path = IMAGES_DIR):
+        self.files = StaticFiles(root)
+
+    def on_get(self, req: Request, resp: Response, filename: str):
+        entry = self.files.get(filename)
+        if entry is None:
+            raise HTTPNotFound()
+        resp.etag = entry.etag
+        resp.last_modified = entry.last_modified
+        resp.set_header('Cache-Control', CACHE_CONTROL)
+        if not_modified(req, entry):
+            resp.status = HTTP_304
+            return
+        resp.content_type = entry.content_type
+        if entry.data is not None:
+            resp.data = entry.data
+        else:
+            stream = open(entry.path, 'rb')
+            resp.set_stream(stream, os.fstat(stream.fileno()).st_size)
@@ -0,0 +1,130 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# transport.py - Pooled keep-alive HTTP transport to FlatAF panels
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 All driver-to-panel HTTP traffic goes through here so
+#               that every call reuses a pooled TCP connection instead of
+#               paying a new handshake. requests (and urllib3, certifi,
+#               http.client) is imported by the first transport made, not at
+#               driver startup.
+# 18-Oct-2026   dr 0.0.3 Connections opened are counted per panel
+#               (flataf_panel_connections_total in the metrics), to show how
+#               many requests went over a reused one.
+#
+import threading
+import time
+from config import Config
+import metrics
+
+# ---------------------------
+# Per-operation read timeouts
+# ---------------------------
+# 'status' is the cheap connected poll, 'read' is a property GET such as
+# brightness, 'write' is any PUT that changes the panel.
+OP_STATUS = 'status'
+OP_READ = 'read'
+OP_WRITE = 'write'
+
+def timeout_for(op: str) -> tuple:
+    """Return the (connect, read) timeout tuple for an operation class"""
+    if op == OP_STATUS:
+        read = Config.status_timeout
+    elif op == OP_WRITE:
+        read = Config.write_timeout
+    else:
+        read = Config.read_timeout
+    return (Config.connect_timeout, read)
+
+
+class DeviceTransport:
+    """Pooled, keep-alive HTTP session to a single FlatAF panel
+
+    One instance exists per panel base URL (see :py:func:`get_transport`).
+    The underlying ``requests.Session`` is thread-safe for this use and
+    keeps up to ``pool_size`` idle connections open to the panel.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = None):
+        import requests # type: ignore
+        from requests.adapters import HTTPAdapter # type: ignore
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size or Config.pool_size
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(pool_connections=1,
+                                   pool_maxsize=self.pool_size,
+                                   max_retries=0)
+        self.session.mount('http://', self.adapter)
+
+    def request(self, method: str, route: str, op: str = OP_READ, **kwargs) -> 'requests.Response':
+        """Issue a request to ``{base_url}/{route}`` on the pooled session
+
+        Args:
+            method: HTTP method
+            route: Firmware route relative to the panel base URL, e.g. 'brightness'
+            op: One of OP_STATUS, OP_READ, OP_WRITE; selects the timeout
+            kwargs: Passed through to ``requests.Session.request``
+        """
+        kwargs.setdefault('timeout', timeout_for(op))
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f'{self.base_url}/{route}', **kwargs)
+        except Exception:
+            metrics.device_failures.inc(route, method)
+            raise
+        metrics.device_seconds.observe(time.perf_counter() - start, route, method)
+        return response
+
+    def get(self, route: str, op: str = OP_READ, **kwargs) -> 'requests.Response':
+        return self.request('GET', route, op, **kwargs)
+
+    def put(self, route: str, op: str = OP_WRITE, **kwargs) -> 'requests.Response':
+        return self.request('PUT', route, op, **kwargs)
+
+    @property
+    def connections_opened(self) -> int:
+        """TCP connections opened to the panel so far"""
+        pools = self.adapter.poolmanager.pools
+        return sum(pool.num_connections for pool in (pools.get(key) for key in pools.keys()) if pool)
+
+    def close(self):
+        self.session.close()
+
+
+# ------------------
+# Transport registry
+# ------------------
+_transports = {}
+_lock = threading.Lock()
+
+def get_transport(base_url: str) -> DeviceTransport:
+    """Return the shared transport for a panel, creating it on first use"""
+    key = base_url.rstrip('/')
+    transport = _transports.get(key)
+    if transport is None:
+        with _lock:
+            transport = _transports.get(key)
+            if transport is None:
+                transport = DeviceTransport(key)
+                _transports[key] = transport
+    return transport
+
+def close_all():
+    """Close every pooled session (e.g. at shutdown)"""
+    with _lock:
+        for transport in _transports.values():
+            transport.close()
+        _transports.clear()
+
+def connections_opened(base_url: str) -> int:
+    """TCP connections the transport for a panel has opened (0 if there is none yet)"""
+    transport = _transports.get(base_url.rstrip('/'))
+    return transport.connections_opened if transport else 0
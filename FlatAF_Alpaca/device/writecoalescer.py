@@ -0,0 +1,98 @@
+"""Module for ASCOM Alpaca driver operations."""
+
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# writecoalescer.py - Merges bursts of panel writes into the latest one
+#
+# Author: Douglas Reynolds
+# Project: FlatAF - Open Source Flat Panel for Astrophotography
+# Website: https://astroaf.space
+# License: See LICENSE.md (ASCOM and CC BY-NC 4.0) (see LICENSE file)
+# Copyright (c) 2025 Douglas Reynolds AstroAF
+# -----------------------------------------------------------------------------
+# Edit History:
+# 18-Oct-2026   dr 0.0.3 Flat wizards step brightness many times a second while
+#               they search for an exposure. Each step used to be its own PUT
+#               to the panel (and a UART print and PWM update on the ESP32).
+#               Writes now reach the panel at most once per settle window;
+#               everything submitted in between is replaced by the latest
+#               write, which every waiting client is answered from.
+#
+import threading
+import time
+
+class _Batch:
+    """Writes answered by one panel write"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Exception = None
+
+class WriteCoalescer:
+    """Applies the latest of a burst of writes, at most once per settle window
+
+    A write arriving when the panel has not been written for ``settle``
+    seconds goes out at once. Writes arriving sooner wait for the window to
+    end and are merged: only the last one is applied. Every caller blocks
+    until the write that replaced (or is) its own has been applied, then
+    gets its result or exception.
+
+    Args:
+        settle: Minimum seconds between panel writes (0 = apply each write)
+    """
+
+    def __init__(self, settle: float = 0.0):
+        self.settle = settle
+        self.submitted = 0                  # Writes asked for
+        self.applied = 0                    # Writes sent to the panel
+        self._pending = None                # Latest write not yet applied
+        self._batch: _Batch = None          # Callers waiting on _pending
+        self._last = 0.0                    # time.monotonic() of the last panel write
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() # One panel write at a time
+
+    def submit(self, write):
+        """Apply ``write()`` (or a later write submitted before it went out)
+
+        Args:
+            write: Callable doing one panel write; its return value is
+                passed back to every caller it answers.
+
+        Returns:
+            The return value of the write that was applied
+        """
+        with self._lock:
+            self.submitted += 1
+            self._pending = write
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+        if leader:
+            self._flush(batch)
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.result
+
+    def _flush(self, batch: _Batch):
+        with self._write_lock:
+            delay = self._last + self.settle - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)           # Collect the rest of the burst
+            with self._lock:
+                write, self._pending = self._pending, None
+                self._batch = None          # Later writes start a new batch
+                self.applied += 1
+            try:
+                batch.result = write()
+            except Exception as ex:
+                batch.error = ex
+            finally:
+                self._last = time.monotonic()
+                batch.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'submitted': self.submitted, 'applied': self.applied}
@@ -0,0 +1,275 @@
+"""
+Async Transport Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises aiotransport.AsyncDeviceTransport, the HTTP/1.1 client used
+  in ASGI mode. Runs it against the firmware stand-in (fake_flataf.py),
+  with keep-alive and closing every connection, and against a scripted
+  server sending exact response bytes: chunked bodies, bodies that run to
+  the end of the connection, a kept-alive connection the server drops,
+  malformed and late responses.
+
+Run Instructions:
+  python aiotransport_tests.py
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+TIMEOUT = 0.3
+
+from config import Config
+Config.connect_timeout = Config.status_timeout = Config.read_timeout = Config.write_timeout = TIMEOUT
+
+import fake_flataf
+from aiotransport import AsyncDeviceTransport, TransportError
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+class ScriptedServer(threading.Thread):
+    """Answers each request with the next scripted response
+
+    Each script entry is (response bytes, close after sending). A response
+    of None with no close holds the connection open without answering.
+    The requests received are kept, raw, in ``requests``.
+    """
+
+    def __init__(self, script):
+        threading.Thread.__init__(self, daemon=True)
+        self.script = list(script)
+        self.requests = []
+        self.connections = 0
+        self.stopped = threading.Event()
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(8)
+        self.url = f"http://127.0.0.1:{self.sock.getsockname()[1]}/api/v1/covercalibrator/0"
+        self.start()
+
+    def run(self):
+        while self.script:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.serve, args=(conn,), daemon=True).start()
+
+    def serve(self, conn):
+        with conn:
+            buffer = b""
+            while self.script:
+                while b"\r\n\r\n" not in buffer:
+                    data = conn.recv(4096)
+                    if not data:
+                        return
+                    buffer += data
+                head, buffer = buffer.split(b"\r\n\r\n", 1)
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                while len(buffer) < length:
+                    buffer += conn.recv(4096)
+                self.requests.append(head + b"\r\n\r\n" + buffer[:length])
+                buffer = buffer[length:]
+                response, close = self.script.pop(0)
+                if response is None and not close:
+                    self.stopped.wait(5)
+                    return
+                if response:
+                    conn.sendall(response)
+                if close:
+                    return
+
+    def close(self):
+        self.stopped.set()
+        self.script.clear()
+        self.sock.close()
+
+
+def ok(body, extra=b""):
+    return b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n%s\r\n%s" % (len(body), extra, body)
+
+
+def test_keep_alive_reuse():
+    def body():
+        server, st, url = fake_flataf.start(connected=True)
+        try:
+            async def main():
+                transport = AsyncDeviceTransport(url, pool_size=1)
+                replies = [await transport.get("brightness") for _ in range(5)]
+                put = await transport.put("setbrightness", json_body={"Brightness": 1234})
+                connected = await transport.get("connected", params={"ClientID": 1, "ClientTransactionID": 2})
+                transport.close()
+                return transport, replies, put, connected
+
+            transport, replies, put, connected = asyncio.run(main())
+            check(all(r.status_code == 200 and r.json()["success"] for r in replies), "brightness replies")
+            check(put.json()["brightness"] == 1234 and st.brightness == 1234, f"PUT {put.json()}")
+            check(connected.json()["Value"] is True, f"connected {connected.json()}")
+            check(transport.connections_opened == 1 and st.connections == 1,
+                  f"{transport.connections_opened} connections opened for 7 requests")
+        finally:
+            server.shutdown()
+    return run_test("AsyncDeviceTransport - Requests share one kept-alive connection", body)
+
+
+def test_connection_close():
+    def body():
+        server, st, url = fake_flataf.start(connected=True, close=True)
+        try:
+            async def main():
+                transport = AsyncDeviceTransport(url, pool_size=1)
+                replies = [await transport.get("brightness") for _ in range(3)]
+                return transport, replies
+
+            transport, replies = asyncio.run(main())
+            check(all(r.status_code == 200 for r in replies), "replies")
+            check(transport.connections_opened == 3 and not transport._idle,
+                  f"{transport.connections_opened} connections, {len(transport._idle)} kept")
+        finally:
+            server.shutdown()
+    return run_test("AsyncDeviceTransport - Connection: close is honoured", body)
+
+
+def test_chunked():
+    def body():
+        chunked = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                   b"7;ext=1\r\n{\"a\": 1\r\n"
+                   b"3\r\n, \"\r\n"
+                   b"5\r\nb\": 2\r\n"
+                   b"1\r\n}\r\n"
+                   b"0\r\n\r\n")
+        server = ScriptedServer([(chunked, False), (ok(b"{}"), False)])
+        try:
+            async def main():
+                transport = AsyncDeviceTransport(server.url)
+                first = await transport.get("state")
+                second = await transport.get("state")
+                return transport, first, second
+
+            transport, first, second = asyncio.run(main())
+            check(first.json() == {"a": 1, "b": 2}, f"chunked body {first.content!r}")
+            check(second.json() == {}, f"body after the chunked one {second.content!r}")
+            check(transport.connections_opened == 1, "chunked response ended the connection")
+        finally:
+            server.close()
+    return run_test("AsyncDeviceTransport - Chunked body read and connection reused", body)
+
+
+def test_body_to_eof():
+    def body():
+        server = ScriptedServer([(b"HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n\r\n{\"v\": 1}", True),
+                                 (ok(b"{\"v\": 2}"), False)])
+        try:
+            async def main():
+                transport = AsyncDeviceTransport(server.url)
+                first = await transport.get("state")
+                second = await transport.get("state")
+                return transport, first, second
+
+            transport, first, second = asyncio.run(main())
+            check(first.json() == {"v": 1} and second.json() == {"v": 2}, "bodies")
+            check(transport.connections_opened == 2, f"{transport.connections_opened} connections")
+        finally:
+            server.close()
+    return run_test("AsyncDeviceTransport - Body without a length runs to the end of the connection", body)
+
+
+def test_dropped_connection():
+    def body():
+        # Each response is followed by the server hanging up, though it said keep-alive
+        server = ScriptedServer([(ok(b"{\"v\": 1}"), True), (ok(b"{\"v\": 2}"), True), (None, True)])
+        try:
+            async def main():
+                transport = AsyncDeviceTransport(server.url)
+                await transport.get("state")
+                await asyncio.sleep(0.1)                # Let the hang-up arrive
+                retried = await transport.get("state")  # Stale connection: GET retried on a new one
+                await asyncio.sleep(0.1)
+                try:
+                    await transport.put("setbrightness", json_body={"Brightness": 1})
+                    put_error = None
+                except (OSError, asyncio.IncompleteReadError, TransportError) as ex:
+                    put_error = ex
+                return transport, retried, put_error
+
+            transport, retried, put_error = asyncio.run(main())
+            check(retried.json() == {"v": 2}, f"retried GET {retried.content!r}")
+            check(put_error is not None, "PUT on a dropped connection was repeated")
+            check(len(server.requests) == 3, f"{len(server.requests)} requests reached the server")
+        finally:
+            server.close()
+    return run_test("AsyncDeviceTransport - Dropped kept-alive connection: GET retried, PUT not", body)
+
+
+def test_errors():
+    def body():
+        server = ScriptedServer([(b"garbage\r\n\r\n", True), (None, False)])
+        try:
+            async def main():
+                transport = AsyncDeviceTransport(server.url)
+                results = []
+                for _ in range(2):
+                    try:
+                        await transport.get("state")
+                        results.append(None)
+                    except TransportError as ex:
+                        results.append(str(ex))
+                return results
+
+            bad, late = asyncio.run(main())
+            check(bad and "Bad status line" in bad, f"malformed response: {bad}")
+            check(late and "No response" in late, f"late response: {late}")
+        finally:
+            server.close()
+    return run_test("AsyncDeviceTransport - Malformed and late responses raise TransportError", body)
+
+
+def run_all():
+    tests = [
+        test_keep_alive_reuse,
+        test_connection_close,
+        test_chunked,
+        test_body_to_eof,
+        test_dropped_connection,
+        test_errors,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,144 @@
+"""
+ASGI Mode Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Sends requests to the asyncio driver (asgi_app.create_app()) and to the
+  WSGI one, pointed at the firmware stand-in (fake_flataf.py) or at a
+  port nothing listens on. Checks that a bad ClientID or
+  ClientTransactionID is answered 400 without a panel round trip, and
+  that both modes give the same Alpaca errors while the panel cannot be
+  read and after its circuit breaker opens.
+
+Run Instructions:
+  python asgi_tests.py
+"""
+
+import logging
+import os
+import socket
+import sys
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+from config import Config
+Config.connected_ttl = Config.brightness_ttl = 0.0      # Every read reaches the panel
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import asgi_app
+import circuitbreaker
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+from circuitbreaker import CircuitBreaker, OPEN
+
+logger = logging.getLogger("asgi_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = circuitbreaker.logger = logger
+shr.set_shr_logger(logger)
+
+NOT_CONNECTED = 0x407
+DRIVER_ERROR = 0x500
+THRESHOLD = 3
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def clients():
+    falc_app = falcon.App()
+    app.add_routes(falc_app)
+    return {"WSGI": falcon.testing.TestClient(falc_app),
+            "ASGI": falcon.testing.TestClient(asgi_app.create_app())}
+
+
+def dead_url():
+    """Panel URL on a local port nothing listens on (connection refused)"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"http://127.0.0.1:{port}{fake_flataf.PREFIX}"
+
+
+def test_bad_request_no_panel_read():
+    def body():
+        server, st, url = fake_flataf.start(connected=True)
+        try:
+            covercalibrator.device(0).set_url(url)
+            for mode, client in clients().items():
+                for query in ("ClientID=1&ClientTransactionID=-1", "ClientID=x&ClientTransactionID=1"):
+                    for prop in ("brightness", "devicestate"):
+                        before = st.requests
+                        r = client.simulate_get(f"/api/v1/covercalibrator/0/{prop}", query_string=query)
+                        check(r.status_code == 400, f"{mode} {prop}?{query}: HTTP {r.status_code}")
+                        check(st.requests == before, f"{mode} {prop}?{query}: {st.requests - before} panel reads")
+                r = client.simulate_get("/api/v1/covercalibrator/0/brightness",
+                                        query_string="ClientID=1&ClientTransactionID=7")
+                check(r.json["ErrorNumber"] == 0 and r.json["ClientTransactionID"] == 7, f"{mode} good request {r.json}")
+        finally:
+            server.shutdown()
+    return run_test("asgi_app - Bad ClientID/ClientTransactionID answered 400 without reading the panel", body)
+
+
+def test_unreadable_panel_errors_match():
+    def body():
+        ctx = covercalibrator.device(0)
+        ctx.set_url(dead_url())
+        ctx.pinned = True
+        errors = {}
+        try:
+            for mode, client in clients().items():
+                ctx.breaker = CircuitBreaker("panel 0", failure_threshold=THRESHOLD, reset_timeout=30.0)
+                errors[mode] = [client.simulate_get("/api/v1/covercalibrator/0/brightness",
+                                                    query_string="ClientID=1&ClientTransactionID=1").json["ErrorNumber"]
+                                for _ in range(THRESHOLD + 1)]
+                check(ctx.breaker.state == OPEN, f"{mode}: breaker {ctx.breaker.stats()}")
+        finally:
+            ctx.pinned = False
+            ctx.breaker = CircuitBreaker("panel 0")
+        print(f"[INFO] Brightness errors while unreadable, then breaker open: {errors}")
+        check(errors["WSGI"] == [DRIVER_ERROR] * THRESHOLD + [NOT_CONNECTED], f"WSGI {errors['WSGI']}")
+        check(errors["ASGI"] == errors["WSGI"], f"ASGI {errors['ASGI']} != WSGI {errors['WSGI']}")
+    return run_test("asgi_app - Same Alpaca errors as WSGI while the panel cannot be read", body)
+
+
+def run_all():
+    tests = [
+        test_bad_request_no_panel_read,
+        test_unreadable_panel_errors_match,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
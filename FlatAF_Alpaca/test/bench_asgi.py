@@ -0,0 +1,187 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF Alpaca Driver
+Purpose: Load test of the driver's WSGI (app.py) and ASGI (asgi_app.py) serving modes
+Website: https://astroaf.space
+License: See LICENSE.md (ASCOM and CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+
+Starts the firmware stand-in (fake_flataf.py) with a per-request service
+time, then runs the driver against it, once per mode, in its own process.
+Many simulated Alpaca clients poll the usual properties as fast as they
+can. Each client keeps its own connection (reconnecting when the server
+closes it). Reports throughput, tail latency and errors for each mode and
+client count.
+
+The cache TTL defaults to 0 so every poll reaches the panel. Raise it to
+see the effect with the cache on.
+
+Run Instructions:
+  pip install -r ../device/requirements-asgi.txt     (ASGI mode only)
+  python bench_asgi.py [--clients 8,64,256] [--seconds 5] [--response-delay-ms 10] [--cache-ttl 0]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+ROUTES = ["connected", "brightness", "calibratorstate", "devicestate", "name"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_listening(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise Exception(f"Nothing listening on port {port} after {timeout}s")
+
+
+# ------------------------------------
+# Driver under test (child process)
+# ------------------------------------
+def serve(mode, port, panel_url, cache_ttl, workers):
+    import logging
+    from config import Config
+    Config.connected_ttl = Config.brightness_ttl = cache_ttl
+    Config.worker_threads = workers
+    import covercalibrator, exceptions, log, shr, app
+
+    logger = logging.getLogger("bench")
+    logger.setLevel(logging.WARNING)
+    logger.addHandler(logging.NullHandler())
+    log.logger = covercalibrator.logger = exceptions.logger = logger
+    shr.set_shr_logger(logger)
+    covercalibrator.device(0).set_url(panel_url)
+
+    if mode == "wsgi":
+        import falcon # type: ignore
+        from functools import partial
+        from wsgiref.simple_server import make_server, WSGIServer
+        falc_app = falcon.App()
+        app.add_routes(falc_app)
+        server_class = partial(app.ThreadPoolWSGIServer, workers=workers) if workers > 1 else WSGIServer
+        with make_server("127.0.0.1", port, falc_app, server_class=server_class,
+                         handler_class=app.LoggingWSGIRequestHandler) as httpd:
+            httpd.serve_forever()
+    else:
+        import uvicorn # type: ignore
+        import asgi_app
+        uvicorn.run(asgi_app.create_app(), host="127.0.0.1", port=port,
+                    log_level="warning", access_log=False)
+
+
+# ------------------
+# Load generator
+# ------------------
+async def client(base_url, stop_at, samples, errors, index):
+    from aiotransport import AsyncDeviceTransport
+    transport = AsyncDeviceTransport(base_url, pool_size=1)
+    n = index
+    while time.monotonic() < stop_at:
+        route = ROUTES[n % len(ROUTES)]
+        n += 1
+        t0 = time.perf_counter()
+        try:
+            r = await transport.get(route, params={"ClientID": index + 1, "ClientTransactionID": n})
+            if r.status_code != 200:
+                raise Exception(f"HTTP {r.status_code}")
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        except Exception:
+            errors.append(route)
+            await asyncio.sleep(0.01)
+    transport.close()
+
+
+async def load(port, clients, seconds):
+    base_url = f"http://127.0.0.1:{port}/api/v1/covercalibrator/0"
+    samples, errors = [], []
+    stop_at = time.monotonic() + seconds
+    await asyncio.gather(*(client(base_url, stop_at, samples, errors, i) for i in range(clients)))
+    return samples, errors
+
+
+def summarize(samples, errors, seconds):
+    if len(samples) < 2:
+        return {"rps": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "errors": len(errors)}
+    q = statistics.quantiles(samples, n=100)
+    return {"rps": len(samples) / seconds, "p50": q[49], "p95": q[94], "p99": q[98], "errors": len(errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the WSGI and ASGI driver modes")
+    parser.add_argument("--clients", default="8,64,256", help="Comma separated concurrent client counts")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--response-delay-ms", type=float, default=10.0, help="Panel service time per request")
+    parser.add_argument("--cache-ttl", type=float, default=0.0, help="Driver cache TTL in seconds (0 = off)")
+    parser.add_argument("--workers", type=int, default=8, help="WSGI worker threads")
+    parser.add_argument("--modes", default="wsgi,asgi")
+    parser.add_argument("--serve", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--panel", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.panel, args.cache_ttl, args.workers)
+        return
+
+    panel_port = free_port()
+    panel = subprocess.Popen([sys.executable, os.path.join(TEST_DIR, "fake_flataf.py"), "--port", str(panel_port),
+                              "--response-delay-ms", str(args.response_delay_ms)], stdout=subprocess.DEVNULL)
+    panel_url = f"http://127.0.0.1:{panel_port}/api/v1/covercalibrator/0"
+    results = []
+    try:
+        wait_listening(panel_port)
+        for mode in args.modes.split(","):
+            if mode == "asgi":
+                try:
+                    import uvicorn # type: ignore # noqa: F401
+                except ImportError:
+                    print("[SKIP] asgi: uvicorn is not installed")
+                    continue
+            port = free_port()
+            server = subprocess.Popen([sys.executable, __file__, "--serve", mode, "--port", str(port),
+                                       "--panel", panel_url, "--cache-ttl", str(args.cache_ttl),
+                                       "--workers", str(args.workers)])
+            try:
+                wait_listening(port)
+                for clients in (int(c) for c in args.clients.split(",")):
+                    samples, errors = asyncio.run(load(port, clients, args.seconds))
+                    result = dict(mode=mode, clients=clients, **summarize(samples, errors, args.seconds))
+                    results.append(result)
+                    print(f"[RUN] {mode} clients={clients} done")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        panel.terminate()
+        panel.wait()
+
+    print()
+    print(f"Panel service time {args.response_delay_ms} ms, cache TTL {args.cache_ttl} s, "
+          f"{args.workers} WSGI workers, {args.seconds} s per run")
+    print(f"{'mode':<6}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<6}{r['clients']:>8}{r['rps']:>10.0f}{r['p50']:>10.1f}{r['p95']:>10.1f}"
+              f"{r['p99']:>10.1f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
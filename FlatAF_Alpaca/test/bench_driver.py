@@ -0,0 +1,380 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF Alpaca Driver
+Purpose: End-to-end latency, throughput and CPU benchmark of the Alpaca driver
+Website: https://astroaf.space
+License: See LICENSE.md (ASCOM and CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+
+Starts the firmware stand-in (fake_flataf.py), then the driver itself
+(app.main(), or asgi_app.main() with --mode asgi) in its own process with
+the panel pinned to the stand-in. Simulated Alpaca clients then call every
+endpoint init_routes() generates, GETs and PUTs, round robin, for a fixed
+time at each concurrency asked for. Reports p50/p95/p99 latency overall
+and per endpoint, requests per second and the driver's CPU time (read from
+its /management/v1/metrics).
+
+--json writes the results, with the settings and versions used, for a
+later --compare. --compare exits 1 if requests per second, p95, p99 or
+CPU per request got worse than --tolerance percent. Compare runs made with
+the same settings on the same machine.
+
+Run Instructions:
+  python bench_driver.py [--clients 1,8,32] [--seconds 5] [--response-delay-ms 5]
+                         [--json results.json] [--compare baseline.json]
+  python bench_driver.py --load results.json --compare baseline.json   (no run)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+# Device-specific PUT fields, so each method does its real work (or answers
+# its real NotImplemented) instead of a 400 for a missing parameter
+PUT_FIELDS = {
+    "action": {"Action": "bench", "Parameters": ""},
+    "commandblind": {"Command": "bench", "Raw": "false"},
+    "commandbool": {"Command": "bench", "Raw": "false"},
+    "commandstring": {"Command": "bench", "Raw": "false"},
+    "connected": {"Connected": "true"},
+    "disconnect": {"Connected": "false"},
+    "brightness": {"Brightness": "100"},
+    "calibratoron": {"Brightness": "100"},
+}
+
+METRICS = ("rps", "p50", "p95", "p99", "cpu_ms_per_req")
+WORSE_IF_HIGHER = {"p50", "p95", "p99", "cpu_ms_per_req"}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_listening(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise Exception(f"Nothing listening on port {port} after {timeout}s")
+
+
+def endpoints():
+    """(method, name) of every Alpaca endpoint, found the way init_routes finds them"""
+    import covercalibrator
+    from enum import IntEnum
+    found = []
+    for cname, ctype in vars(covercalibrator).items():
+        if isinstance(ctype, type) and ctype.__module__ == covercalibrator.__name__ \
+                and not issubclass(ctype, IntEnum):
+            for method in ("GET", "PUT"):
+                if hasattr(ctype, f"on_{method.lower()}"):
+                    found.append((method, cname.lower()))
+    return sorted(set(found))
+
+
+# ------------------------------------
+# Driver under test (child process)
+# ------------------------------------
+def serve(mode, port, panel_url, args):
+    from config import Config
+    Config.ip_address = "127.0.0.1"
+    Config.port = port
+    Config.panel_urls = [panel_url]                 # Pinned: no discovery broadcasts
+    Config.num_panels = 1
+    Config.worker_threads = args.workers
+    Config.log_level = args.log_level
+    if args.cache_ttl is not None:
+        Config.connected_ttl = Config.brightness_ttl = args.cache_ttl
+    if mode == "wsgi":
+        import app
+        app.main()
+    else:
+        import asgi_app
+        asgi_app.main()
+
+
+# ------------------
+# Load generator
+# ------------------
+class Connection:
+    """One simulated client's HTTP connection, reopened when the server closes it"""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b""):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        head = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+        if body:
+            head += "Content-Type: application/x-www-form-urlencoded\r\n"
+        self.writer.write((head + "\r\n").encode("latin-1") + body)
+        try:
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("connection closed by the driver")
+            status = int(status_line.split()[1])
+            keep_alive = status_line.startswith(b"HTTP/1.1")
+            length = None
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                if name == "content-length":
+                    length = int(value)
+                elif name == "connection":
+                    keep_alive = value.strip().lower() == "keep-alive"
+            if length is None:
+                data = await self.reader.read()
+                keep_alive = False
+            else:
+                data = await self.reader.readexactly(length)
+        except BaseException:
+            self.close()
+            raise
+        if not keep_alive:
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def client(port, calls, stop_at, measure_from, samples, errors, index):
+    conn = Connection(port)
+    n = index
+    while time.monotonic() < stop_at:
+        method, name = calls[n % len(calls)]
+        n += 1
+        fields = {"ClientID": index + 1, "ClientTransactionID": n}
+        path = f"/api/v1/covercalibrator/0/{name}"
+        if method == "GET":
+            path, body = path + "?" + urlencode(fields), b""
+        else:
+            body = urlencode({**PUT_FIELDS.get(name, {}), **fields}).encode()
+        t0 = time.perf_counter()
+        try:
+            status, _ = await conn.request(method, path, body)
+            failed = status != 200
+        except Exception:
+            failed = True
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        if time.monotonic() < measure_from:
+            continue                                # Warm-up
+        if failed:
+            errors[f"{method} {name}"] = errors.get(f"{method} {name}", 0) + 1
+            await asyncio.sleep(0.01)
+        else:
+            samples.setdefault(f"{method} {name}", []).append(elapsed)
+    conn.close()
+
+
+async def load(port, calls, clients, seconds, warmup):
+    """Per-endpoint latencies, errors and driver CPU seconds over the measured time"""
+    samples, errors = {}, {}
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + seconds
+    tasks = [asyncio.ensure_future(client(port, calls, stop_at, measure_from, samples, errors, i))
+             for i in range(clients)]
+    await asyncio.sleep(warmup)
+    cpu_before = await scrape_cpu(port)
+    await asyncio.gather(*tasks)
+    cpu_after = await scrape_cpu(port)
+    cpu = None if cpu_before is None or cpu_after is None else cpu_after - cpu_before
+    return samples, errors, cpu
+
+
+async def scrape_cpu(port):
+    """Driver CPU seconds, from its metrics endpoint"""
+    conn = Connection(port)
+    try:
+        _, data = await conn.request("GET", "/management/v1/metrics")
+    finally:
+        conn.close()
+    match = re.search(rb"^process_cpu_seconds_total (\S+)$", data, re.M)
+    return float(match.group(1)) if match else None
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": q[49], "p95": q[94], "p99": q[98]}
+
+
+def summarize(samples, errors, seconds, cpu):
+    every = [v for values in samples.values() for v in values]
+    result = {"requests": len(every), "rps": len(every) / seconds, **percentiles(every),
+              "errors": sum(errors.values()), "cpu_s": cpu,
+              "cpu_ms_per_req": (cpu * 1000.0 / len(every)) if cpu is not None and every else None}
+    result["endpoints"] = {
+        key: {"requests": len(samples.get(key, [])), **percentiles(samples.get(key, [])),
+              "errors": errors.get(key, 0)}
+        for key in sorted(set(samples) | set(errors))
+    }
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=TEST_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args):
+    calls = endpoints()
+    if args.endpoints:
+        wanted = set(args.endpoints.split(","))
+        calls = [c for c in calls if c[1] in wanted]
+    panel_port = free_port()
+    panel = subprocess.Popen([sys.executable, os.path.join(TEST_DIR, "fake_flataf.py"), "--port", str(panel_port),
+                              "--response-delay-ms", str(args.response_delay_ms)], stdout=subprocess.DEVNULL)
+    panel_url = f"http://127.0.0.1:{panel_port}/api/v1/covercalibrator/0"
+    runs = []
+    workdir = tempfile.mkdtemp(prefix="flataf-bench-")     # Driver log file goes here
+    try:
+        wait_listening(panel_port)
+        for mode in args.mode.split(","):
+            port = free_port()
+            command = [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port),
+                       "--panel", panel_url, "--workers", str(args.workers), "--log-level", args.log_level]
+            if args.cache_ttl is not None:
+                command += ["--cache-ttl", str(args.cache_ttl)]
+            server = subprocess.Popen(command, cwd=workdir)
+            try:
+                wait_listening(port)
+                for clients in (int(c) for c in args.clients.split(",")):
+                    samples, errors, cpu = asyncio.run(load(port, calls, clients, args.seconds, args.warmup))
+                    runs.append({"mode": mode, "clients": clients, **summarize(samples, errors, args.seconds, cpu)})
+                    print(f"[RUN] {mode} clients={clients} done")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        panel.terminate()
+        panel.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "settings": {"seconds": args.seconds, "warmup": args.warmup, "response_delay_ms": args.response_delay_ms,
+                     "cache_ttl": args.cache_ttl, "workers": args.workers, "log_level": args.log_level,
+                     "endpoints": [f"{m} {n}" for m, n in calls]},
+        "versions": {"driver": git_revision(), "python": platform.python_version(),
+                     "platform": platform.platform(), "cpus": os.cpu_count()},
+        "runs": runs,
+    }
+
+
+def report(results, per_endpoint):
+    s = results["settings"]
+    print()
+    print(f"Driver {results['versions']['driver']}, panel service time {s['response_delay_ms']} ms, "
+          f"cache TTL {s['cache_ttl'] if s['cache_ttl'] is not None else 'from config.toml'}, "
+          f"{s['workers']} WSGI workers, {s['seconds']} s per run, {len(s['endpoints'])} endpoints")
+    print(f"{'mode':<6}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'CPU s':>8}{'CPU ms/req':>12}{'errors':>8}")
+    for r in results["runs"]:
+        cpu = f"{r['cpu_s']:>8.2f}{r['cpu_ms_per_req']:>12.3f}" if r["cpu_s"] is not None else f"{'-':>8}{'-':>12}"
+        print(f"{r['mode']:<6}{r['clients']:>8}{r['rps']:>10.0f}{r['p50']:>10.2f}{r['p95']:>10.2f}"
+              f"{r['p99']:>10.2f}{cpu}{r['errors']:>8}")
+        if per_endpoint:
+            for key, e in r["endpoints"].items():
+                print(f"    {key:<26}{e['requests']:>8}{e['p50']:>10.2f}{e['p95']:>10.2f}{e['p99']:>10.2f}"
+                      f"{e['errors']:>8}")
+
+
+def compare(baseline, results, tolerance):
+    """Print the change in each headline number; True if any got worse than ``tolerance`` %"""
+    if baseline["settings"] != results["settings"]:
+        print("[WARNING] Baseline was run with different settings; the comparison may not mean much")
+    old_runs = {(r["mode"], r["clients"]): r for r in baseline["runs"]}
+    regressed = False
+    print()
+    print(f"Compared with {baseline['versions']['driver']} (tolerance {tolerance}%)")
+    for r in results["runs"]:
+        old = old_runs.get((r["mode"], r["clients"]))
+        if old is None:
+            continue
+        changes = []
+        for metric in METRICS:
+            if old.get(metric) in (None, 0) or r.get(metric) is None:
+                continue
+            change = (r[metric] - old[metric]) * 100.0 / old[metric]
+            worse = change > tolerance if metric in WORSE_IF_HIGHER else change < -tolerance
+            regressed |= worse
+            changes.append(f"{metric} {change:+.1f}%{' REGRESSION' if worse else ''}")
+        print(f"{r['mode']:<6}{r['clients']:>8}  " + ", ".join(changes))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the FlatAF Alpaca driver")
+    parser.add_argument("--clients", default="1,8,32", help="Comma separated concurrent client counts")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Measured seconds per client count")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before each run")
+    parser.add_argument("--response-delay-ms", type=float, default=5.0, help="Panel service time per request")
+    parser.add_argument("--cache-ttl", type=float, help="Driver cache TTL in seconds (default: config.toml)")
+    parser.add_argument("--workers", type=int, default=8, help="WSGI worker threads")
+    parser.add_argument("--log-level", default="WARNING", help="Driver log level during the run")
+    parser.add_argument("--mode", default="wsgi", help="wsgi (app.py), asgi (asgi_app.py) or wsgi,asgi")
+    parser.add_argument("--endpoints", help="Comma separated endpoint names (default: all)")
+    parser.add_argument("--per-endpoint", action="store_true", help="Print the per-endpoint breakdown")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--load", help="Report results saved with --json instead of running")
+    parser.add_argument("--compare", help="Results saved with --json to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Percent change counted as a regression")
+    parser.add_argument("--serve", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--panel", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.panel, args)
+        return
+
+    if args.load:
+        with open(args.load) as f:
+            results = json.load(f)
+    else:
+        results = run(args)
+    report(results, args.per_endpoint)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
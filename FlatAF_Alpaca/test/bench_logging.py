@@ -0,0 +1,139 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF Alpaca Driver
+Purpose: Per-request cost of driver logging (off, direct to file, queued, queued + rate limit)
+Website: https://astroaf.space
+License: See LICENSE.md (ASCOM and CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+
+Sends Alpaca requests through the driver's Falcon app in-process. It uses
+the firmware stand-in (fake_flataf.py) with a long cache TTL, so after
+the first read the panel is out of the picture. Each request is timed
+with each logging setup:
+
+  off       log level WARNING, nothing written
+  direct    RotatingFileHandler on the logger (the previous setup)
+  queued    log.queue_handlers(), file written by the background listener
+  limited   queued, plus the [logging] endpoint_interval rate limit on polls
+
+--disk-latency-ms adds a sleep to every file write. It stands in for a
+slow or busy disk on the observatory PC. Queued writes still happen, but
+later, on the listener thread.
+
+Run Instructions:
+  python bench_logging.py [--count 5000] [--disk-latency-ms 0]
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import sys
+import tempfile
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+from config import Config
+Config.connected_ttl = Config.brightness_ttl = 3600.0
+import app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+
+ROUTES = ["connected", "brightness", "calibratorstate", "devicestate", "name"]
+
+
+class SlowFileHandler(logging.handlers.RotatingFileHandler):
+    """File handler whose every write takes at least ``latency`` seconds"""
+
+    def __init__(self, filename, latency):
+        super().__init__(filename, maxBytes=50 * 1000000, backupCount=1)
+        self.latency = latency
+
+    def emit(self, record):
+        if self.latency:
+            time.sleep(self.latency)
+        super().emit(record)
+
+
+def setup(name, path, latency):
+    """Configure the driver logger for one run; returns the listener or None"""
+    logger = logging.getLogger("bench_logging")
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+    logger.propagate = False
+    log.endpoint_rate_limit = log.EndpointRateLimit({"connected": 10.0} if name == "limited" else {})
+    if name == "off":
+        logger.setLevel(logging.WARNING)
+        logger.addHandler(logging.NullHandler())
+        listener = None
+    else:
+        logger.setLevel(logging.INFO)
+        handler = SlowFileHandler(path, latency)
+        handler.setFormatter(logging.Formatter('%(asctime)s.%(msecs)03d %(levelname)s %(message)s',
+                                               '%Y-%m-%dT%H:%M:%S'))
+        logger.addHandler(handler)
+        listener = None if name == "direct" else log.queue_handlers(logger)
+    log.logger = covercalibrator.logger = exceptions.logger = logger
+    shr.set_shr_logger(logger)
+    return listener
+
+
+def run(client, count):
+    """Mean and worst per-request wall time in microseconds"""
+    worst = 0.0
+    t0 = time.perf_counter()
+    for n in range(count):
+        t1 = time.perf_counter()
+        r = client.simulate_get(f"/api/v1/covercalibrator/0/{ROUTES[n % len(ROUTES)]}",
+                                query_string=f"ClientID=1&ClientTransactionID={n + 1}")
+        worst = max(worst, time.perf_counter() - t1)
+        if r.status_code != 200:
+            raise Exception(f"HTTP {r.status_code}: {r.text}")
+    return (time.perf_counter() - t0) / count * 1e6, worst * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Driver logging overhead per request")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--disk-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, _state, url = fake_flataf.start()
+    covercalibrator.device(0).set_url(url)
+    falc_app = falcon.App()
+    app.add_routes(falc_app)
+    client = falcon.testing.TestClient(falc_app)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("off", "direct", "queued", "limited"):
+            path = os.path.join(tmp, f"{name}.log")
+            listener = setup(name, path, args.disk_latency_ms / 1000.0)
+            run(client, 50)                                 # Warm up (and fill the cache)
+            mean, worst = run(client, args.count)
+            t0 = time.perf_counter()
+            if listener is not None:
+                listener.stop()                             # Wait for the queued writes
+            drain = time.perf_counter() - t0
+            with open(path) if os.path.exists(path) else open(os.devnull) as f:
+                lines = sum(1 for _ in f)
+            results.append((name, mean, worst, lines, drain))
+    server.shutdown()
+
+    print(f"\n{args.count} requests per setup, disk latency {args.disk_latency_ms} ms per write")
+    print(f"{'logging':<10}{'mean us':>10}{'worst us':>12}{'lines':>8}{'drain s':>10}")
+    base = results[0][1]
+    for name, mean, worst, lines, drain in results:
+        print(f"{name:<10}{mean:>10.1f}{worst:>12.0f}{lines:>8}{drain:>10.2f}   (+{mean - base:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
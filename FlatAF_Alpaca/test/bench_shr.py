@@ -0,0 +1,153 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF Alpaca Driver
+Purpose: Per-response CPU cost of the Alpaca response encoder in shr.py, before and after
+Website: https://astroaf.space
+License: See LICENSE.md (ASCOM and CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+
+Times PropertyResponse / MethodResponse construction plus .json for the
+shapes the driver returns (scalar, DeviceState list, error, method) with
+the previous implementation (reproduced below as Legacy*) and with the
+current shr.py. The logger is at INFO with only a NullHandler. That is
+the driver's default level, but without the file I/O. Before timing, it
+checks that both implementations produce the same JSON text.
+
+Run Instructions:
+  python bench_shr.py [--count 50000]
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from threading import Lock
+
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "device")
+sys.path.insert(0, os.path.abspath(DEVICE_DIR))   # config.py reads sys.path[0]/config.toml
+
+import falcon.testing # type: ignore
+import exceptions
+import shr
+from exceptions import Success, NotConnectedException
+from shr import PropertyResponse, MethodResponse, StateValue, get_request_field
+
+logger = logging.getLogger("bench_shr")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.NullHandler())
+shr.set_shr_logger(logger)
+exceptions.logger = logger
+
+
+# -------------------------------------------
+# Previous implementation, for comparison
+# -------------------------------------------
+_legacy_lock = Lock()
+_legacy_stid = 0
+
+def legacy_next_trans_id():
+    global _legacy_stid
+    with _legacy_lock:
+        _legacy_stid += 1
+    return _legacy_stid
+
+
+class LegacyStateValue:
+    def __init__(self, name, value):
+        self.Name = name
+        self.Value = value
+
+
+class LegacyPropertyResponse:
+    def __init__(self, value, req, err=Success()):
+        self.ServerTransactionID = legacy_next_trans_id()
+        self.ClientTransactionID = int(get_request_field('ClientTransactionID', req, False, 0))
+        if err.Number == 0 and not value is None:
+            self.Value = value
+            logger.info(f'{req.remote_addr} <- {str(value)}')
+        self.ErrorNumber = err.Number
+        self.ErrorMessage = err.Message
+
+    @property
+    def json(self):
+        return json.dumps(self, default=lambda o: o.__dict__)
+
+
+class LegacyMethodResponse:
+    def __init__(self, req, err=None):
+        self.ServerTransactionID = 1
+        self.ClientTransactionID = 0
+        self.ErrorNumber = 0
+        self.ErrorMessage = ""
+        self.Value = None
+        if hasattr(req, "params"):
+            self.ClientTransactionID = int(req.params.get("ClientTransactionID", 0))
+        if err:
+            self.ErrorNumber = getattr(err, "Number", 0x500)
+            self.ErrorMessage = str(getattr(err, "Message", getattr(err, "description", str(err))))
+
+    @property
+    def json(self):
+        return json.dumps(self.__dict__)
+
+
+# ----------
+# Scenarios
+# ----------
+def scenarios(prop, meth, state_value):
+    req = falcon.testing.create_req(path="/api/v1/covercalibrator/0/brightness",
+                                    query_string="ClientID=1&ClientTransactionID=42")
+    return {
+        "scalar": lambda: prop(12345, req).json,
+        "bool": lambda: prop(True, req).json,
+        "devicestate": lambda: prop([
+            state_value("CalibratorState", 3),
+            state_value("CoverState", 0),
+            state_value("CalibratorChanging", False),
+            state_value("CoverMoving", False),
+            state_value("Brightness", 12345),
+        ], req).json,
+        "error": lambda: prop(None, req, NotConnectedException()).json,
+        "method": lambda: meth(req).json,
+    }
+
+
+def without_stid(text):
+    return re.sub(r'"ServerTransactionID": \d+', '', text)
+
+
+def per_call_us(fn, count):
+    t0 = time.process_time()
+    for _ in range(count):
+        fn()
+    return (time.process_time() - t0) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="shr.py response encoder microbenchmark")
+    parser.add_argument("--count", type=int, default=50000)
+    args = parser.parse_args()
+
+    before = scenarios(LegacyPropertyResponse, LegacyMethodResponse, LegacyStateValue)
+    after = scenarios(PropertyResponse, MethodResponse, StateValue)
+
+    for name in before:
+        old, new = without_stid(before[name]()), without_stid(after[name]())
+        if old != new:
+            print(f"[FAIL] {name}: output differs\n  before: {old}\n  after:  {new}")
+            sys.exit(1)
+    print("[INFO] Same JSON from both implementations")
+
+    print(f"\n{'response':<14}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    for name in before:
+        b = per_call_us(before[name], args.count)
+        a = per_call_us(after[name], args.count)
+        print(f"{name:<14}{b:>12.2f}{a:>12.2f}{b / a:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
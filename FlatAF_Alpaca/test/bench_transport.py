@@ -0,0 +1,85 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF Alpaca Driver
+Purpose: Round-trip latency of driver-to-panel calls, per-call requests vs pooled transport
+Website: https://astroaf.space
+License: See LICENSE.md (ASCOM and CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+
+Starts the firmware stand-in (fake_flataf.py) and times the same GET
+/brightness call made two ways: the old module-level requests.get (new
+TCP connection per call) and transport.DeviceTransport (pooled keep-alive).
+Use --connect-delay-ms to approximate the handshake cost over Wi-Fi.
+
+Both are timed twice: against a panel that keeps connections alive (the
+firmware since keep-alive support) and against one that sends
+Connection: close on every response (the firmware before it). The pool
+only saves handshakes on the first; on the second both open a connection
+per call.
+
+Run Instructions:
+  python bench_transport.py [--calls 500] [--connect-delay-ms 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "device")
+sys.path.insert(0, os.path.abspath(DEVICE_DIR))   # config.py reads sys.path[0]/config.toml
+
+import requests # type: ignore
+import fake_flataf
+from transport import DeviceTransport
+
+
+def timed(fn, calls):
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<22} mean {statistics.mean(samples):8.3f} ms   "
+          f"p50 {statistics.median(samples):8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def run(calls, connect_delay_ms, close):
+    server, state, base_url = fake_flataf.start(connect_delay_ms=connect_delay_ms, close=close)
+    url = f"{base_url}/brightness"
+
+    before = timed(lambda: requests.get(url, timeout=5).json(), calls)
+    conns_before = state.connections
+
+    transport = DeviceTransport(base_url)
+    after = timed(lambda: transport.get("brightness").json(), calls)
+    conns_after = state.connections - conns_before
+
+    print(f"Panel {'closing every connection' if close else 'keeping connections alive'}:")
+    report("requests.get", before)
+    report("DeviceTransport", after)
+    print(f"TCP connections opened: requests.get {conns_before}, DeviceTransport {conns_after}")
+    transport.close()
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Driver transport latency benchmark")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls, connect delay {args.connect_delay_ms} ms")
+    run(args.calls, args.connect_delay_ms, close=False)
+    run(args.calls, args.connect_delay_ms, close=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Circuit Breaker Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises circuitbreaker.CircuitBreaker directly. It then points the
+  driver at the firmware stand-in (fake_flataf.py) answering slower than
+  the driver's timeouts. Checks that after a few failed calls the driver
+  answers NotConnected at once instead of waiting out each timeout, and
+  that it notices the panel answering again.
+
+Run Instructions:
+  python circuit_breaker_tests.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+TIMEOUT = 0.3
+RESET = 0.5
+
+from config import Config
+Config.connect_timeout = Config.status_timeout = Config.read_timeout = Config.write_timeout = TIMEOUT
+Config.breaker_failure_threshold = 3
+Config.breaker_reset_timeout = RESET
+Config.connected_ttl = Config.brightness_ttl = 0.0      # Every read reaches the panel
+Config.brightness_settle = 0.0
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import circuitbreaker
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+from circuitbreaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+logger = logging.getLogger("circuit_breaker_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = circuitbreaker.logger = logger
+shr.set_shr_logger(logger)
+
+NOT_CONNECTED = 0x407
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def fail():
+    raise Exception("panel unreachable")
+
+
+def trip(breaker, times):
+    for _ in range(times):
+        try:
+            breaker.call(fail)
+        except Exception:
+            pass
+
+
+def test_opens_and_fails_fast():
+    def body():
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=RESET)
+        calls = []
+        trip(breaker, 2)
+        check(breaker.state == CLOSED, f"open after 2 failures: {breaker.stats()}")
+        trip(breaker, 1)
+        check(breaker.state == OPEN, f"not open after 3 failures: {breaker.stats()}")
+        try:
+            breaker.call(lambda: calls.append(1))
+            check(False, "call made with the breaker open")
+        except CircuitOpenError:
+            pass
+        check(not calls, "function called with the breaker open")
+        check(breaker.stats() == {"state": OPEN, "failures": 3, "opened": 1, "rejected": 1},
+              f"stats {breaker.stats()}")
+    return run_test("CircuitBreaker - Opens after the threshold and then fails fast", body)
+
+
+def test_probe_and_backoff():
+    def body():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=RESET, max_reset_timeout=RESET * 3)
+        trip(breaker, 1)
+        time.sleep(RESET)
+        trip(breaker, 1)                                # Failed probe doubles the backoff
+        check(breaker.state == OPEN, f"state {breaker.state}")
+        time.sleep(RESET * 1.5)
+        try:
+            breaker.call(lambda: None)
+            check(False, "probe let through before the doubled backoff")
+        except CircuitOpenError:
+            pass
+        time.sleep(RESET)
+        check(breaker.call(lambda: "ok") == "ok", "probe not let through")
+        check(breaker.state == CLOSED and breaker.failures == 0, f"not closed by the probe: {breaker.stats()}")
+        trip(breaker, 1)
+        time.sleep(RESET)                               # Backoff back to reset_timeout after closing
+        check(breaker.call(lambda: "ok") == "ok", "backoff not reset by closing")
+    return run_test("CircuitBreaker - Half-open probe with doubling backoff, closes on success", body)
+
+
+def test_one_probe_at_a_time():
+    def body():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+        trip(breaker, 1)
+        rejected = []
+
+        def probe():
+            check(breaker.state == HALF_OPEN, f"state {breaker.state}")
+            try:
+                breaker.call(lambda: None)
+            except CircuitOpenError:
+                rejected.append(1)
+
+        breaker.call(probe)
+        check(rejected, "second call let through while the probe was in flight")
+        check(breaker.call(lambda: "ok", force=True) == "ok", "forced call refused")
+    return run_test("CircuitBreaker - One probe at a time; forced calls always go through", body)
+
+
+def test_threshold_zero_never_opens():
+    def body():
+        breaker = CircuitBreaker("test", failure_threshold=0)
+        trip(breaker, 10)
+        check(breaker.state == CLOSED, f"state {breaker.state}")
+    return run_test("CircuitBreaker - failure_threshold 0 never opens", body)
+
+
+def test_cancelled_probe_not_counted():
+    def body():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=RESET, max_reset_timeout=RESET * 4)
+        trip(breaker, 1)
+        time.sleep(RESET)
+
+        async def probe():
+            started = asyncio.Event()
+
+            async def stalled():
+                started.set()
+                await asyncio.sleep(10)
+
+            task = asyncio.ensure_future(breaker.call_async(stalled))
+            await started.wait()
+            check(breaker.state == HALF_OPEN, f"state {breaker.state}")
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        asyncio.run(probe())
+        check(breaker.failures == 1, f"cancelled probe counted: {breaker.stats()}")
+        check(breaker.state == OPEN, f"state {breaker.state}")
+        trip(breaker, 1)                                # Next probe let through at once and fails
+        check(breaker.failures == 2, f"probe not let through after the cancel: {breaker.stats()}")
+        time.sleep(RESET * 2)                           # Backoff doubled once, not twice
+        check(breaker.call(lambda: "ok") == "ok", "backoff doubled by the cancelled probe")
+    return run_test("CircuitBreaker - A cancelled probe is handed back, not counted", body)
+
+
+def test_interrupt_not_counted():
+    def body():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=RESET)
+
+        def interrupted():
+            raise KeyboardInterrupt()
+
+        try:
+            breaker.call(interrupted)
+            check(False, "KeyboardInterrupt swallowed")
+        except KeyboardInterrupt:
+            pass
+        check(breaker.state == CLOSED and breaker.failures == 0, f"interrupt counted: {breaker.stats()}")
+    return run_test("CircuitBreaker - KeyboardInterrupt passes through and is not counted", body)
+
+
+def test_driver_offline_panel():
+    def body():
+        server, state, url = fake_flataf.start(response_delay_ms=TIMEOUT * 3000)
+        server.handle_error = lambda request, client_address: None    # Driver hung up on it
+        try:
+            ctx = covercalibrator.device(0)
+            ctx.set_url(url)
+            ctx.pinned = True
+            falc_app = falcon.App()
+            app.add_routes(falc_app)
+            client = falcon.testing.TestClient(falc_app)
+
+            def get(prop):
+                t0 = time.perf_counter()
+                r = client.simulate_get(f"/api/v1/covercalibrator/0/{prop}",
+                                        query_string="ClientID=1&ClientTransactionID=1").json
+                return r, time.perf_counter() - t0
+
+            slow = [get("brightness") for _ in range(3)]
+            print(f"[INFO] Timing out: {[f'{t * 1000:.0f} ms' for _, t in slow]}")
+            check(ctx.breaker.state == OPEN, f"breaker {ctx.breaker.stats()}")
+            fast = [get(prop) for prop in ("brightness", "connected", "devicestate", "brightness")]
+            print(f"[INFO] Breaker open: {[f'{t * 1000:.1f} ms' for _, t in fast]}")
+            check(all(t < TIMEOUT / 3 for _, t in fast), "calls still waiting on the panel")
+            check(fast[0][0]["ErrorNumber"] == NOT_CONNECTED, f"brightness {fast[0][0]}")
+            check(fast[1][0]["Value"] is False, f"connected {fast[1][0]}")
+            check(fast[2][0]["ErrorNumber"] == NOT_CONNECTED, f"devicestate {fast[2][0]}")
+            r = client.simulate_put("/api/v1/covercalibrator/0/brightness",
+                                    body="Brightness=100&ClientID=1&ClientTransactionID=2",
+                                    content_type="application/x-www-form-urlencoded").json
+            check(r["ErrorNumber"] == NOT_CONNECTED, f"brightness PUT {r}")
+
+            server.RequestHandlerClass.response_delay = 0.0     # Panel back on line
+            time.sleep(TIMEOUT * 3 + RESET * 2)                 # Let stalled requests and the backoff pass
+            r, _ = get("brightness")
+            check(r["ErrorNumber"] == 0 and ctx.breaker.state == CLOSED,
+                  f"not recovered: {r}, breaker {ctx.breaker.stats()}")
+            print(f"[INFO] Breaker stats: {ctx.breaker.stats()}")
+        finally:
+            server.shutdown()
+    return run_test("covercalibrator - Offline panel answers NotConnected at once, then recovers", body)
+
+
+def run_all():
+    tests = [
+        test_opens_and_fails_fast,
+        test_probe_and_backoff,
+        test_one_probe_at_a_time,
+        test_threshold_zero_never_opens,
+        test_cancelled_probe_not_counted,
+        test_interrupt_not_counted,
+        test_driver_offline_panel,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,198 @@
+"""
+Panel State Cache Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises devicecache.DeviceStateCache directly: staleness bounds,
+  invalidation, the hit/miss counters and the generation check that keeps
+  a panel read overtaken by a driver write out of the cache. Then holds a
+  panel read open in the driver, against the firmware stand-in
+  (fake_flataf.py), while a brightness write is made, and checks the
+  written brightness is what later GETs return. Last, reads the counters
+  back from /management/v1/cache.
+
+Run Instructions:
+  python device_cache_tests.py
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+from config import Config
+Config.connected_ttl = Config.brightness_ttl = 30.0     # Nothing expires during a test
+Config.brightness_settle = 0.0
+Config.fade = 0.0
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+from devicecache import DeviceStateCache, MISS
+
+logger = logging.getLogger("device_cache_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def test_ttl_and_counters():
+    def body():
+        cache = DeviceStateCache({"brightness": 0.2, "connected": 0})
+        check(cache.lookup("brightness") is MISS, "empty cache hit")
+        cache.put("brightness", 100)
+        cache.put("connected", True)                # A bound of 0 is never cached
+        check(cache.lookup("brightness") == 100, "fresh value missed")
+        check(cache.lookup("connected") is MISS, "uncached property hit")
+        time.sleep(0.25)
+        check(cache.lookup("brightness") is MISS, "stale value hit")
+        stats = cache.stats()
+        check(stats["hits"] == 1 and stats["misses"] == 3 and stats["hit_rate"] == 0.25, f"stats {stats}")
+    return run_test("DeviceStateCache - Staleness bound, uncached properties and counters", body)
+
+
+def test_invalidate():
+    def body():
+        cache = DeviceStateCache({"brightness": 30, "state": 30})
+        cache.put("brightness", 1)
+        cache.put("state", {"brightness": 1})
+        cache.invalidate("state")
+        check(cache.lookup("state") is MISS and cache.lookup("brightness") == 1, "invalidate(name)")
+        cache.invalidate()
+        check(cache.lookup("brightness") is MISS, "invalidate() kept a value")
+    return run_test("DeviceStateCache - Invalidate one property or all", body)
+
+
+def test_generation():
+    def body():
+        cache = DeviceStateCache({"brightness": 30})
+        generation = cache.generation()             # A read starts...
+        cache.invalidate("state")                   # ...a write lands...
+        cache.put("brightness", 5000)               # ...and is written through
+        cache.put("brightness", 0, generation)      # The read finishes with the old value
+        check(cache.lookup("brightness") == 5000, "read from before the write was cached")
+        check(cache.stats()["dropped"] == 1, f"stats {cache.stats()}")
+        cache.put("brightness", 7, cache.generation())
+        check(cache.lookup("brightness") == 7, "read of the current generation not cached")
+    return run_test("DeviceStateCache - A read overtaken by a write is not cached", body)
+
+
+def slow_read_around_write(read_name, get, cached):
+    """Hold the panel read ``read_name`` open while a brightness write is made
+
+    Returns what ``get(ctx)`` answers after the read has finished, checking
+    it came from the cache if ``cached``.
+    """
+    server, st, url = fake_flataf.start(connected=True)
+    real_read = getattr(covercalibrator, read_name)
+    read_done = threading.Event()
+    release = threading.Event()
+
+    def slow_read(ctx):
+        result = real_read(ctx)         # Brightness 0, from before the write
+        read_done.set()
+        release.wait(5)
+        return result
+
+    try:
+        ctx = covercalibrator.device(0)
+        ctx.set_url(url)
+        setattr(covercalibrator, read_name, slow_read)
+        reader = threading.Thread(target=get, args=(ctx,))
+        reader.start()
+        check(read_done.wait(5), "panel read did not start")
+        covercalibrator.set_device_brightness(ctx, 20000)
+        release.set()
+        reader.join(5)
+        setattr(covercalibrator, read_name, real_read)
+        requests_before = st.requests
+        value = get(ctx)
+        check(st.requests == requests_before or not cached, "answer did not come from the cache")
+        return value
+    finally:
+        release.set()
+        setattr(covercalibrator, read_name, real_read)
+        server.shutdown()
+
+
+def test_driver_brightness_read():
+    def body():
+        value = slow_read_around_write("_read_device_brightness", covercalibrator.get_device_brightness, True)
+        check(value == 20000, f"Brightness {value} after writing 20000")
+    return run_test("covercalibrator - Brightness read overtaken by a write does not undo it", body)
+
+
+def test_driver_state_read():
+    def body():
+        # The write drops the cached state, so this one is read afresh
+        state = slow_read_around_write("read_panel_state", covercalibrator.get_panel_state, False)
+        check(state["brightness"] == 20000, f"DeviceState brightness {state['brightness']} after writing 20000")
+    return run_test("covercalibrator - Panel state read overtaken by a write does not undo it", body)
+
+
+def test_management_route():
+    def body():
+        falc_app = falcon.App()
+        app.add_routes(falc_app)
+        client = falcon.testing.TestClient(falc_app)
+        r = client.simulate_get("/management/v1/cache", query_string="ClientID=1&ClientTransactionID=1")
+        data = json.loads(r.text)
+        check(data["ErrorNumber"] == 0, f"reply {data}")
+        counters = data["Value"]
+        check([c["DeviceNumber"] for c in counters] == list(range(len(covercalibrator.devices))), f"{counters}")
+        check(counters[0] == dict(DeviceNumber=0, **covercalibrator.device(0).cache.stats()), f"{counters[0]}")
+        check(counters[0]["hits"] >= 1 and counters[0]["dropped"] >= 1, f"{counters[0]}")
+    return run_test("management - Cache counters at /management/v1/cache", body)
+
+
+def run_all():
+    tests = [
+        test_ttl_and_counters,
+        test_invalidate,
+        test_generation,
+        test_driver_brightness_read,
+        test_driver_state_read,
+        test_management_route,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,411 @@
+"""
+Discovery Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises dynamic_discovery.DiscoveryEngine against local UDP responders
+  that answer like FlatAF panels. Each responder binds its own loopback
+  address (127.0.0.x, Linux) on a private port, standing in for a panel on
+  a separate interface, so no real network or hardware is needed.
+  Also covers the saved panel locations (discovery_cache.py): reading and
+  writing the file, a corrupt file, the warm start from it and the
+  background rediscovery replacing a panel whose address changed.
+
+Run Instructions:
+  python discovery_tests.py
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+
+DEVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "device")
+sys.path.insert(0, os.path.abspath(DEVICE_DIR))   # config.py reads sys.path[0]/config.toml
+
+from config import Config
+Config.rediscovery_interval = 60.0      # One check per test
+
+import covercalibrator
+import discovery_cache
+import dynamic_discovery
+from discovery_cache import load_cached_panels, save_cached_panels
+from dynamic_discovery import DiscoveryEngine
+
+TEST_PORT = 42227       # Not the real discovery port, so a live panel can't interfere
+
+
+class Responder(threading.Thread):
+    """Answers Alpaca discovery like a FlatAF panel, optionally after a delay"""
+
+    def __init__(self, address, unique_id, alpaca_port=5555, delay=0.0, reply=None):
+        threading.Thread.__init__(self, daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((address, TEST_PORT))
+        self.sock.settimeout(0.2)
+        self.delay = delay
+        self.reply = reply or {
+            "AlpacaPort": alpaca_port,
+            "Manufacturer": "AstroAF",
+            "DeviceType": "CoverCalibrator",
+            "DeviceName": "FlatAF",
+            "UniqueID": unique_id
+        }
+        self.queries = 0
+        self.running = True
+        self.start()
+
+    def run(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if b"AlpacaDiscovery" in data:
+                self.queries += 1
+                if self.delay:
+                    time.sleep(self.delay)
+                self.sock.sendto(json.dumps(self.reply).encode(), addr)
+
+    def close(self):
+        self.running = False
+        self.join()
+        self.sock.close()
+
+
+def engine(targets, timeout=1.0):
+    return DiscoveryEngine(interfaces=["127.0.0.1"], port=TEST_PORT, timeout=timeout, targets=targets)
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def test_finds_all_panels():
+    def body():
+        rs = [Responder(f"127.0.0.{i}", f"panel{i}") for i in (2, 3, 4)]
+        try:
+            panels = engine([r.sock.getsockname()[0] for r in rs]).discover()
+            ids = sorted(p["UniqueID"] for p in panels)
+            check(ids == ["panel2", "panel3", "panel4"], f"found {ids}")
+            check(panels[0]["BaseURL"] == "http://127.0.0.2:5555/api/v1/covercalibrator/0",
+                  f"bad BaseURL {panels[0]['BaseURL']}")
+        finally:
+            for r in rs:
+                r.close()
+    return run_test("DiscoveryEngine.discover - Finds every panel", body)
+
+
+def test_stops_at_expected():
+    def body():
+        rs = [Responder("127.0.0.2", "fast"), Responder("127.0.0.3", "slow", delay=2.0)]
+        try:
+            t0 = time.monotonic()
+            panels = engine(["127.0.0.2", "127.0.0.3"], timeout=3.0).discover(expected=1)
+            elapsed = time.monotonic() - t0
+            check([p["UniqueID"] for p in panels] == ["fast"], f"found {panels}")
+            check(elapsed < 0.5, f"took {elapsed:.2f}s, expected early return")
+        finally:
+            for r in rs:
+                r.close()
+    return run_test("DiscoveryEngine.discover - Returns as soon as expected panels answer", body)
+
+
+def test_ignored_panels_not_counted():
+    def body():
+        rs = [Responder("127.0.0.2", "pinned"), Responder("127.0.0.3", "wanted", delay=0.4)]
+        pinned = {panel_info("127.0.0.2", "pinned")["BaseURL"]}
+        try:
+            panels = engine(["127.0.0.2", "127.0.0.3"], timeout=3.0).discover(expected=1, ignore=pinned)
+            ids = sorted(p["UniqueID"] for p in panels)
+            check(ids == ["pinned", "wanted"], f"blocking found {ids}")
+            panels = asyncio.run(engine(["127.0.0.2", "127.0.0.3"], timeout=3.0).discover_async(expected=1, ignore=pinned))
+            ids = sorted(p["UniqueID"] for p in panels)
+            check(ids == ["pinned", "wanted"], f"asyncio found {ids}")
+        finally:
+            for r in rs:
+                r.close()
+    return run_test("DiscoveryEngine.discover - Ignored (pinned) panels do not count towards expected", body)
+
+
+def test_slow_interface_does_not_block():
+    def body():
+        rs = [Responder("127.0.0.2", "slow", delay=0.5), Responder("127.0.0.3", "fast")]
+        try:
+            t0 = time.monotonic()
+            panels = engine(["127.0.0.2", "127.0.0.3"], timeout=2.0).discover(expected=2)
+            elapsed = time.monotonic() - t0
+            check(len(panels) == 2, f"found {panels}")
+            check(elapsed < 1.0, f"took {elapsed:.2f}s, queries were not sent in parallel")
+        finally:
+            for r in rs:
+                r.close()
+    return run_test("DiscoveryEngine.discover - Slow responder does not delay others", body)
+
+
+def test_dedup_by_identity():
+    def body():
+        r = Responder("127.0.0.2", "same")
+        try:
+            # Same panel queried twice (two targets resolving to it)
+            panels = engine(["127.0.0.2", "127.0.0.2", "localhost"], timeout=0.5).discover()
+            check(len(panels) == 1 and panels[0]["UniqueID"] == "same", f"found {panels}")
+        finally:
+            r.close()
+    return run_test("PanelRegistry - Duplicate replies collapse by identity", body)
+
+
+def test_ignores_other_devices():
+    def body():
+        rs = [Responder("127.0.0.2", "x", reply={"AlpacaPort": 11111}),
+              Responder("127.0.0.3", "y", reply={"AlpacaPort": 4, "Manufacturer": "Other",
+                                                  "DeviceType": "Telescope"}),
+              Responder("127.0.0.4", "flataf")]
+        try:
+            panels = engine(["127.0.0.2", "127.0.0.3", "127.0.0.4"], timeout=0.5).discover()
+            check([p["UniqueID"] for p in panels] == ["flataf"], f"found {panels}")
+        finally:
+            for r in rs:
+                r.close()
+    return run_test("DiscoveryEngine.discover - Ignores non-FlatAF Alpaca devices", body)
+
+
+def test_legacy_identity():
+    def body():
+        reply = {"AlpacaPort": 5555, "Manufacturer": "AstroAF", "DeviceType": "CoverCalibrator"}
+        r = Responder("127.0.0.2", None, reply=reply)
+        try:
+            panels = engine(["127.0.0.2"], timeout=0.5).discover(expected=1)
+            check(panels and panels[0]["UniqueID"] == "127.0.0.2:5555", f"found {panels}")
+        finally:
+            r.close()
+    return run_test("DiscoveryEngine.discover - Firmware without UniqueID keyed by address", body)
+
+
+def test_async_api():
+    def body():
+        rs = [Responder(f"127.0.0.{i}", f"panel{i}") for i in (2, 3)]
+        try:
+            t0 = time.monotonic()
+            panels = asyncio.run(engine(["127.0.0.2", "127.0.0.3"], timeout=3.0).discover_async(expected=2))
+            elapsed = time.monotonic() - t0
+            check(sorted(p["UniqueID"] for p in panels) == ["panel2", "panel3"], f"found {panels}")
+            check(elapsed < 0.5, f"took {elapsed:.2f}s, expected early return")
+        finally:
+            for r in rs:
+                r.close()
+    return run_test("DiscoveryEngine.discover_async - Finds panels and returns early", body)
+
+
+def test_nothing_answers():
+    def body():
+        t0 = time.monotonic()
+        panels = engine(["127.0.0.9"], timeout=0.3).discover(expected=1)
+        check(panels == [], f"found {panels}")
+        check(time.monotonic() - t0 >= 0.3, "returned before timeout")
+    return run_test("DiscoveryEngine.discover - Empty result after timeout", body)
+
+
+def test_probe():
+    def body():
+        r = Responder("127.0.0.2", "probe", alpaca_port=5555)
+        try:
+            url = "http://127.0.0.2:5555/api/v1/covercalibrator/0"
+            info = dynamic_discovery.probe_flataf(url, 0.5, port=TEST_PORT)
+            check(info and info["UniqueID"] == "probe", f"probe returned {info}")
+            wrong = dynamic_discovery.probe_flataf("http://127.0.0.2:6000/x", 0.3, port=TEST_PORT)
+            check(wrong is None, "probe accepted a panel on a different Alpaca port")
+        finally:
+            r.close()
+    return run_test("dynamic_discovery.probe_flataf - Unicast probe validates location", body)
+
+
+def panel_info(address, unique_id):
+    return {"BaseURL": f"http://{address}:5555/api/v1/covercalibrator/0", "UniqueID": unique_id,
+            "DeviceName": "FlatAF", "Address": address, "AlpacaPort": 5555}
+
+
+class SavedPanels:
+    """A temporary discovery cache file, and discovery on the test port
+
+    The background rediscovery probes and broadcasts on TEST_PORT instead
+    of the real discovery port; ``broadcasts`` counts its broadcasts.
+    """
+
+    def __init__(self, contents=None):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "discovery_cache.json")
+        self.broadcasts = 0
+        self._saved = (Config.discovery_cache_file, discovery_cache.probe_flataf, discovery_cache.discover_all)
+        Config.discovery_cache_file = self.path
+        discovery_cache.probe_flataf = partial(dynamic_discovery.probe_flataf, port=TEST_PORT)
+        discovery_cache.discover_all = self.discover_all
+        if contents is not None:
+            with open(self.path, "w") as f:
+                f.write(contents if isinstance(contents, str) else json.dumps(contents))
+
+    def discover_all(self, expected=None, ignore=()):
+        self.broadcasts += 1
+        return engine(["127.0.0.2", "127.0.0.3"], timeout=1.0).discover(expected, ignore)
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def close(self):
+        if covercalibrator.rediscovery is not None:
+            covercalibrator.rediscovery.stop()
+            covercalibrator.rediscovery.join(2)
+            covercalibrator.rediscovery = None
+        for ctx in covercalibrator.devices:
+            ctx.set_url("")
+            ctx.panel = None
+        Config.discovery_cache_file, discovery_cache.probe_flataf, discovery_cache.discover_all = self._saved
+        self.dir.cleanup()
+
+
+def test_cache_file():
+    def body():
+        saved = SavedPanels()
+        try:
+            check(load_cached_panels() == [], "no file should mean no panels")
+            panels = [panel_info("127.0.0.2", "a"), None]
+            save_cached_panels(panels)
+            check(load_cached_panels() == panels, f"read back {load_cached_panels()}")
+            check(not os.path.exists(saved.path[:-5] + ".tmp"), "temporary file left behind")
+            with open(saved.path, "w") as f:
+                json.dump({"Panels": [{"UniqueID": "no-url"}, panel_info("127.0.0.3", "b")]}, f)
+            check(load_cached_panels() == [None, panel_info("127.0.0.3", "b")], "entry without BaseURL kept")
+            with open(saved.path, "w") as f:
+                json.dump(panel_info("127.0.0.2", "single"), f)     # File written for one panel
+            check(load_cached_panels() == [panel_info("127.0.0.2", "single")], "single-panel file")
+        finally:
+            saved.close()
+    return run_test("discovery_cache - Saved panels read back by device number", body)
+
+
+def test_corrupt_cache_file():
+    def body():
+        r = Responder("127.0.0.2", "found", delay=0.3)
+        saved = SavedPanels("{not json")
+        try:
+            check(load_cached_panels() == [], "corrupt file not ignored")
+            rediscovery = covercalibrator.warm_start()
+            ctx = covercalibrator.device(0)
+            check(ctx.url == "", f"warm start used {ctx.url} from a corrupt file")
+            check(rediscovery.validated.wait(3), "rediscovery did not finish")
+            check(ctx.url == panel_info("127.0.0.2", "found")["BaseURL"], f"url {ctx.url}")
+            check(saved.read()["Panels"][0]["UniqueID"] == "found", "corrupt file not replaced")
+        finally:
+            saved.close()
+            r.close()
+    return run_test("covercalibrator.warm_start - Corrupt cache file ignored, panel found by broadcast", body)
+
+
+def test_warm_start():
+    def body():
+        r = Responder("127.0.0.2", "home")
+        saved = SavedPanels({"Panels": [panel_info("127.0.0.2", "home")]})
+        try:
+            t0 = time.monotonic()
+            rediscovery = covercalibrator.warm_start()
+            ctx = covercalibrator.device(0)
+            check(ctx.url == panel_info("127.0.0.2", "home")["BaseURL"], f"url {ctx.url}")
+            check(time.monotonic() - t0 < 0.2, "warm start waited on the network")
+            check(rediscovery.validated.wait(3), "saved location not validated")
+            check(r.queries == 1 and saved.broadcasts == 0, f"{r.queries} probes, {saved.broadcasts} broadcasts")
+        finally:
+            saved.close()
+            r.close()
+    return run_test("covercalibrator.warm_start - Saved location used at once and probed, no broadcast", body)
+
+
+def test_panel_moved():
+    def body():
+        r = Responder("127.0.0.2", "moved")       # Was at 127.0.0.3 when the file was saved
+        saved = SavedPanels({"Panels": [panel_info("127.0.0.3", "moved")]})
+        try:
+            rediscovery = covercalibrator.warm_start()
+            ctx = covercalibrator.device(0)
+            check(ctx.url == panel_info("127.0.0.3", "moved")["BaseURL"], f"url {ctx.url}")
+            check(rediscovery.validated.wait(3), "rediscovery did not finish")
+            new_url = panel_info("127.0.0.2", "moved")["BaseURL"]
+            check(ctx.url == new_url, f"url {ctx.url} after the panel moved")
+            check(saved.broadcasts == 1, f"{saved.broadcasts} broadcasts")
+            check(saved.read()["Panels"][0]["BaseURL"] == new_url, "new location not saved")
+        finally:
+            saved.close()
+            r.close()
+    return run_test("Rediscovery - Panel that moved is found again and its new address saved", body)
+
+
+def test_rediscovery_pinned_panel():
+    def body():
+        rs = [Responder("127.0.0.2", "pinned"), Responder("127.0.0.3", "wanted", delay=0.4)]
+        saved = SavedPanels()
+        found = []
+        try:
+            rediscovery = discovery_cache.Rediscovery(lambda: [""], found.append,
+                                                      lambda: [panel_info("127.0.0.2", "pinned")["BaseURL"]])
+            rediscovery.check()
+            ids = sorted(p["UniqueID"] for p in found[0]) if found else []
+            check(ids == ["pinned", "wanted"], f"broadcast ended with {ids}")
+        finally:
+            saved.close()
+            for r in rs:
+                r.close()
+    return run_test("Rediscovery - A pinned panel's reply does not end the broadcast", body)
+
+
+def run_all():
+    tests = [
+        test_finds_all_panels,
+        test_stops_at_expected,
+        test_ignored_panels_not_counted,
+        test_slow_interface_does_not_block,
+        test_dedup_by_identity,
+        test_ignores_other_devices,
+        test_legacy_identity,
+        test_async_api,
+        test_nothing_answers,
+        test_probe,
+        test_cache_file,
+        test_corrupt_cache_file,
+        test_warm_start,
+        test_panel_moved,
+        test_rediscovery_pinned_panel,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
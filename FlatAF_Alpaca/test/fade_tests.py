@@ -0,0 +1,193 @@
+"""
+Fade and CalibratorChanging Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Sets brightness through the driver with [device] fade against the
+  firmware stand-in (fake_flataf.py), which fades the way the firmware
+  does. Checks that CalibratorChanging is true and CalibratorState is
+  NotReady until the fade is over, in both WSGI and ASGI mode, even with
+  the property cache on. Also checks the fallback to an instant set on
+  firmware without the fadebrightness route.
+
+Run Instructions:
+  python fade_tests.py
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+FADE = 0.6                       # Seconds
+
+from config import Config
+Config.brightness_settle = 0.0
+Config.fade = FADE
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import asgi_app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+from covercalibrator import CalibratorStatus
+
+logger = logging.getLogger("fade_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+QUERY = "ClientID=1&ClientTransactionID=1"
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def wsgi_client():
+    falc_app = falcon.App()
+    app.add_routes(falc_app)
+    return falcon.testing.TestClient(falc_app)
+
+
+def value(client, prop):
+    r = client.simulate_get(f"/api/v1/covercalibrator/0/{prop}", query_string=QUERY)
+    data = json.loads(r.text)
+    check(data["ErrorNumber"] == 0, f"{prop}: {data}")
+    return data["Value"]
+
+
+def device_state(client):
+    return {item["Name"]: item["Value"] for item in value(client, "devicestate")}
+
+
+def calibrator_on(client, brightness):
+    r = client.simulate_put("/api/v1/covercalibrator/0/calibratoron",
+                            body=f"Brightness={brightness}&ClientID=1&ClientTransactionID=2",
+                            content_type="application/x-www-form-urlencoded")
+    check(json.loads(r.text)["ErrorNumber"] == 0, f"calibratoron: {r.text}")
+
+
+def panel(fade_supported):
+    server, st, url = fake_flataf.start(connected=True)
+    ctx = covercalibrator.device(0)
+    ctx.set_url(url)
+    ctx.fade_route_supported = True
+    st.fade_supported = fade_supported
+    return server, st, ctx
+
+
+def test_fade_reported():
+    def body():
+        server, st, ctx = panel(True)
+        try:
+            client = wsgi_client()
+            check(value(client, "calibratorchanging") is False, "changing before the fade")
+            t0 = time.monotonic()
+            calibrator_on(client, 20000)
+            check(time.monotonic() - t0 < FADE / 2, "CalibratorOn waited for the fade")
+            check(st.changing, "panel was not asked to fade")
+            check(value(client, "calibratorchanging") is True, "CalibratorChanging false during the fade")
+            check(value(client, "calibratorstate") == CalibratorStatus.NotReady, "not NotReady during the fade")
+            state = device_state(client)
+            check(state["CalibratorChanging"] and state["Brightness"] < 20000, f"DeviceState {state}")
+            time.sleep(FADE + 0.1)
+            check(value(client, "calibratorchanging") is False, "still changing after the fade")
+            check(value(client, "calibratorstate") == CalibratorStatus.Ready, "not Ready after the fade")
+            check(value(client, "brightness") == 20000, "brightness after the fade")
+        finally:
+            server.shutdown()
+    return run_test("CalibratorOn with [device] fade - CalibratorChanging until the panel is there (WSGI)", body)
+
+
+def test_fade_reported_asgi():
+    def body():
+        server, st, ctx = panel(True)
+        try:
+            client = falcon.testing.TestClient(asgi_app.create_app())
+            calibrator_on(client, 12000)
+            state = device_state(client)
+            check(state["CalibratorChanging"] and state["CalibratorState"] == CalibratorStatus.NotReady,
+                  f"DeviceState during the fade {state}")
+            time.sleep(FADE + 0.1)
+            state = device_state(client)
+            check(not state["CalibratorChanging"] and state["Brightness"] == 12000, f"DeviceState after {state}")
+        finally:
+            server.shutdown()
+    return run_test("CalibratorOn with [device] fade - CalibratorChanging until the panel is there (ASGI)", body)
+
+
+def test_fade_retargeted():
+    def body():
+        server, st, ctx = panel(True)
+        try:
+            client = wsgi_client()
+            calibrator_on(client, 30000)
+            time.sleep(FADE / 3)
+            calibrator_on(client, 5000)
+            check(value(client, "calibratorchanging") is True, "retarget not reported as changing")
+            time.sleep(FADE + 0.1)
+            check(value(client, "brightness") == 5000 and st.brightness == 5000, f"ended at {st.brightness}")
+        finally:
+            server.shutdown()
+    return run_test("CalibratorOn during a fade - Panel retargeted to the last brightness", body)
+
+
+def test_older_firmware():
+    def body():
+        server, st, ctx = panel(False)
+        try:
+            client = wsgi_client()
+            calibrator_on(client, 8000)
+            check(not ctx.fade_route_supported, "fadebrightness 404 not remembered")
+            check(st.brightness == 8000, f"panel at {st.brightness}")
+            check(value(client, "calibratorchanging") is False, "changing without a fade")
+            check(value(client, "calibratorstate") == CalibratorStatus.Ready, "not Ready")
+        finally:
+            server.shutdown()
+    return run_test("CalibratorOn with [device] fade - Set at once on firmware without fadebrightness", body)
+
+
+def run_all():
+    tests = [
+        test_fade_reported,
+        test_fade_reported_asgi,
+        test_fade_retargeted,
+        test_older_firmware,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,211 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF Alpaca Driver
+Purpose: Local stand-in for the FlatAF firmware HTTP API, for benchmarks and tests
+Website: https://astroaf.space
+License: See LICENSE.md (ASCOM and CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+
+Serves the same routes as FlatAF_MicroPython/web_server.py with the same
+JSON bodies, keeping the panel state in memory. Speaks HTTP/1.1 keep-alive
+so pooled and unpooled clients can be compared; with --close it answers
+every request with Connection: close, as the firmware did before it kept
+connections alive, so no client can reuse a connection. An optional per-connection
+delay stands in for the TCP handshake cost over Wi-Fi, and an optional
+per-request delay for the panel's service time (requests are handled one
+at a time, as on the single-core ESP32).
+
+Run Instructions:
+  python fake_flataf.py [--port 5556] [--connect-delay-ms 20] [--response-delay-ms 10] [--close]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "/api/v1/covercalibrator/0"
+MAX_BRIGHTNESS = 65534
+
+
+class PanelState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connected = False
+        self._brightness = 0
+        self._fade = None           # (start, target, started, seconds) while fading
+        self.fade_supported = True  # False to answer fadebrightness with 404, as older firmware
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def brightness(self):
+        if self._fade:
+            start, target, started, seconds = self._fade
+            done = (time.monotonic() - started) / seconds
+            if done < 1:
+                return start + int((target - start) * done)
+            self._brightness, self._fade = target, None
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        self._brightness, self._fade = value, None      # A set cancels a fade, as on the panel
+
+    @property
+    def changing(self):
+        self.brightness             # Ends a fade that is over
+        return self._fade is not None
+
+    def fade_to(self, target, seconds):
+        if seconds > 0 and target != self.brightness:
+            self._fade = (self.brightness, target, time.monotonic(), seconds)
+        else:
+            self.brightness = target
+
+
+class FlatAFHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state: PanelState = None
+    connect_delay = 0.0
+    response_delay = 0.0
+    close_connections = False       # Connection: close on every response (firmware before keep-alive)
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+        if self.connect_delay:
+            time.sleep(self.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _media(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode())
+        except Exception:
+            return {}
+
+    def _send(self, body, status=200):
+        data = json.dumps(body).encode() if body is not None else b""
+        if self.response_delay:
+            time.sleep(self.response_delay)     # Called with state.lock held
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connections:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _status(self):
+        return "ON" if self.state.brightness > 0 else "OFF"
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        st = self.state
+        with st.lock:
+            st.requests += 1
+            if path == f"{PREFIX}/connected":
+                self._send({"Value": st.connected, "ErrorNumber": 0, "ErrorMessage": ""})
+            elif path == f"{PREFIX}/brightness":
+                self._send({"success": True, "status": self._status(), "brightness": st.brightness,
+                            "changing": st.changing})
+            elif path == f"{PREFIX}/state":
+                self._send({"success": True, "connected": st.connected, "brightness": st.brightness,
+                            "status": self._status(), "changing": st.changing})
+            elif path == f"{PREFIX}/maxbrightness":
+                self._send({"success": True, "max_brightness": MAX_BRIGHTNESS})
+            elif path == "/management/apiversions":
+                self._send({"Value": [1, 2], "ClientTransactionID": 0,
+                            "ServerTransactionID": 999, "ErrorNumber": 0, "ErrorMessage": ""})
+            else:
+                self._send(None, 404)
+
+    def do_PUT(self):
+        path = self.path.split("?", 1)[0]
+        media = self._media()
+        st = self.state
+        with st.lock:
+            st.requests += 1
+            if path == f"{PREFIX}/connected":
+                new_state = media.get("Connected")
+                if isinstance(new_state, bool):
+                    if not new_state:
+                        st.brightness = 0
+                    st.connected = new_state
+                    self._send({"Success": True, "Connected": st.connected,
+                                "ClientTransactionID": media.get("ClientTransactionID", 0),
+                                "ServerTransactionID": 999})
+                else:
+                    self._send({"Success": False, "ClientTransactionID": 0,
+                                "ServerTransactionID": 999, "ErrorMessage": "Exception occurred"})
+            elif path == f"{PREFIX}/setbrightness":
+                try:
+                    st.brightness = max(0, min(int(media["Brightness"]), MAX_BRIGHTNESS))
+                    self._send({"success": True, "brightness": st.brightness})
+                except Exception:
+                    self._send({"success": False, "error": "Exception occurred"})
+            elif path == f"{PREFIX}/fadebrightness" and st.fade_supported:
+                try:
+                    target = max(0, min(int(media["Brightness"]), MAX_BRIGHTNESS))
+                    st.fade_to(target, float(media.get("Duration", 1.0)))
+                    self._send({"success": True, "brightness": st.brightness, "changing": st.changing})
+                except Exception:
+                    self._send({"success": False, "error": "Exception occurred"})
+            elif path == f"{PREFIX}/calibratoron":
+                self._send({"success": True, "status": self._status()})
+            elif path == f"{PREFIX}/calibratoroff":
+                st.brightness = 0
+                self._send({"success": True, "status": self._status()})
+            else:
+                self._send(None, 404)
+
+
+def start(host="127.0.0.1", port=0, connect_delay_ms=0.0, connected=True, response_delay_ms=0.0,
+          close=False):
+    """Start the stand-in on a background thread
+
+    With ``close``, every response closes its connection (Connection: close).
+
+    Returns:
+        (server, state, base_url) where base_url is the panel device URL
+        the driver would normally obtain from discovery.
+    """
+    state = PanelState()
+    state.connected = connected
+    handler = type("BoundFlatAFHandler", (FlatAFHandler,),
+                   {"state": state, "connect_delay": connect_delay_ms / 1000.0,
+                    "response_delay": response_delay_ms / 1000.0,
+                    "close_connections": close})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="FakeFlatAF", daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}{PREFIX}"
+    return server, state, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FlatAF firmware stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5556)
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0)
+    parser.add_argument("--response-delay-ms", type=float, default=0.0)
+    parser.add_argument("--close", action="store_true",
+                        help="Close the connection after every response, as the firmware did before keep-alive")
+    args = parser.parse_args()
+    server, state, url = start(args.host, args.port, args.connect_delay_ms,
+                               response_delay_ms=args.response_delay_ms, close=args.close)
+    print(f"[INFO] FlatAF stand-in serving {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,215 @@
+"""
+Metrics Endpoint Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises metrics.Counter and metrics.Histogram directly. It then serves
+  a few Alpaca requests, in both WSGI and ASGI mode, against the firmware
+  stand-in (fake_flataf.py) and reads /management/v1/metrics. Checks that
+  request latency, panel round trips, discovery time, cache, breaker and
+  error counters are reported, that panel connections are reused, and what
+  recording costs per request.
+
+Run Instructions:
+  python metrics_tests.py
+"""
+
+import logging
+import os
+import re
+import sys
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import asgi_app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import metrics
+import shr
+from dynamic_discovery import DiscoveryEngine
+
+logger = logging.getLogger("metrics_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+QUERY = "ClientID=1&ClientTransactionID=1"
+ROUTE = "/api/v1/covercalibrator/{devnum}/"
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def sample(text, name, **labels):
+    """Value of the series ``name`` whose labels include ``labels``, or None"""
+    for line in text.splitlines():
+        match = re.match(r'([a-z_]+)(\{.*\})? (\S+)$', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', match.group(2) or ""))
+        if all(found.get(k) == str(v) for k, v in labels.items()):
+            return float(match.group(3))
+    return None
+
+
+def test_histogram_format():
+    def body():
+        hist = metrics.Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+        metrics._registry.remove(hist)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            hist.observe(value, 'a"b')
+        lines = hist.render()
+        expected = [
+            '# HELP test_seconds Test',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{route="a\\"b",le="0.1"} 2',
+            'test_seconds_bucket{route="a\\"b",le="1.0"} 3',
+            'test_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+            'test_seconds_sum{route="a\\"b"} 3.65',
+            'test_seconds_count{route="a\\"b"} 4',
+        ]
+        check(lines == expected, f"rendered {lines}")
+        counter = metrics.Counter("test_total", "Test", ("code",))
+        metrics._registry.remove(counter)
+        counter.inc(0)
+        counter.inc(0)
+        counter.inc(1031)
+        check(counter.render()[2:] == ['test_total{code="0"} 2', 'test_total{code="1031"} 1'],
+              f"rendered {counter.render()}")
+    return run_test("metrics - Histogram and counter text format", body)
+
+
+def exercise(client):
+    for prop in ("connected", "brightness", "devicestate", "name"):
+        client.simulate_get(ROUTE.format(devnum=0) + prop, query_string=QUERY)
+    client.simulate_put(ROUTE.format(devnum=0) + "brightness",
+                        body="Brightness=500&ClientID=1&ClientTransactionID=2",
+                        content_type="application/x-www-form-urlencoded")
+    client.simulate_put(ROUTE.format(devnum=0) + "commandblind",
+                        body="Command=x&Raw=true&ClientID=1&ClientTransactionID=3",
+                        content_type="application/x-www-form-urlencoded")
+    client.simulate_get(ROUTE.format(devnum=9) + "brightness", query_string=QUERY)
+    return client.simulate_get("/management/v1/metrics")
+
+
+def check_scrape(r, mode):
+    text = r.text
+    check(r.status_code == 200 and r.headers["content-type"].startswith("text/plain"), f"{r.status_code} {r.headers}")
+    print(f"[INFO] {mode}: {len(text.splitlines())} lines")
+    brightness = ROUTE + "brightness"
+    count = sample(text, "flataf_request_duration_seconds_count", route=brightness, method="GET", status=200)
+    check(count and count >= 1, f"no brightness GET timing ({count})")
+    check(sample(text, "flataf_request_duration_seconds_count", route=brightness, method="GET", status=400),
+          "bad device number not counted as a 400")
+    check(sample(text, "flataf_request_duration_seconds_bucket", route=brightness, method="PUT",
+                 status=200, le="+Inf"), "no brightness PUT timing")
+    check(sample(text, "flataf_device_request_duration_seconds_count", route="state", method="GET"),
+          "no panel round trip for the state route")
+    check(sample(text, "flataf_alpaca_responses_total", error_number=0), "no successful responses counted")
+    check(sample(text, "flataf_alpaca_responses_total", error_number=0x400),
+          "NotImplemented (0x400) response not counted")
+    check(sample(text, "flataf_cache_lookups_total", device=0, result="hit") is not None, "no cache counters")
+    check(sample(text, "flataf_breaker_state", device=0) == 0, "breaker not reported closed")
+    check(sample(text, "flataf_writes_applied_total", device=0), "no coalescer counters")
+    check(sample(text, "process_cpu_seconds_total") > 0, "no CPU time")
+    trips = sum(float(v) for v in re.findall(r'^flataf_device_request_duration_seconds_count\{.*\} (\S+)$', text, re.M))
+    opened = sample(text, "flataf_panel_connections_total", device=0)
+    check(opened and opened < trips, f"{opened} connections opened for {trips:.0f} panel round trips")
+
+
+def test_wsgi_scrape():
+    def body():
+        server, state, url = fake_flataf.start()
+        try:
+            covercalibrator.device(0).set_url(url)
+            falc_app = falcon.App(middleware=[metrics.RequestMetrics()])
+            app.add_routes(falc_app)
+            check_scrape(exercise(falcon.testing.TestClient(falc_app)), "WSGI")
+        finally:
+            server.shutdown()
+    return run_test("/management/v1/metrics - Request, panel and driver counters (WSGI)", body)
+
+
+def test_asgi_scrape():
+    def body():
+        server, state, url = fake_flataf.start()
+        try:
+            covercalibrator.device(0).set_url(url)
+            covercalibrator.device(0).cache.invalidate()
+            before = sample(metrics.render(), "flataf_device_request_duration_seconds_count", route="state", method="GET")
+            r = exercise(falcon.testing.TestClient(asgi_app.create_app()))
+            check_scrape(r, "ASGI")
+            after = sample(r.text, "flataf_device_request_duration_seconds_count", route="state", method="GET")
+            check(after > before, "asyncio transport round trips not recorded")
+        finally:
+            server.shutdown()
+    return run_test("/management/v1/metrics - Request, panel and driver counters (ASGI)", body)
+
+
+def test_discovery_timed():
+    def body():
+        DiscoveryEngine(interfaces=["127.0.0.1"], port=1, timeout=0.1).discover()
+        text = metrics.render()
+        check(sample(text, "flataf_discovery_duration_seconds_count", result="none") >= 1, "discovery not timed")
+        check(sample(text, "flataf_discovery_duration_seconds_sum", result="none") >= 0.1, "discovery time wrong")
+    return run_test("metrics - Discovery broadcasts timed", body)
+
+
+def test_recording_cost():
+    def body():
+        hist = metrics.Histogram("cost_seconds", "Cost", ("route", "method", "status"))
+        metrics._registry.remove(hist)
+        n = 100000
+        t0 = time.perf_counter()
+        for _ in range(n):
+            hist.observe(0.003, "/api/v1/covercalibrator/{devnum}/brightness", "GET", 200)
+        per = (time.perf_counter() - t0) / n * 1e6
+        print(f"[INFO] Histogram observe: {per:.2f} us")
+        check(per < 5, f"observe costs {per:.2f} us")
+    return run_test("metrics - Recording a request costs a few microseconds", body)
+
+
+def run_all():
+    tests = [
+        test_histogram_format,
+        test_wsgi_scrape,
+        test_asgi_scrape,
+        test_discovery_timed,
+        test_recording_cost,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,231 @@
+"""
+Multi-Panel Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Serves three firmware stand-ins (fake_flataf.py) from one driver as Alpaca
+  device numbers 0, 1 and 2. Devices 0 and 1 are pinned in the config, and
+  device 2 is left to discovery. Checks that each device number reaches its
+  own panel, that requests to different panels run at the same time, and
+  how discovered panels are handed out to device numbers. No real network
+  or hardware is needed.
+
+Run Instructions:
+  python multi_panel_tests.py
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import fake_flataf
+
+PANEL_DELAY_MS = 200
+panels = [fake_flataf.start(response_delay_ms=PANEL_DELAY_MS) for _ in range(3)]
+cache_dir = tempfile.TemporaryDirectory()
+
+from config import Config
+Config.num_panels = 3
+Config.panel_urls = [panels[0][2], panels[1][2], ""]
+Config.connected_ttl = Config.brightness_ttl = 0.0      # Every read reaches the panel
+Config.discovery_cache_file = os.path.join(cache_dir.name, "discovery_cache.json")
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import covercalibrator
+import discovery_cache
+import exceptions
+import log
+import shr
+
+logger = logging.getLogger("multi_panel_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = discovery_cache.logger = logger
+shr.set_shr_logger(logger)
+
+falc_app = falcon.App()
+app.add_routes(falc_app)
+client = falcon.testing.TestClient(falc_app)
+
+
+def alpaca_get(devnum, prop):
+    return client.simulate_get(f"/api/v1/covercalibrator/{devnum}/{prop}",
+                               query_string="ClientID=1&ClientTransactionID=1")
+
+
+def alpaca_put(devnum, method, **fields):
+    body = "&".join(f"{k}={v}" for k, v in dict(fields, ClientID=1, ClientTransactionID=2).items())
+    return client.simulate_put(f"/api/v1/covercalibrator/{devnum}/{method}", body=body,
+                               content_type="application/x-www-form-urlencoded")
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def test_configured_devices():
+    def body():
+        check(covercalibrator.maxdev == 2, f"maxdev {covercalibrator.maxdev}")
+        devs = client.simulate_get("/management/v1/configureddevices").json["Value"]
+        check([d["DeviceNumber"] for d in devs] == [0, 1, 2], f"device numbers {devs}")
+        check(devs[0]["UniqueID"] == covercalibrator.CovercalibratorMetadata.DeviceID,
+              "device 0 changed its UniqueID")
+        check(len({d["UniqueID"] for d in devs}) == 3, "UniqueIDs are not distinct")
+        check(alpaca_get(1, "name").json["Value"] == devs[1]["DeviceName"], "name differs from ConfiguredDevices")
+    return run_test("management.configureddevices - One entry per panel", body)
+
+
+def test_bad_device_number():
+    def body():
+        r = alpaca_get(3, "brightness")
+        check(r.status_code == 400, f"HTTP {r.status_code}")
+    return run_test("PreProcessRequest - Device number past the last panel is a 400", body)
+
+
+def test_each_device_own_panel():
+    def body():
+        for devnum, value in ((0, 1000), (1, 2000)):
+            r = alpaca_put(devnum, "brightness", Brightness=value)
+            check(r.json["ErrorNumber"] == 0, f"PUT device {devnum}: {r.text}")
+        check(panels[0][1].brightness == 1000, f"panel 0 at {panels[0][1].brightness}")
+        check(panels[1][1].brightness == 2000, f"panel 1 at {panels[1][1].brightness}")
+        for devnum, value in ((0, 1000), (1, 2000)):
+            got = alpaca_get(devnum, "brightness").json["Value"]
+            check(got == value, f"device {devnum} reads {got}, expected {value}")
+    return run_test("covercalibrator - Each device number reads and writes its own panel", body)
+
+
+def test_panels_in_parallel():
+    def body():
+        errors = []
+
+        def read(devnum):
+            r = alpaca_get(devnum, "brightness")
+            if r.json["ErrorNumber"] != 0:
+                errors.append(r.text)
+
+        threads = [threading.Thread(target=read, args=(n,)) for n in (0, 1)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = (time.perf_counter() - t0) * 1000
+        print(f"[INFO] Two panels, {PANEL_DELAY_MS} ms each, read together in {elapsed:.0f} ms")
+        check(not errors, f"errors {errors}")
+        check(elapsed < 1.5 * PANEL_DELAY_MS, f"reads took {elapsed:.0f} ms, not in parallel")
+    return run_test("covercalibrator - Requests to different panels do not wait on each other", body)
+
+
+def test_assign_panels():
+    def body():
+        dev2 = covercalibrator.device(2)
+        url_a = panels[2][2]
+        url_b = "http://127.0.0.1:1/api/v1/covercalibrator/0"
+        a = {"UniqueID": "panel-a", "BaseURL": url_a}
+        b = {"UniqueID": "panel-b", "BaseURL": url_b}
+
+        covercalibrator.assign_panels([a])
+        check(dev2.url == url_a, f"device 2 at {dev2.url}")
+        check(covercalibrator.device(0).url == panels[0][2], "pinned device 0 moved")
+        check(alpaca_get(2, "connected").json["Value"] is True, "device 2 does not reach its panel")
+
+        covercalibrator.assign_panels([b, a])
+        check(dev2.url == url_a, "device 2 did not keep its own panel")
+
+        covercalibrator.assign_panels([{"UniqueID": "pinned", "BaseURL": panels[0][2]}])
+        check(dev2.url == url_a, "device 2 took a pinned panel")
+
+        covercalibrator.assign_panels([b])
+        check(dev2.url == url_b, "device 2 did not take the replacement panel")
+    return run_test("covercalibrator.assign_panels - Panels keep their device numbers", body)
+
+
+def test_cache_by_device_number():
+    def body():
+        saved = discovery_cache.load_cached_panels()
+        check(len(saved) == 3 and saved[0] is None and saved[2]["UniqueID"] == "panel-b",
+              f"saved {saved}")
+        with open(Config.discovery_cache_file, "w") as f:   # Single-panel file from an older driver
+            json.dump({"BaseURL": "http://10.0.0.9:5555/api/v1/covercalibrator/0", "UniqueID": "old"}, f)
+        saved = discovery_cache.load_cached_panels()
+        check(len(saved) == 1 and saved[0]["UniqueID"] == "old", f"legacy file read as {saved}")
+    return run_test("discovery_cache - Saved panels by device number, old file format read", body)
+
+
+def test_discover_with_pinned_panels():
+    def body():
+        dev2 = covercalibrator.device(2)
+        pinned = [{"UniqueID": f"pinned-{n}", "BaseURL": panels[n][2]} for n in (0, 1)]
+        wanted = {"UniqueID": "panel-c", "BaseURL": panels[2][2]}
+        asked = []
+
+        def discover_all(expected=None, ignore=()):
+            asked.append((expected, set(ignore)))
+            # Stand-in for DiscoveryEngine: the pinned panels answer first
+            found = []
+            for panel in pinned + [wanted]:
+                if sum(1 for p in found if p["BaseURL"] not in ignore) >= expected:
+                    break
+                found.append(panel)
+            return found
+
+        real = covercalibrator.discover_all
+        covercalibrator.discover_all = discover_all
+        dev2.set_url("")
+        dev2.panel = None
+        try:
+            url = covercalibrator.discover_now(dev2)
+        finally:
+            covercalibrator.discover_all = real
+        check(asked == [(1, {panels[0][2], panels[1][2]})], f"discovery asked for {asked}")
+        check(url == panels[2][2], f"device 2 at {url}")
+    return run_test("covercalibrator.discover_now - Pinned panels answering do not count as found", body)
+
+
+def run_all():
+    tests = [
+        test_configured_devices,
+        test_bad_device_number,
+        test_each_device_own_panel,
+        test_panels_in_parallel,
+        test_assign_panels,
+        test_cache_by_device_number,
+        test_discover_with_pinned_panels,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
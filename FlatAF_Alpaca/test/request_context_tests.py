@@ -0,0 +1,122 @@
+"""
+Request Context Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Sends requests through the Falcon app and checks the parameter handling
+  kept from before requests were parsed once into
+  shr.AlpacaRequestContext: Disconnect reads its query string and echoes
+  67890 when no ClientTransactionID is given there, and DeviceState,
+  InterfaceVersion and SupportedActions refuse an empty
+  ClientTransactionID that other GETs take as 0. No panel is needed.
+
+Run Instructions:
+  python request_context_tests.py
+"""
+
+import logging
+import os
+import sys
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import covercalibrator
+import exceptions
+import log
+import shr
+
+logger = logging.getLogger("request_context_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+FORM = "application/x-www-form-urlencoded"
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def client():
+    falc_app = falcon.App()
+    app.add_routes(falc_app)
+    return falcon.testing.TestClient(falc_app)
+
+
+def disconnect(query, body="ClientID=1&ClientTransactionID=5"):
+    return client().simulate_put("/api/v1/covercalibrator/0/disconnect", query_string=query,
+                                 body=body, content_type=FORM)
+
+
+def test_disconnect_query_string():
+    def body():
+        r = disconnect("ClientTransactionID=42&Connected=false")
+        check(r.status_code == 200 and r.json["ClientTransactionID"] == 42, f"query ID: {r.status_code} {r.json}")
+        r = disconnect("Connected=false")
+        check(r.status_code == 200 and r.json["ClientTransactionID"] == 67890,
+              f"body ID used instead of the placeholder: {r.json}")
+    return run_test("Disconnect - ClientTransactionID from the query string, 67890 if missing", body)
+
+
+def test_disconnect_bad_query():
+    def body():
+        r = disconnect("ClientTransactionID=abc")
+        check(r.status_code == 400, f"non-numeric ID: HTTP {r.status_code}")
+        r = disconnect("ClientTransactionID=1&Connected=maybe")
+        check(r.status_code == 400, f"bad Connected: HTTP {r.status_code}")
+        r = disconnect("ClientTransactionID=1", body="ClientID=1&ClientTransactionID=-1")
+        check(r.status_code == 400, f"bad body ID not refused by PreProcessRequest: HTTP {r.status_code}")
+    return run_test("Disconnect - Bad query parameters are refused", body)
+
+
+def test_empty_client_transaction_id():
+    def body():
+        c = client()
+        for prop in ("devicestate", "interfaceversion", "supportedactions"):
+            r = c.simulate_get(f"/api/v1/covercalibrator/0/{prop}", query_string="ClientID=1&ClientTransactionID=")
+            check(r.status_code == 400, f"{prop} with an empty ClientTransactionID: HTTP {r.status_code}")
+            r = c.simulate_get(f"/api/v1/covercalibrator/0/{prop}", query_string="ClientID=1")
+            check(r.status_code == 200, f"{prop} without ClientTransactionID: HTTP {r.status_code}")
+        r = c.simulate_get("/api/v1/covercalibrator/0/driverversion", query_string="ClientID=1&ClientTransactionID=")
+        check(r.status_code == 200 and r.json["ClientTransactionID"] == 0, f"driverversion: {r.status_code} {r.json}")
+    return run_test("DeviceState/InterfaceVersion/SupportedActions - Empty ClientTransactionID refused", body)
+
+
+def run_all():
+    tests = [
+        test_disconnect_query_string,
+        test_disconnect_bad_query,
+        test_empty_client_transaction_id,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
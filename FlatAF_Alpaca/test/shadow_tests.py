@@ -0,0 +1,315 @@
+"""
+Shadow Poller Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises shadow.PanelShadow and shadow.ShadowPoller directly: updates,
+  snapshots, polling, failed polls and a poll overtaken by a driver write.
+  Then runs the driver's shadow pollers against the firmware stand-in
+  (fake_flataf.py), holds a poll open while a brightness write is made,
+  and checks the shadow keeps the written brightness, and that Brightness
+  is NotConnected once the panel stops answering.
+
+Run Instructions:
+  python shadow_tests.py
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+from config import Config
+Config.brightness_settle = 0.0
+Config.fade = 0.0
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+import shadow as shadow_module
+from shadow import PanelShadow, ShadowPoller
+
+logger = logging.getLogger("shadow_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+INTERVAL = 0.05
+NOT_CONNECTED = 0x407
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_update_and_snapshot():
+    def body():
+        shadow = PanelShadow()
+        snap = shadow.snapshot()
+        check(snap["connected"] is False and snap["brightness"] is None, f"initial {snap}")
+        check(shadow.update(connected=True, brightness=100, status="ON"), "update dropped")
+        snap = shadow.snapshot()
+        check(snap["connected"] and snap["brightness"] == 100 and snap["status"] == "ON", f"snapshot {snap}")
+        check(0 <= snap["age"] < 1, f"age {snap['age']}")
+    return run_test("PanelShadow - Update and snapshot", body)
+
+
+def test_generation():
+    def body():
+        shadow = PanelShadow()
+        generation = shadow.generation()                # A poll starts...
+        shadow.update(brightness=20000)                 # ...the driver writes...
+        check(not shadow.update(generation, brightness=0), "overtaken poll applied")
+        check(shadow.brightness == 20000, f"brightness {shadow.brightness}")
+        check(shadow.update(shadow.generation(), brightness=19000), "current poll dropped")
+        check(shadow.brightness == 19000, f"brightness {shadow.brightness}")
+    return run_test("PanelShadow - A poll overtaken by a driver write is dropped", body)
+
+
+def test_poller():
+    def body():
+        shadow = PanelShadow()
+        reads = []
+
+        def read_state():
+            reads.append(1)
+            return {"connected": True, "brightness": len(reads)}
+
+        poller = ShadowPoller(shadow, read_state, INTERVAL)
+        poller.start()
+        try:
+            check(wait_for(lambda: poller.polls >= 3), f"{poller.polls} polls")
+            check(shadow.connected and shadow.brightness >= 3, f"shadow {shadow.snapshot()}")
+        finally:
+            poller.stop()
+            poller.join(1)
+        check(not poller.is_alive(), "poller did not stop")
+    return run_test("ShadowPoller - Polls at its interval until stopped", body)
+
+
+def test_poll_failure():
+    def body():
+        shadow = PanelShadow()
+        shadow.update(connected=True, brightness=5)
+
+        def read_state():
+            raise OSError("panel unreachable")
+
+        poller = ShadowPoller(shadow, read_state, INTERVAL)
+        poller.start()
+        try:
+            check(wait_for(lambda: poller.failures >= 1), "no failure counted")
+            check(shadow.connected is False, "still connected after a failed poll")
+            check(shadow.brightness is None and shadow.status is None,
+                  f"failed poll kept the last state: {shadow.snapshot()}")
+        finally:
+            poller.stop()
+    return run_test("ShadowPoller - A failed poll marks the panel not connected", body)
+
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_poll_failure_logging():
+    def body():
+        shadow = PanelShadow()
+        answering = threading.Event()
+
+        def read_state():
+            if not answering.is_set():
+                raise OSError("panel unreachable")
+            return {"connected": True, "brightness": 7}
+
+        recorder = Recorder()
+        logger.addHandler(recorder)
+        logger.setLevel(logging.INFO)
+        shadow_module.logger = logger
+        poller = ShadowPoller(shadow, read_state, INTERVAL)
+        poller.start()
+        try:
+            check(wait_for(lambda: poller.failures >= 5), f"{poller.failures} failures")
+            answering.set()
+            check(wait_for(lambda: shadow.connected), "panel not seen answering again")
+        finally:
+            poller.stop()
+            shadow_module.logger = None
+            logger.removeHandler(recorder)
+            logger.setLevel(logging.NOTSET)
+        levels = [r.levelname for r in recorder.records]
+        check(levels == ["WARNING", "INFO"], f"logged {levels} for {poller.failures} failed polls and a recovery")
+    return run_test("ShadowPoller - Failed polls logged once going down and once coming back", body)
+
+
+def test_poll_overtaken():
+    def body():
+        shadow = PanelShadow()
+        started = threading.Event()
+        release = threading.Event()
+
+        def read_state():
+            if not started.is_set():
+                started.set()
+                release.wait(5)             # Read brightness 0, then take a while
+            return {"connected": True, "brightness": 0}
+
+        poller = ShadowPoller(shadow, read_state, 10.0)
+        poller.start()
+        try:
+            check(started.wait(5), "poll did not start")
+            shadow.update(brightness=20000)
+            release.set()
+            check(wait_for(lambda: poller.polls >= 1), "poll did not finish")
+            check(poller.dropped == 1, f"{poller.dropped} polls dropped")
+            check(shadow.brightness == 20000, f"shadow went back to {shadow.brightness}")
+        finally:
+            release.set()
+            poller.stop()
+    return run_test("ShadowPoller - A driver write made during a poll wins", body)
+
+
+def test_driver_write_during_poll():
+    def body():
+        server, st, url = fake_flataf.start(connected=True)
+        real_read = covercalibrator.read_panel_state
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_read(ctx):
+            state = real_read(ctx)          # Brightness 0, from before the write
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+            return state
+
+        ctx = covercalibrator.device(0)
+        ctx.set_url(url)
+        covercalibrator.read_panel_state = slow_read     # Bound by start_shadow_poller
+        try:
+            pollers = covercalibrator.start_shadow_poller(INTERVAL)
+            check(started.wait(5), "poll did not start")
+            covercalibrator.set_device_brightness(ctx, 20000)
+            release.set()
+            check(wait_for(lambda: ctx.shadow_poller.dropped == 1), "overtaken poll not dropped")
+            check(ctx.shadow.brightness == 20000, f"Brightness {ctx.shadow.brightness} after writing 20000")
+            polls = ctx.shadow_poller.polls
+            check(wait_for(lambda: ctx.shadow_poller.polls > polls), "polling stopped")
+            check(covercalibrator.get_device_brightness(ctx) == 20000, "next poll lost the write")
+        finally:
+            release.set()
+            covercalibrator.read_panel_state = real_read
+            for ctx in covercalibrator.devices:
+                if ctx.shadow_poller:
+                    ctx.shadow_poller.stop()
+                ctx.shadow = ctx.shadow_poller = None
+            server.shutdown()
+    return run_test("covercalibrator - Shadow keeps a brightness written during a poll", body)
+
+
+def dead_url():
+    """Panel URL on a local port nothing listens on (connection refused)"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return f"http://127.0.0.1:{port}{fake_flataf.PREFIX}"
+
+
+def test_offline_panel_not_connected():
+    def body():
+        server, st, url = fake_flataf.start(connected=True)
+        ctx = covercalibrator.device(0)
+        ctx.set_url(url)
+        ctx.pinned = True
+        falc_app = falcon.App()
+        app.add_routes(falc_app)
+        client = falcon.testing.TestClient(falc_app)
+
+        def get(prop):
+            return client.simulate_get(f"/api/v1/covercalibrator/0/{prop}",
+                                       query_string="ClientID=1&ClientTransactionID=1").json
+
+        try:
+            covercalibrator.start_shadow_poller(INTERVAL)
+            check(wait_for(lambda: ctx.shadow.connected), "first poll did not connect")
+            r = get("brightness")
+            check(r["ErrorNumber"] == 0, f"brightness while on line {r}")
+            ctx.set_url(dead_url())                         # Panel switched off
+            check(wait_for(lambda: not ctx.shadow.connected), "failed poll not seen")
+            r = get("brightness")
+            check(r["ErrorNumber"] == NOT_CONNECTED, f"brightness while off line {r}")
+            r = get("devicestate")
+            check(r["ErrorNumber"] == NOT_CONNECTED, f"devicestate while off line {r}")
+        finally:
+            ctx.pinned = False
+            for ctx in covercalibrator.devices:
+                if ctx.shadow_poller:
+                    ctx.shadow_poller.stop()
+                ctx.shadow = ctx.shadow_poller = None
+            server.shutdown()
+    return run_test("covercalibrator - Brightness NotConnected while the shadowed panel is off line", body)
+
+
+def run_all():
+    tests = [
+        test_update_and_snapshot,
+        test_generation,
+        test_poller,
+        test_poll_failure,
+        test_poll_failure_logging,
+        test_poll_overtaken,
+        test_driver_write_during_poll,
+        test_offline_panel_not_connected,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,191 @@
+"""
+Single-Flight Read Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises singleflight.SingleFlight directly. It then sends concurrent
+  identical property GETs through the driver, with its cache off, to the
+  firmware stand-in (fake_flataf.py) with a slow response. Checks that
+  the clients share one panel read and that the counters say so.
+
+Run Instructions:
+  python singleflight_tests.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+from config import Config
+Config.connected_ttl = Config.brightness_ttl = 0.0      # Every read reaches the panel
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+from singleflight import SingleFlight
+
+logger = logging.getLogger("singleflight_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+CLIENTS = 10
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def together(count, fn):
+    """Run fn() on ``count`` threads released at the same moment"""
+    start = threading.Barrier(count)
+    results = [None] * count
+
+    def one(i):
+        start.wait()
+        try:
+            results[i] = fn()
+        except Exception as ex:
+            results[i] = ex
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_calls_shared():
+    def body():
+        flight = SingleFlight()
+        upstream = []
+
+        def read():
+            upstream.append(1)
+            time.sleep(0.1)
+            return {"brightness": 42}
+
+        results = together(CLIENTS, lambda: flight.do("brightness", read))
+        check(len(upstream) == 1, f"{len(upstream)} upstream calls")
+        check(all(r == {"brightness": 42} for r in results), f"results {results}")
+        check(flight.stats() == {"brightness": {"calls": 1, "saved": CLIENTS - 1}}, f"stats {flight.stats()}")
+    return run_test("SingleFlight.do - Concurrent calls share one upstream call", body)
+
+
+def test_keys_and_sequence_not_shared():
+    def body():
+        flight = SingleFlight()
+        flight.do("connected", lambda: True)
+        flight.do("connected", lambda: True)
+        flight.do("brightness", lambda: 1)
+        check(flight.stats() == {"connected": {"calls": 2, "saved": 0}, "brightness": {"calls": 1, "saved": 0}},
+              f"stats {flight.stats()}")
+    return run_test("SingleFlight.do - Nothing shared across keys or after completion", body)
+
+
+def test_error_shared():
+    def body():
+        flight = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise Exception("panel unreachable")
+
+        results = together(5, lambda: flight.do("state", fail))
+        check(all(isinstance(r, Exception) and str(r) == "panel unreachable" for r in results), f"results {results}")
+        check(flight.do("state", lambda: "ok") == "ok", "failed call was remembered")
+    return run_test("SingleFlight.do - An upstream failure reaches every waiting caller", body)
+
+
+def test_async_shared():
+    def body():
+        flight = SingleFlight()
+        upstream = []
+
+        async def read():
+            upstream.append(1)
+            await asyncio.sleep(0.1)
+            return "state"
+
+        async def main():
+            return await asyncio.gather(*(flight.do_async("state", read) for _ in range(CLIENTS)))
+
+        results = asyncio.run(main())
+        check(len(upstream) == 1 and results == ["state"] * CLIENTS, f"{len(upstream)} calls, {results}")
+        check(flight.stats()["state"] == {"calls": 1, "saved": CLIENTS - 1}, f"stats {flight.stats()}")
+    return run_test("SingleFlight.do_async - Concurrent coroutines share one upstream call", body)
+
+
+def test_driver_reads_shared():
+    def body():
+        server, state, url = fake_flataf.start(response_delay_ms=200)
+        try:
+            ctx = covercalibrator.device(0)
+            ctx.set_url(url)
+            falc_app = falcon.App()
+            app.add_routes(falc_app)
+            client = falcon.testing.TestClient(falc_app)
+            for prop in ("brightness", "connected", "devicestate"):
+                before = state.requests
+                replies = together(CLIENTS, lambda: client.simulate_get(
+                    f"/api/v1/covercalibrator/0/{prop}", query_string="ClientID=1&ClientTransactionID=1").json)
+                panel_reads = state.requests - before
+                print(f"[INFO] {CLIENTS} concurrent {prop} GETs -> {panel_reads} panel read(s)")
+                check(all(r["ErrorNumber"] == 0 for r in replies), f"errors in {replies}")
+                check(panel_reads == 1, f"{panel_reads} panel reads for {prop}")
+            stats = ctx.reads.stats()
+            print(f"[INFO] Counters: {stats}")
+            check(sum(s["saved"] for s in stats.values()) == 3 * (CLIENTS - 1), f"stats {stats}")
+        finally:
+            server.shutdown()
+    return run_test("covercalibrator - Concurrent identical GETs share one panel read", body)
+
+
+def run_all():
+    tests = [
+        test_concurrent_calls_shared,
+        test_keys_and_sequence_not_shared,
+        test_error_shared,
+        test_async_shared,
+        test_driver_reads_shared,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
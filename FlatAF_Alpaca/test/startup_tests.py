@@ -0,0 +1,152 @@
+"""
+Startup Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Starts the driver in a child process, in both WSGI and ASGI mode, the
+  way bench_driver.py does, and reads /management/v1/startup. Checks that
+  every startup phase is reported, that the first request served is
+  recorded, and that importing the driver no longer loads requests or
+  serial. Also checks that routing from the module namespace finds the
+  same responders as inspect.getmembers() did.
+
+Run Instructions:
+  python startup_tests.py
+"""
+
+import inspect
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import fake_flataf
+from bench_driver import free_port, wait_listening
+
+PHASES = ["interpreter", "imports", "logging", "services", "routes", "listen"]
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def get_report(port):
+    url = f"http://127.0.0.1:{port}/management/v1/startup?ClientID=1&ClientTransactionID=1"
+    with urllib.request.urlopen(url, timeout=5) as r:
+        return json.loads(r.read())["Value"]
+
+
+def startup_report(mode):
+    server, state, url = fake_flataf.start()
+    workdir = tempfile.mkdtemp(prefix="flataf-startup-")    # Driver log file goes here
+    port = free_port()
+    t0 = time.perf_counter()
+    driver = subprocess.Popen([sys.executable, os.path.join(TEST_DIR, "bench_driver.py"), "--serve", mode,
+                               "--port", str(port), "--panel", url], cwd=workdir,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_listening(port)
+        first = get_report(port)
+        elapsed = (time.perf_counter() - t0) * 1000
+        second = get_report(port)
+    finally:
+        driver.terminate()
+        driver.wait()
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(f"[INFO] {mode}: {second}, first answer {elapsed:.0f} ms after launch")
+    return first, second, elapsed
+
+
+def check_report(mode):
+    first, second, elapsed = startup_report(mode)
+    check(list(second["phases"]) == PHASES, f"phases {list(second['phases'])}")
+    check(all(ms >= 0 for ms in second["phases"].values()), f"negative phase {second['phases']}")
+    check(second["ready_ms"] and second["ready_ms"] <= elapsed + second["phases"]["interpreter"] + 50,
+          f"ready_ms {second['ready_ms']} but answered {elapsed:.0f} ms after launch")
+    check(first["first_request_ms"] is None, f"first request recorded before it was served: {first}")
+    check(second["first_request_ms"] >= second["ready_ms"], f"first request before ready: {second}")
+
+
+def test_wsgi_startup_report():
+    return run_test("/management/v1/startup - Phases and first request (WSGI)", lambda: check_report("wsgi"))
+
+
+def test_asgi_startup_report():
+    return run_test("/management/v1/startup - Phases and first request (ASGI)", lambda: check_report("asgi"))
+
+
+def test_imports_deferred():
+    def body():
+        code = (f"import sys; sys.path.insert(0, {DEVICE_DIR!r}); import app, asgi_app; "
+                "print([m for m in ('requests', 'urllib3', 'serial') if m in sys.modules])")
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=DEVICE_DIR)
+        check(loaded.returncode == 0, loaded.stderr)
+        check(loaded.stdout.strip() == "[]", f"loaded at import: {loaded.stdout.strip()}")
+    return run_test("startup - requests and serial are not imported at startup", body)
+
+
+def test_routes_unchanged():
+    def body():
+        import falcon # type: ignore
+        import app
+        import covercalibrator
+        from enum import IntEnum
+        routed = set()
+
+        def wrap(resource):
+            if type(resource).__module__ == covercalibrator.__name__:
+                routed.add(type(resource).__name__.lower())
+            return resource
+
+        falc_app = falcon.App()
+        app.add_routes(falc_app, wrap)
+        expected = {name.lower() for name, cls in inspect.getmembers(covercalibrator, inspect.isclass)
+                    if cls.__module__ == covercalibrator.__name__ and not issubclass(cls, IntEnum)}
+        check(routed == expected, f"missing {expected - routed}, extra {routed - expected}")
+        check(all(falc_app._router.find(f"/api/v1/covercalibrator/0/{name}") for name in expected),
+              "responder not reachable at its URI")
+    return run_test("init_routes - Same responders as inspect.getmembers()", body)
+
+
+def run_all():
+    tests = [
+        test_wsgi_startup_report,
+        test_asgi_startup_report,
+        test_imports_deferred,
+        test_routes_unchanged,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
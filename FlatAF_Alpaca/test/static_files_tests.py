@@ -0,0 +1,206 @@
+"""
+Static File Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises staticfiles.StaticFileServer on a scratch directory: files are
+  read from disk once, a changed file is picked up, and If-None-Match or
+  If-Modified-Since get a 304. A large file is streamed through the
+  driver's own WSGI server (sendfile) and through the ASGI app. Also
+  fetches the setup page logo from a different working directory.
+
+Run Instructions:
+  python static_files_tests.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from functools import partial
+from wsgiref.simple_server import make_server
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import falcon # type: ignore
+import falcon.asgi # type: ignore
+import falcon.testing # type: ignore
+import app
+import asgi_app
+import staticfiles
+from staticfiles import StaticFileServer
+
+ROUTE = "/resources/images/{filename}"
+LARGE = staticfiles.CACHE_MAX_SIZE * 4 + 123
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def scratch_dir():
+    root = tempfile.mkdtemp(prefix="flataf-static-")
+    with open(os.path.join(root, "logo.png"), "wb") as f:
+        f.write(b"\x89PNG small")
+    with open(os.path.join(root, "large.bin"), "wb") as f:
+        f.write(os.urandom(LARGE))
+    return root
+
+
+def client(server):
+    falc_app = falcon.App()
+    falc_app.add_route(ROUTE, server)
+    return falcon.testing.TestClient(falc_app)
+
+
+def test_cached_once():
+    def body():
+        root = scratch_dir()
+        try:
+            server = StaticFileServer(root)
+            c = client(server)
+            for _ in range(5):
+                r = c.simulate_get("/resources/images/logo.png")
+                check(r.status_code == 200 and r.content == b"\x89PNG small", f"{r.status_code} {r.content!r}")
+            check(r.headers["content-type"] == "image/png", r.headers)
+            check(server.files.reads == 1, f"read {server.files.reads} times")
+            with open(os.path.join(root, "logo.png"), "wb") as f:
+                f.write(b"\x89PNG changed!")
+            os.utime(os.path.join(root, "logo.png"), (time.time() + 5, time.time() + 5))
+            r = c.simulate_get("/resources/images/logo.png")
+            check(r.content == b"\x89PNG changed!" and server.files.reads == 2, f"stale: {r.content!r}")
+            for name in ("missing.png", "..", "%2e%2e", "..%2fconfig.toml"):
+                check(c.simulate_get(f"/resources/images/{name}").status_code == 404, f"{name} served")
+        finally:
+            shutil.rmtree(root)
+    return run_test("StaticFileServer - Read once, re-read when the file changes, nothing outside", body)
+
+
+def test_not_modified():
+    def body():
+        root = scratch_dir()
+        try:
+            c = client(StaticFileServer(root))
+            r = c.simulate_get("/resources/images/logo.png")
+            etag, modified = r.headers["etag"], r.headers["last-modified"]
+            check(etag.startswith('"') and r.headers["cache-control"] == staticfiles.CACHE_CONTROL, r.headers)
+            for headers in ({"If-None-Match": etag}, {"If-None-Match": f'"x", W/{etag}'},
+                            {"If-None-Match": "*"}, {"If-Modified-Since": modified}):
+                r = c.simulate_get("/resources/images/logo.png", headers=headers)
+                check(r.status_code == 304 and not r.content, f"{headers}: {r.status_code}")
+                check(r.headers["etag"] == etag, f"{headers}: no ETag on the 304")
+            for headers in ({"If-None-Match": '"other"', "If-Modified-Since": modified},
+                            {"If-Modified-Since": "Thu, 01 Jan 2015 00:00:00 GMT"}):
+                r = c.simulate_get("/resources/images/logo.png", headers=headers)
+                check(r.status_code == 200 and r.content, f"{headers}: {r.status_code}")
+        finally:
+            shutil.rmtree(root)
+    return run_test("StaticFileServer - 304 for a current ETag or Last-Modified", body)
+
+
+def test_large_file_sendfile():
+    def body():
+        root = scratch_dir()
+        sent = []
+        sendfile = app.SendfileServerHandler.sendfile
+
+        def counting(handler):
+            used = sendfile(handler)
+            sent.append(used)
+            return used
+
+        app.SendfileServerHandler.sendfile = counting
+        falc_app = falcon.App()
+        falc_app.add_route(ROUTE, StaticFileServer(root))
+        httpd = make_server("127.0.0.1", 0, falc_app, server_class=partial(app.ThreadPoolWSGIServer, workers=2),
+                            handler_class=app.LoggingWSGIRequestHandler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            base = f"http://127.0.0.1:{httpd.server_address[1]}/resources/images"
+            with urllib.request.urlopen(f"{base}/large.bin", timeout=5) as r:
+                data = r.read()
+                length = int(r.headers["Content-Length"])
+            with open(os.path.join(root, "large.bin"), "rb") as f:
+                check(data == f.read() and length == LARGE, f"got {len(data)} of {LARGE} bytes")
+            check(sent == [True], f"sendfile used: {sent}")
+            with urllib.request.urlopen(f"{base}/logo.png", timeout=5) as r:
+                check(r.read() == b"\x89PNG small", "small file")
+            check(sent == [True], f"sendfile tried for an in-memory file: {sent}")
+        finally:
+            app.SendfileServerHandler.sendfile = sendfile
+            httpd.shutdown()
+            httpd.server_close()
+            shutil.rmtree(root)
+    return run_test("WSGI server - Large file streamed with sendfile()", body)
+
+
+def test_large_file_asgi():
+    def body():
+        root = scratch_dir()
+        try:
+            falc_app = falcon.asgi.App()
+            falc_app.add_route(ROUTE, asgi_app.async_resource(StaticFileServer(root)))
+            c = falcon.testing.TestClient(falc_app)
+            r = c.simulate_get("/resources/images/large.bin")
+            with open(os.path.join(root, "large.bin"), "rb") as f:
+                check(r.status_code == 200 and r.content == f.read(), f"{r.status_code}, {len(r.content)} bytes")
+            r = c.simulate_get("/resources/images/large.bin", headers={"If-None-Match": r.headers["etag"]})
+            check(r.status_code == 304, f"{r.status_code}")
+        finally:
+            shutil.rmtree(root)
+    return run_test("ASGI - Large file streamed from a worker thread", body)
+
+
+def test_logo_from_any_directory():
+    def body():
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            falc_app = falcon.App()
+            app.add_routes(falc_app)
+            r = falcon.testing.TestClient(falc_app).simulate_get("/resources/images/astroAF_logo2.png")
+            check(r.status_code == 200 and r.content.startswith(b"\x89PNG"), f"{r.status_code}")
+        finally:
+            os.chdir(cwd)
+    return run_test("StaticFileServer - Setup page logo found from any working directory", body)
+
+
+def run_all():
+    tests = [
+        test_cached_once,
+        test_not_modified,
+        test_large_file_sendfile,
+        test_large_file_asgi,
+        test_logo_from_any_directory,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
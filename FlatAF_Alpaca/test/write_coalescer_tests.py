@@ -0,0 +1,182 @@
+"""
+Brightness Write Coalescing Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Exercises writecoalescer.WriteCoalescer directly. It then sends a flat
+  wizard style burst of brightness PUTs through the driver to the firmware
+  stand-in (fake_flataf.py). Checks that the panel is written at most once
+  per settle window, that it ends at the last value asked for, and that
+  every client gets an answer.
+
+Run Instructions:
+  python write_coalescer_tests.py
+"""
+
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+SETTLE = 0.2
+
+from config import Config
+Config.brightness_settle = SETTLE
+
+import falcon # type: ignore
+import falcon.testing # type: ignore
+import app
+import covercalibrator
+import exceptions
+import fake_flataf
+import log
+import shr
+from writecoalescer import WriteCoalescer
+
+logger = logging.getLogger("write_coalescer_tests")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+log.logger = covercalibrator.logger = exceptions.logger = logger
+shr.set_shr_logger(logger)
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def burst(count, spacing, submit):
+    """Call submit(i) for i = 1..count from threads started ``spacing`` s apart"""
+    results = [None] * (count + 1)
+
+    def one(i):
+        try:
+            results[i] = submit(i)
+        except Exception as ex:
+            results[i] = ex
+
+    threads = []
+    for i in range(1, count + 1):
+        t = threading.Thread(target=one, args=(i,))
+        t.start()
+        threads.append(t)
+        time.sleep(spacing)
+    for t in threads:
+        t.join()
+    return results[1:]
+
+
+def test_burst_collapses():
+    def body():
+        writes = []
+        coalescer = WriteCoalescer(SETTLE)
+
+        def write(value):
+            writes.append((time.monotonic(), value))
+            return value
+
+        results = burst(25, 0.02, lambda i: coalescer.submit(lambda: write(i)))
+        span = 25 * 0.02
+        print(f"[INFO] 25 writes over {span:.1f} s reached the panel {len(writes)} times: {[v for _, v in writes]}")
+        check(len(writes) <= math.ceil(span / SETTLE) + 1, f"{len(writes)} panel writes")
+        check(writes[-1][1] == 25, f"panel left at {writes[-1][1]}")
+        gaps = [b[0] - a[0] for a, b in zip(writes, writes[1:])]
+        check(all(g >= SETTLE * 0.95 for g in gaps), f"writes closer than the settle window: {gaps}")
+        check(all(r in {v for _, v in writes} for r in results), f"a caller got a value never written: {results}")
+        check(coalescer.stats() == {'submitted': 25, 'applied': len(writes)}, f"stats {coalescer.stats()}")
+    return run_test("WriteCoalescer - A burst reaches the panel once per settle window", body)
+
+
+def test_idle_write_not_delayed():
+    def body():
+        coalescer = WriteCoalescer(SETTLE)
+        coalescer.submit(lambda: None)
+        time.sleep(SETTLE)
+        t0 = time.perf_counter()
+        coalescer.submit(lambda: None)
+        elapsed = time.perf_counter() - t0
+        check(elapsed < SETTLE / 4, f"isolated write waited {elapsed * 1000:.0f} ms")
+    return run_test("WriteCoalescer - A write after a quiet spell goes out at once", body)
+
+
+def test_error_reaches_every_caller():
+    def body():
+        coalescer = WriteCoalescer(SETTLE)
+        coalescer.submit(lambda: None)                  # Start a settle window
+
+        def fail():
+            raise Exception("panel unreachable")
+
+        results = burst(5, 0.01, lambda i: coalescer.submit(fail))
+        check(all(isinstance(r, Exception) for r in results), f"results {results}")
+    return run_test("WriteCoalescer - A failed write is reported to every caller it answers", body)
+
+
+def test_driver_burst():
+    def body():
+        server, state, url = fake_flataf.start()
+        try:
+            covercalibrator.device(0).set_url(url)
+            falc_app = falcon.App()
+            app.add_routes(falc_app)
+            client = falcon.testing.TestClient(falc_app)
+            before = state.requests
+
+            def put(i):
+                r = client.simulate_put("/api/v1/covercalibrator/0/brightness",
+                                        body=f"Brightness={i * 100}&ClientID=1&ClientTransactionID={i}",
+                                        content_type="application/x-www-form-urlencoded")
+                return r.json
+
+            t0 = time.monotonic()
+            replies = burst(20, 0.02, put)
+            span = time.monotonic() - t0
+            panel_writes = state.requests - before
+            print(f"[INFO] 20 brightness PUTs -> {panel_writes} panel writes, panel at {state.brightness}")
+            check(all(r["ErrorNumber"] == 0 for r in replies), f"errors in {replies}")
+            check(all(r["ClientTransactionID"] == i for i, r in enumerate(replies, 1)), "ClientTransactionID mixed up")
+            check(state.brightness == 2000, f"panel left at {state.brightness}")
+            check(panel_writes <= math.ceil(span / SETTLE) + 1, f"{panel_writes} panel writes in {span:.2f} s")
+        finally:
+            server.shutdown()
+    return run_test("covercalibrator - Flat wizard burst of brightness PUTs", body)
+
+
+def run_all():
+    tests = [
+        test_burst_collapses,
+        test_idle_write_not_delayed,
+        test_error_reaches_every_caller,
+        test_driver_burst,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,163 @@
+"""
+Threaded WSGI Server Test Suite for the FlatAF Alpaca Driver
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Serves a small WSGI app with app.ThreadPoolWSGIServer and
+  app.LoggingWSGIRequestHandler, as app.main() does. Checks that slow
+  requests run at the same time, that the app is told wsgi.multithread
+  truthfully, and that connections waiting for a worker are bounded.
+
+Run Instructions:
+  python wsgi_server_tests.py
+"""
+
+import os
+import sys
+import threading
+import time
+import urllib.request
+from functools import partial
+from wsgiref.simple_server import WSGIServer, make_server
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVICE_DIR = os.path.abspath(os.path.join(TEST_DIR, "..", "device"))
+sys.path.insert(0, DEVICE_DIR)   # config.py reads sys.path[0]/config.toml
+
+import app
+
+SLOW = 0.5                       # Seconds each slow request takes
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+class SlowApp:
+    """WSGI app that waits ``delay`` seconds (or for ``gate``) and records wsgi.multithread"""
+
+    def __init__(self, delay=0.0, gate=None):
+        self.delay = delay
+        self.gate = gate
+        self.multithread = []
+
+    def __call__(self, environ, start_response):
+        self.multithread.append(environ["wsgi.multithread"])
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "2")])
+        return [b"ok"]
+
+
+def serve(wsgi_app, server_class):
+    httpd = make_server("127.0.0.1", 0, wsgi_app, server_class=server_class,
+                        handler_class=app.LoggingWSGIRequestHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}/"
+
+
+def get_all(url, count):
+    """GET ``url`` from ``count`` threads at once; returns (statuses, threads)"""
+    statuses = []
+
+    def one():
+        with urllib.request.urlopen(url, timeout=10) as r:
+            statuses.append(r.status)
+
+    threads = [threading.Thread(target=one) for _ in range(count)]
+    for t in threads:
+        t.start()
+    return statuses, threads
+
+
+def test_concurrent():
+    def body():
+        slow = SlowApp(SLOW)
+        httpd, url = serve(slow, partial(app.ThreadPoolWSGIServer, workers=2))
+        try:
+            t0 = time.monotonic()
+            statuses, threads = get_all(url, 2)
+            for t in threads:
+                t.join()
+            elapsed = time.monotonic() - t0
+            print(f"[INFO] Two {SLOW}s requests on 2 workers took {elapsed:.2f}s")
+            check(statuses == [200, 200], f"statuses {statuses}")
+            check(elapsed < SLOW * 1.8, f"took {elapsed:.2f}s, requests ran one after the other")
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+    return run_test("ThreadPoolWSGIServer - Two slow requests run at the same time", body)
+
+
+def test_multithread_flag():
+    def body():
+        for server_class, expected in ((partial(app.ThreadPoolWSGIServer, workers=2), True), (WSGIServer, False)):
+            plain = SlowApp()
+            httpd, url = serve(plain, server_class)
+            try:
+                with urllib.request.urlopen(url, timeout=5) as r:
+                    r.read()
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+            check(plain.multithread == [expected], f"wsgi.multithread {plain.multithread}, expected {expected}")
+    return run_test("LoggingWSGIRequestHandler - wsgi.multithread true only on the worker pool", body)
+
+
+def test_bounded_queue():
+    def body():
+        gate = threading.Event()
+        blocked = SlowApp(gate=gate)
+        httpd, url = serve(blocked, partial(app.ThreadPoolWSGIServer, workers=1, queued=1))
+        submitted = []
+        submit = httpd.pool.submit
+        httpd.pool.submit = lambda *args: (submitted.append(1), submit(*args))[1]
+        try:
+            statuses, threads = get_all(url, 3)
+            time.sleep(0.3)
+            check(len(submitted) == 2, f"{len(submitted)} connections handed to the pool, expected 1 running + 1 queued")
+            gate.set()
+            for t in threads:
+                t.join()
+            check(statuses == [200, 200, 200], f"statuses {statuses}")
+            check(len(submitted) == 3, f"{len(submitted)} connections handed to the pool")
+        finally:
+            gate.set()
+            httpd.shutdown()
+            httpd.server_close()
+    return run_test("ThreadPoolWSGIServer - Connections waiting for a worker are bounded", body)
+
+
+def run_all():
+    tests = [
+        test_concurrent,
+        test_multithread_flag,
+        test_bounded_queue,
+    ]
+    results = [test() for test in tests]
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)
@@ -8,7 +8,7 @@ Copyright (c) 2025 Douglas Reynolds AstroAF
 """
 import json
 from led import LED
-from constants import MAX_BRIGHTNESS
+from constants import MAX_BRIGHTNESS, FADE_DURATION_MS
 from brightness import load_brightness
 
 # Shared LED instance for Alpaca API; initialized with PWM control
@@ -54,7 +54,8 @@ def get_device_status():
         response = {
             "success": True,
             "status": led_device.get_status(),
-            "brightness": led_device.get_brightness()
+            "brightness": led_device.get_brightness(),
+            "changing": led_device.is_changing()
         }
     except Exception as e:
         response = {
@@ -63,6 +64,26 @@ def get_device_status():
         }
     return json.dumps(response)
 
+def get_device_state(connected):
+    """
+    Returns connection, brightness, on/off status and the changing flag
+    in one JSON document, so the driver can read everything in one call.
+    """
+    try:
+        response = {
+            "success": True,
+            "connected": connected,
+            "brightness": led_device.get_brightness(),
+            "status": led_device.get_status(),
+            "changing": led_device.is_changing()
+        }
+    except Exception as e:
+        response = {
+            "success": False,
+            "error": "location = ascom_api.py.get_device_state: " + str(e)
+        }
+    return json.dumps(response)
+
 def set_device_brightness(value):
     """Sets the device brightness to the specified integer value (0 to MAX_BRIGHTNESS)."""
     try:
@@ -125,19 +146,22 @@ def turn_calibrator_off():
         }
     return json.dumps(response)
 
-def fade_to_brightness(value):
+def fade_to_brightness(value, duration_ms=FADE_DURATION_MS):
     """
-    Fades the LED to the specified brightness level using PWM smoothing.
+    Starts fading the LED to the specified brightness level using PWM smoothing
+    and returns at once; "changing" in the device state is true until it ends.
+    With no event loop running (from the REPL) it returns when the fade is done.
     Does not persist intermediate brightness values.
     """
     try:
         value = int(value)
         if not (0 <= value <= MAX_BRIGHTNESS):
             raise ValueError(f"Brightness value out of range (0-{MAX_BRIGHTNESS})")
-        led_device.fade_to(value)
+        led_device.fade_to(value, duration_ms)
         response = {
             "success": True,
-            "brightness": led_device.get_brightness()
+            "brightness": led_device.get_brightness(),
+            "changing": led_device.is_changing()
         }
     except Exception as e:
         response = {
@@ -145,3 +169,17 @@ def fade_to_brightness(value):
             "error": "location = ascom_api.py.fade_to_brightness: " + str(e)
         }
     return json.dumps(response)
+
+def get_pwm_stats():
+    """
+    Returns the PWM channel's duty, write counts and time per duty write (microseconds).
+    """
+    try:
+        response = {"success": True}
+        response.update(led_device.enable_pwm().stats())
+    except Exception as e:
+        response = {
+            "success": False,
+            "error": "location = ascom_api.py.get_pwm_stats: " + str(e)
+        }
+    return json.dumps(response)
@@ -14,4 +14,15 @@ DEFAULT_STEP_SIZE_16 = 400
 MAX_BRIGHTNESS = 65534
 
 # Default port for Alpaca API communication
-ALPACA_PORT = 5555
\ No newline at end of file
+ALPACA_PORT = 5555
+
+# Keep-alive: seconds a connection may sit idle, and requests served on one connection
+KEEPALIVE_IDLE_TIMEOUT = 10
+KEEPALIVE_MAX_REQUESTS = 100
+
+# Static files (logo, setup page) are sent from flash in pieces of this many bytes
+STATIC_CHUNK_SIZE = 1024
+
+# Fades: PWM duty is stepped every FADE_STEP_MS, over FADE_DURATION_MS unless the request says otherwise
+FADE_STEP_MS = 20
+FADE_DURATION_MS = 1000
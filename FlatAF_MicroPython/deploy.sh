@@ -27,6 +27,8 @@ FILES=(
   "button.py"
   "main.py"
   "astroAF_logo2.png"
+  "setup.html"
+  "setup.html.gz"
   "version.json"
   "discovery_responder.py"
 )
@@ -34,6 +36,9 @@ FILES=(
 VERSION=$(git describe --tags --abbrev=0)
 echo "{\"version\": \"$VERSION\"}" > version.json
 
+# The setup page is served pre-compressed
+gzip -9 -n -c setup.html > setup.html.gz
+
 if [ "$FULL_WIPE" = true ]; then
   echo "Wiping file system on $PORT..."
   mpremote connect $PORT fs rm :
@@ -9,6 +9,8 @@ Copyright (c) 2025 Douglas Reynolds AstroAF
 import uasyncio as asyncio # type: ignore
 import usocket as socket # type: ignore
 import json
+import machine # type: ignore
+import ubinascii # type: ignore
 from constants import ALPACA_PORT
 
 DISCOVERY_PORT = 32227
@@ -21,6 +23,16 @@ async def discovery_responder():
     """
     print("[INFO] [Discovery Responder] Starting...")
 
+    # The reply never changes; UniqueID lets the driver tell several panels apart
+    response = {
+        "AlpacaPort": ALPACA_PORT,
+        "Manufacturer": "AstroAF",
+        "DeviceType": "CoverCalibrator",
+        "DeviceName": "FlatAF",
+        "UniqueID": ubinascii.hexlify(machine.unique_id()).decode()
+    }
+    payload = json.dumps(response).encode('utf-8')
+
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
@@ -34,15 +46,6 @@ async def discovery_responder():
                 message = data.decode('utf-8')
 
                 if "AlpacaDiscovery" in message:
-
-                    response = {
-                        "AlpacaPort": ALPACA_PORT,
-                        "Manufacturer": "AstroAF",
-                        "DeviceType": "CoverCalibrator",
-                        "DeviceName": "FlatAF"
-                    }
-
-                    payload = json.dumps(response).encode('utf-8')
                     sock.sendto(payload, addr)
 
             except (OSError, Exception):
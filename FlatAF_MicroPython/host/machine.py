@@ -0,0 +1,98 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF (MicroPython ESP32 Firmware)
+Purpose: Host-mode stand-in for the MicroPython machine module (Pin, PWM, reset, unique_id)
+Website: https://astroaf.space
+License: See LICENSE.md (CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+"""
+# Only on sys.path when the firmware runs on a PC (see run_host.py). Pins
+# and PWM channels keep their state in memory and count what the firmware
+# does with them, so a load test can see how often the LED was driven.
+
+pwm_updates = 0     # duty_u16()/freq()/deinit() calls, all channels
+resets = 0          # machine.reset() calls (the host keeps running)
+_unique_id = b"\x00\x00\x00\x00\x00\x01"
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = 0
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self.mode = mode
+        if pull == Pin.PULL_UP:
+            self._value = 1                 # An input nobody is pulling low (button released)
+        if value is not None:
+            self._value = 1 if value else 0
+
+    def value(self, x=None):
+        if x is None:
+            return self._value
+        self._value = 1 if x else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def __repr__(self):
+        return f"Pin({self.id})"
+
+
+class PWM:
+    def __init__(self, dest, freq=None, duty_u16=None):
+        self.pin = dest
+        self._freq = freq or 5000
+        self._duty = duty_u16 or 0
+        self.active = True
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        global pwm_updates
+        pwm_updates += 1
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        global pwm_updates
+        pwm_updates += 1
+        self._duty = value
+        self.active = True
+
+    def deinit(self):
+        global pwm_updates
+        pwm_updates += 1
+        self.active = False
+
+
+def reset():
+    global resets
+    resets += 1
+    print("[HOST] machine.reset() called; the host stand-in keeps running")
+
+
+def unique_id():
+    return _unique_id
+
+
+def set_unique_id(value):
+    """Host only: the ID the discovery responder reports (bytes or hex string)"""
+    global _unique_id
+    _unique_id = bytes.fromhex(value) if isinstance(value, str) else bytes(value)
+
+
+def freq(hz=None):
+    return 240000000 if hz is None else None
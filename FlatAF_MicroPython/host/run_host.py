@@ -0,0 +1,141 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF (MicroPython ESP32 Firmware)
+Purpose: Runs the unmodified firmware on a PC (CPython) for load testing and profiling
+Website: https://astroaf.space
+License: See LICENSE.md (CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+"""
+# The stand-ins in this directory (machine, network, uasyncio, usocket,
+# ubinascii, uio) go ahead of the firmware on sys.path, MicroPython's
+# time.ticks_*() are added to time, then boot.py and
+# main.main() run as they do on the ESP32. The files the firmware keeps in
+# flash (brightness.dat, wifi_config.json, version.json, the logo, the setup
+# page) live in a scratch directory that is removed on exit unless --dir is
+# given.
+#
+#   python host/run_host.py                         # Alpaca on 5555, discovery on 32227
+#   python host/run_host.py --port 8555 --discovery-port 32228 --quiet
+#   python host/run_host.py --profile firmware.prof --seconds 60
+#   python host/run_host.py --constant KEEPALIVE_IDLE_TIMEOUT=1
+#
+# Not deployed: deploy.sh uploads an explicit file list.
+import argparse
+import gzip
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+FIRMWARE_DIR = os.path.dirname(HOST_DIR)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the FlatAF firmware on this computer")
+    parser.add_argument("--port", type=int, default=5555, help="Alpaca HTTP port (default 5555)")
+    parser.add_argument("--discovery-port", type=int, default=32227,
+                        help="Alpaca discovery UDP port (default 32227)")
+    parser.add_argument("--unique-id", default="000000000001",
+                        help="machine.unique_id() as hex; the discovery reply reports it")
+    parser.add_argument("--constant", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a value in constants.py (repeatable)")
+    parser.add_argument("--dir", help="Keep the flash files here instead of a scratch directory")
+    parser.add_argument("--quiet", action="store_true", help="Discard the firmware's print() output")
+    parser.add_argument("--profile", metavar="FILE", help="Write cProfile stats here on exit")
+    parser.add_argument("--seconds", type=float, default=0, help="Stop after this many seconds")
+    return parser.parse_args(argv)
+
+
+def prepare_flash(directory):
+    """Give the firmware the files deploy.sh would have uploaded"""
+    os.makedirs(directory, exist_ok=True)
+    logo = os.path.join(FIRMWARE_DIR, "astroAF_logo2.png")
+    if not os.path.exists(os.path.join(directory, "astroAF_logo2.png")):
+        shutil.copy(logo, directory)
+    with open(os.path.join(FIRMWARE_DIR, "setup.html"), "rb") as f:
+        page = f.read()
+    with open(os.path.join(directory, "setup.html"), "wb") as f:
+        f.write(page)
+    with open(os.path.join(directory, "setup.html.gz"), "wb") as f:
+        f.write(gzip.compress(page, 9, mtime=0))  # As deploy.sh does
+    version = os.path.join(directory, "version.json")
+    if not os.path.exists(version):
+        with open(version, "w") as f:
+            json.dump({"version": "host"}, f)
+
+
+def add_micropython_time():
+    """The time.ticks_*() functions the firmware uses, on CPython's time module"""
+    time.ticks_us = lambda: time.perf_counter_ns() // 1000
+    time.ticks_ms = lambda: time.perf_counter_ns() // 1000000
+    time.ticks_diff = lambda new, old: new - old
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile_path = os.path.abspath(args.profile) if args.profile else None
+    flash = os.path.abspath(args.dir) if args.dir else tempfile.mkdtemp(prefix="flataf-host-")
+    prepare_flash(flash)
+    os.chdir(flash)
+
+    sys.path[:0] = [HOST_DIR, FIRMWARE_DIR]
+    add_micropython_time()
+    import machine
+    machine.set_unique_id(args.unique_id)
+    import constants
+    constants.ALPACA_PORT = args.port
+    for item in args.constant:
+        name, value = item.split("=", 1)
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass                        # A string
+        setattr(constants, name, value)
+    import discovery_responder
+    discovery_responder.DISCOVERY_PORT = args.discovery_port
+
+    print(f"[HOST] Flash directory {flash}")
+    print(f"[HOST] Alpaca on port {args.port}, discovery on port {args.discovery_port}")
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+    signal.signal(signal.SIGTERM, stop)
+    if args.seconds:
+        signal.setitimer(signal.ITIMER_REAL, args.seconds)
+        signal.signal(signal.SIGALRM, stop)
+
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        import boot  # noqa: F401  Wi-Fi (stand-in) and the default brightness file
+        import main as firmware
+        firmware.main()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        sys.stdout = sys.__stdout__
+        print(f"[HOST] Stopped; PWM updates {machine.pwm_updates}, resets {machine.resets}")
+        if profiler:
+            print(f"[HOST] Profile written to {profile_path}")
+        if not args.dir:
+            os.chdir(HOST_DIR)
+            shutil.rmtree(flash, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
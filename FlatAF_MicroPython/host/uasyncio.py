@@ -0,0 +1,47 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF (MicroPython ESP32 Firmware)
+Purpose: Host-mode stand-in for uasyncio, mapped onto CPython asyncio
+Website: https://astroaf.space
+License: See LICENSE.md (CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+"""
+# Everything is CPython's asyncio except the stream writer, which gets the
+# uasyncio awrite()/aclose() the firmware calls. awrite() takes str as well
+# as bytes, as on the device.
+from asyncio import *  # noqa: F401,F403
+import asyncio as _asyncio
+
+
+class StreamWriter:
+    def __init__(self, writer):
+        self._writer = writer
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    async def awrite(self, buf, off=0, sz=-1):
+        if isinstance(buf, str):
+            buf = buf.encode("utf-8")
+        if off or sz != -1:
+            buf = buf[off:] if sz == -1 else buf[off:off + sz]
+        self._writer.write(buf)
+        await self._writer.drain()
+
+    async def aclose(self):
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+
+
+async def start_server(callback, host, port, backlog=5):
+    async def serve(reader, writer):
+        await callback(reader, StreamWriter(writer))
+    return await _asyncio.start_server(serve, host, port, backlog=backlog)
+
+
+async def open_connection(host, port):
+    reader, writer = await _asyncio.open_connection(host, port)
+    return reader, StreamWriter(writer)
@@ -0,0 +1,9 @@
+"""
+Author: Douglas Reynolds
+Project: FlatAF (MicroPython ESP32 Firmware)
+Purpose: Host-mode stand-in for ubinascii
+Website: https://astroaf.space
+License: See LICENSE.md (CC BY-NC 4.0)
+Copyright (c) 2025 Douglas Reynolds AstroAF
+"""
+from binascii import *  # noqa: F401,F403
@@ -9,17 +9,71 @@ Copyright (c) 2025 Douglas Reynolds AstroAF
 
 from machine import Pin, PWM # type: ignore
 import time
+import uasyncio as asyncio # type: ignore
 from brightness import load_brightness, save_brightness
+from constants import FADE_STEP_MS, FADE_DURATION_MS
+
+"""True if called from a uasyncio task (the firmware's event loop is running)."""
+def loop_running():
+    try:
+        return asyncio.current_task() is not None
+    except (RuntimeError, AttributeError):
+        return False
+
+"""
+One PWM channel, configured once and kept running.
+
+Off is a duty of 0 (65535 when active low) rather than deinit(), so a
+brightness change is a single duty_u16() write: no pin reconfiguration and
+no glitch at the output. A write of the duty already set is skipped. The
+time each write takes is measured with time.ticks_us().
+"""
+class PWMChannel:
+    def __init__(self, pin_number, freq, off_duty):
+        self.pwm = PWM(Pin(pin_number, Pin.OUT), freq=freq, duty_u16=off_duty)
+        self.duty = off_duty
+        self.writes = 0     # duty_u16() calls made
+        self.skipped = 0    # Writes of the duty already set
+        self.last_us = 0    # Time taken by the last write
+        self.max_us = 0
+        self.total_us = 0
+
+    """Set the duty (0-65535); returns False if it was already set."""
+    def write(self, duty):
+        if duty == self.duty:
+            self.skipped += 1
+            return False
+        start = time.ticks_us()
+        self.pwm.duty_u16(duty)
+        self.duty = duty
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        self.writes += 1
+        self.last_us = elapsed
+        self.total_us += elapsed
+        if elapsed > self.max_us:
+            self.max_us = elapsed
+        return True
+
+    """Write counts and latency, for the pwmstats route."""
+    def stats(self):
+        return {
+            "duty": self.duty,
+            "writes": self.writes,
+            "skipped": self.skipped,
+            "last_us": self.last_us,
+            "max_us": self.max_us,
+            "avg_us": self.total_us // self.writes if self.writes else 0
+        }
 
 """Class representing the FlatAF LED device."""
 class LED:
     DEFAULT_PWM_FREQ = 1000  # Default frequency in Hz
-    
+
     # Initialize the LED with optional PWM, resolution, and active low logic.
     #
     # Parameters:
     #     pin_number (int): The GPIO pin number used to control the LED.
-    #     pwm (bool): Enable PWM for brightness control (default is True).
+    #     pwm (bool): Set up the PWM channel now (default is True); otherwise on first use.
     #     resolution (int): Bit resolution for PWM duty cycle (default is 16).
     #     active_low (bool): If True, inverts LED logic (default is False).
     def __init__(self, pin_number, pwm=True, resolution=16, active_low=False):
@@ -29,51 +83,40 @@ class LED:
         self.pin_number = pin_number
         self.active_low = active_low
         self.brightness = 0
-        self.pwm_enabled = pwm
         self.resolution = resolution
         self.max_value = ((1 << resolution) - 1)  // 2
-        self.pin = Pin(pin_number, Pin.OUT)
-
+        self.off_duty = 65535 if active_low else 0
+        self.fade_task = None  # Task running a fade, None when the brightness is steady
+        self.channel = None
         if pwm:
-            self.pwm = PWM(Pin(pin_number))
-        else:
-            self.pwm = None
-                        
-    """Enable PWM on the configured pin."""
+            self.enable_pwm()
+
+    """Set up the PWM channel (once; it then stays configured)."""
     def enable_pwm(self):
-        self.pwm = PWM(self.pin)
-        self.pwm.freq(self.pwm_freq)
-        self.pwm_enabled = True
+        if self.channel is None:
+            self.channel = PWMChannel(self.pin_number, self.pwm_freq, self.off_duty)
+        return self.channel
 
-    """Set the LED brightness to a specified value within allowed range."""
+    """Set the LED brightness to a specified value within allowed range, stopping any fade."""
     def set_brightness(self, value):
-        print(f"[INFO] Set brightness to {value}")
+        self.cancel_fade()
+        self.apply_brightness(value)
+
+    """Drive the PWM duty for a brightness value (set_brightness without stopping a fade)."""
+    def apply_brightness(self, value):
         value = max(0, min(value, self.max_value))
         self.brightness = value
+        self.enable_pwm().write(self.duty_for(value))
 
+    """PWM duty for a brightness value."""
+    def duty_for(self, value):
         if value == 0:
-            # Turn off and disable PWM if brightness is 0
-            if self.pwm_enabled:
-                self.pwm.deinit()
-                self.pwm_enabled = False
-            self.pin.init(Pin.OUT)
-            self.pin.value(0 if self.active_low else 1)
-        else:
-            # If not already using PWM, enable it
-            if not self.pwm_enabled:
-                self.enable_pwm()
-            duty = self.max_value - value if self.active_low else value
-            print(f"[INFO] PWM enabled with duty {duty}")
-            self.pwm.duty_u16(duty)
+            return self.off_duty
+        return self.max_value - value if self.active_low else value
 
     """Return the current brightness level of the LED."""
     def get_brightness(self):
         return self.brightness
-    
-    """Reinitialize PWM on the assigned pin."""
-    def reinitialize_pwm(self):
-        self.pwm = PWM(Pin(self.pin_number))
-        self.pwm.freq(self.pwm_freq)
 
     """Toggle the LED on or off based on its current brightness."""
     def toggle(self):
@@ -81,18 +124,14 @@ class LED:
             self.led_off()
             print(f"[INFO] LED toggled OFF")
         else:
-            self.reinitialize_pwm()
             self.set_brightness(self.max_value)
             print(f"[INFO] LED toggled ON")
-    
+
     """Turn off the LED and save the current brightness."""
     def led_off(self):
         save_brightness(self.get_brightness())
         self.set_brightness(0)
-        self.pwm.deinit()
-        pin = Pin(self.pin_number, Pin.OUT)
-        pin.value(0)
-        
+
     """Turn on the LED with the last saved brightness."""
     def led_on(self):
         restored_brightness = load_brightness()
@@ -103,12 +142,50 @@ class LED:
     def get_status(self):
         return "ON" if self.brightness > 0 else "OFF"
 
-    """Fade the LED brightness smoothly to a target value."""
-    def fade_to(self, target_brightness, step=400, delay=0.01):
+    """Return True while a fade is in progress."""
+    def is_changing(self):
+        return self.fade_task is not None
+
+    """Stop a fade in progress, leaving the LED at the brightness reached."""
+    def cancel_fade(self):
+        if self.fade_task is not None:
+            self.fade_task.cancel()
+            self.fade_task = None
+
+    # Start fading to a target value and return at once; the fade runs as a
+    # uasyncio task, so the web server, discovery and button keep running.
+    # A fade in progress is retargeted: the new ramp starts from the
+    # brightness it had reached. Called with no event loop running (from the
+    # REPL), the fade runs to the end before returning, as it used to.
+    #
+    # Parameters:
+    #     target_brightness (int): Brightness to end at (clamped to the allowed range).
+    #     duration_ms (int): Length of the fade; 0 sets the brightness at once.
+    def fade_to(self, target_brightness, duration_ms=FADE_DURATION_MS):
         target_brightness = max(0, min(target_brightness, self.max_value))
-        current = self.brightness
-        direction = 1 if target_brightness > current else -1
-        for val in range(current, target_brightness, direction * step):
-            self.set_brightness(val)
-            time.sleep(delay)
-        self.set_brightness(target_brightness)
+        self.cancel_fade()
+        steps = int(duration_ms) // FADE_STEP_MS
+        if steps < 1 or target_brightness == self.brightness:
+            self.apply_brightness(target_brightness)
+            return
+        ramp = self.ramp(target_brightness, steps)
+        if not loop_running():
+            for value in ramp:
+                self.apply_brightness(value)
+                time.sleep(FADE_STEP_MS / 1000)
+            self.apply_brightness(target_brightness)
+            return
+        self.fade_task = asyncio.create_task(self.run_fade(ramp, target_brightness))
+
+    """Brightness at each step of a linear fade from the current brightness to a target."""
+    def ramp(self, target_brightness, steps):
+        start = self.brightness
+        return [start + (target_brightness - start) * i // steps for i in range(1, steps)]
+
+    """Write the ramp to the PWM duty, one value every FADE_STEP_MS, then settle on the target."""
+    async def run_fade(self, ramp, target_brightness):
+        for value in ramp:
+            self.apply_brightness(value)
+            await asyncio.sleep(FADE_STEP_MS / 1000)
+        self.apply_brightness(target_brightness)
+        self.fade_task = None
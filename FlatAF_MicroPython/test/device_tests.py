@@ -86,6 +86,15 @@ def test_toggle_on():
 def test_get_status():
     return run_test("ascom_api.get_device_status - Get Device Status", lambda: ascom_api.get_device_status())
 
+def test_get_device_state():
+    def check():
+        import ujson
+        state = ujson.loads(ascom_api.get_device_state(True))
+        print(f"[INFO] Device state returned: {state}")
+        if not state["success"] or state["brightness"] != ascom_api.led_device.get_brightness():
+            raise Exception("Device state does not match LED")
+    return run_test("ascom_api.get_device_state - Get Aggregated Device State", check)
+
 def test_get_max_brightness():
     return run_test("ascom_api.get_max_brightness - Get Max Brightness", lambda: ascom_api.get_max_brightness())
 
@@ -143,6 +152,7 @@ def run_all():
         test_toggle_off,
         test_toggle_on,
         test_get_status,
+        test_get_device_state,
         test_get_max_brightness,
         test_turn_calibrator_off,
         test_clamp_brightness_high,
@@ -0,0 +1,383 @@
+"""
+Host-Mode Test Suite for the FlatAF MicroPython Firmware
+
+Author: Doug Reynolds (AstroAF)
+Description:
+  Starts the unmodified firmware on this computer with host/run_host.py
+  and talks to it over HTTP and UDP the way the Alpaca driver does.
+  Checks the brightness API, the routing table, the flash files, the
+  gzip setup page and the streamed logo, background fades (and a fade
+  called from the REPL, with no event loop), PWM duty writes, the
+  discovery reply and that a Wi-Fi setup POST reaches machine.reset()
+  without stopping the emulator. Also checks that a
+  connection is kept alive between requests, that pipelined requests are
+  answered in order, and that the idle timeout and the per-connection
+  request cap close it.
+
+Run Instructions:
+  python host_tests.py
+"""
+
+import gzip
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+FIRMWARE_DIR = os.path.abspath(os.path.join(TEST_DIR, ".."))
+RUN_HOST = os.path.join(FIRMWARE_DIR, "host", "run_host.py")
+CHUNK_SIZE = 1024               # STATIC_CHUNK_SIZE
+IDLE_TIMEOUT = 1                # Seconds; KEEPALIVE_IDLE_TIMEOUT for the emulator
+MAX_REQUESTS = 3                # KEEPALIVE_MAX_REQUESTS for the emulator
+BRIGHTNESS = b"GET /api/v1/covercalibrator/0/brightness HTTP/1.1\r\nHost: flataf\r\n\r\n"
+
+
+def run_test(name, func):
+    try:
+        func()
+        print()
+        print(f"[TEST] {name}: *****PASS*****")
+        print()
+        return True
+    except Exception as e:
+        print()
+        print(f"[TEST] {name}: *****FAIL***** - {e}")
+        print()
+        return False
+
+
+def check(cond, msg):
+    if not cond:
+        raise Exception(msg)
+
+
+def free_port(kind):
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Firmware:
+    """run_host.py in a child process with its flash files in a temp dir"""
+
+    def __init__(self):
+        self.flash = tempfile.mkdtemp(prefix="flataf-host-test-")
+        self.port = free_port(socket.SOCK_STREAM)
+        self.discovery_port = free_port(socket.SOCK_DGRAM)
+        self.proc = subprocess.Popen(
+            [sys.executable, RUN_HOST, "--port", str(self.port), "--discovery-port", str(self.discovery_port),
+             "--unique-id", "a1b2c3d4e5f6", "--dir", self.flash, "--quiet",
+             "--constant", f"KEEPALIVE_IDLE_TIMEOUT={IDLE_TIMEOUT}",
+             "--constant", f"KEEPALIVE_MAX_REQUESTS={MAX_REQUESTS}"],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                self.request("GET", "/management/apiversions")
+                return
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise Exception("firmware did not start")
+
+    def request(self, method, path, body=None, content_type="application/json"):
+        data = json.dumps(body).encode() if isinstance(body, dict) else body
+        req = urllib.request.Request(f"http://127.0.0.1:{self.port}{path}", data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", content_type)
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, r.read()
+
+    def json(self, method, path, body=None):
+        return json.loads(self.request(method, path, body)[1])
+
+    def connect(self):
+        sock = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        return sock, sock.makefile("rb")
+
+    def stop(self):
+        self.proc.terminate()
+        output = self.proc.communicate(timeout=10)[0]
+        shutil.rmtree(self.flash, ignore_errors=True)
+        return output
+
+
+def read_response(f):
+    """(status line, headers, body) of one response, or None at end of connection"""
+    status = f.readline()
+    if not status:
+        return None
+    headers = {}
+    while True:
+        line = f.readline().decode().strip()
+        if not line:
+            break
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    return status.decode().strip(), headers, f.read(int(headers.get("content-length", 0)))
+
+
+def test_brightness_api(fw):
+    def body():
+        r = fw.json("PUT", "/api/v1/covercalibrator/0/setbrightness", {"Brightness": 300})
+        check(r.get("success"), f"setbrightness {r}")
+        r = fw.json("GET", "/api/v1/covercalibrator/0/brightness")
+        check(r.get("brightness") == 300, f"brightness {r}")
+        r = fw.json("GET", "/api/v1/covercalibrator/0/maxbrightness")
+        check(r, "no maxbrightness")
+        check(os.path.exists(os.path.join(fw.flash, "brightness.dat")), "boot.py did not create brightness.dat")
+        status, logo = fw.request("GET", "/astroAF_logo2.png")
+        check(status == 200 and logo.startswith(b"\x89PNG"), f"logo {status}")
+    return run_test("host - Firmware serves the brightness API from a scratch flash directory", body)
+
+
+def test_routes(fw):
+    def body():
+        check(fw.json("GET", "/api/v1/covercalibrator/0/driverinfo")["Value"] == "FlatAF CoverCalibrator", "driverinfo")
+        check(fw.json("GET", "/api/v1/covercalibrator/0/interfaceversion")["Value"] == 2, "interfaceversion")
+        check(fw.json("GET", "/management/apiversions")["Value"] == [1, 2], "apiversions")
+        check("version" in fw.json("GET", "/api/version"), "version")
+        check("Value" in fw.json("GET", "/api/v1/covercalibrator/0/connected?ClientID=1&ClientTransactionID=2"),
+              "query string not ignored")
+        check(fw.request("GET", "/")[1] == b"FlatAF is online and responding.", "index")
+        for method, path, expected in (("GET", "/nothing", 404), ("GET", "/api/v1/covercalibrator/0/toggle", 405),
+                                       ("DELETE", "/api/v1/covercalibrator/0/connected", 405)):
+            try:
+                fw.request(method, path)
+                check(False, f"{method} {path} answered")
+            except urllib.error.HTTPError as e:
+                check(e.code == expected, f"{method} {path}: {e.code}")
+    return run_test("host - Routes, query strings, constant bodies and 404/405", body)
+
+
+def test_static_files(fw):
+    def body():
+        with open(os.path.join(FIRMWARE_DIR, "setup.html"), "rb") as f:
+            page = f.read()
+        with open(os.path.join(FIRMWARE_DIR, "astroAF_logo2.png"), "rb") as f:
+            logo = f.read()
+        check(len(logo) > 4 * CHUNK_SIZE, "logo fits in one chunk")
+        for accept, expected in (("gzip, deflate", "gzip"), ("identity", None)):
+            sock, f = fw.connect()
+            try:
+                sock.sendall(b"GET /setup HTTP/1.1\r\nAccept-Encoding: " + accept.encode() + b"\r\n\r\n" +
+                             b"GET /astroAF_logo2.png HTTP/1.1\r\n\r\n")
+                status, headers, data = read_response(f)
+                check(headers.get("content-encoding") == expected, f"{accept}: encoding {headers}")
+                check((gzip.decompress(data) if expected else data) == page, f"{accept}: setup page differs")
+                check(len(data) < len(page) or not expected, "setup page not compressed")
+                status, headers, data = read_response(f)
+                check(data == logo and headers["content-type"] == "image/png", f"logo: {len(data)} bytes")
+            finally:
+                sock.close()
+    return run_test("host - Setup page served gzip-compressed and the logo streamed from flash", body)
+
+
+def test_fade(fw):
+    def body():
+        api = "/api/v1/covercalibrator/0/"
+        fw.json("PUT", api + "setbrightness", {"Brightness": 1000})
+        t0 = time.monotonic()
+        r = fw.json("PUT", api + "fadebrightness", {"Brightness": 21000, "Duration": 0.6})
+        check(r.get("success") and r.get("changing"), f"fadebrightness {r}")
+        check(time.monotonic() - t0 < 0.3, "fadebrightness waited for the fade")
+        time.sleep(0.2)
+        t1 = time.monotonic()
+        state = fw.json("GET", api + "state")
+        check(time.monotonic() - t1 < 0.2, "state request stalled by the fade")
+        check(state["changing"] and 1000 < state["brightness"] < 21000, f"mid-fade {state}")
+        time.sleep(0.7)
+        state = fw.json("GET", api + "state")
+        check(not state["changing"] and state["brightness"] == 21000, f"after the fade {state}")
+
+        fw.json("PUT", api + "fadebrightness", {"Brightness": 1000, "Duration": 2})
+        time.sleep(0.2)
+        fw.json("PUT", api + "fadebrightness", {"Brightness": 5000, "Duration": 0.2})     # Retarget
+        time.sleep(0.5)
+        state = fw.json("GET", api + "state")
+        check(not state["changing"] and state["brightness"] == 5000, f"after retargeting {state}")
+
+        fw.json("PUT", api + "fadebrightness", {"Brightness": 30000, "Duration": 1})
+        time.sleep(0.2)
+        fw.json("PUT", api + "setbrightness", {"Brightness": 200})     # Cancels the fade
+        time.sleep(0.2)
+        state = fw.json("GET", api + "state")
+        check(not state["changing"] and state["brightness"] == 200, f"after setbrightness {state}")
+    return run_test("host - Fades run in the background, can be retargeted and are cancelled by a set", body)
+
+
+def test_pwm_channel(fw):
+    def body():
+        api = "/api/v1/covercalibrator/0/"
+        fw.json("PUT", api + "setbrightness", {"Brightness": 700})
+        before = fw.json("GET", api + "pwmstats")
+        for value in (1500, 1500, 0, 0, 2500):
+            fw.json("PUT", api + "setbrightness", {"Brightness": value})
+        after = fw.json("GET", api + "pwmstats")
+        check(after["writes"] - before["writes"] == 3, f"duty writes {before} -> {after}")
+        check(after["skipped"] - before["skipped"] == 2, f"unchanged duty not skipped {before} -> {after}")
+        check(after["duty"] == 2500 and after["max_us"] >= after["avg_us"] >= 0, f"stats {after}")
+        fw.json("PUT", api + "calibratoroff")
+        check(fw.json("GET", api + "pwmstats")["duty"] == 0, "off is not duty 0")
+    return run_test("host - Brightness changes are one duty write, unchanged duty skipped", body)
+
+
+def test_discovery(fw):
+    def body():
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(2)
+            s.sendto(b"alpacadiscovery1", ("127.0.0.1", fw.discovery_port))
+            try:
+                s.recvfrom(1024)
+                check(False, "lower-case probe answered")
+            except socket.timeout:
+                pass
+            s.sendto(b"AlpacaDiscovery1", ("127.0.0.1", fw.discovery_port))
+            reply = json.loads(s.recvfrom(1024)[0])
+        check(reply["AlpacaPort"] == fw.port and reply["UniqueID"] == "a1b2c3d4e5f6", f"reply {reply}")
+    return run_test("host - Discovery reply carries the configured port and unique ID", body)
+
+
+def test_wifi_setup_reset(fw):
+    def body():
+        status, page = fw.request("POST", "/setup/wifi", b"ssid=Observatory&password=secret",
+                                  "application/x-www-form-urlencoded")
+        check(status == 200 and b"Observatory" in page, f"setup page {status}")
+        with open(os.path.join(fw.flash, "wifi_config.json")) as f:
+            check(json.load(f)["ssid"] == "Observatory", "wifi_config.json not written")
+        check(fw.json("GET", "/api/v1/covercalibrator/0/brightness").get("success"),
+              "emulator stopped by machine.reset()")
+    return run_test("host - Wi-Fi setup saves the config and machine.reset() keeps the host running", body)
+
+
+def test_keep_alive(fw):
+    def body():
+        sock, f = fw.connect()
+        try:
+            for i in range(MAX_REQUESTS):
+                sock.sendall(BRIGHTNESS)
+                status, headers, data = read_response(f)
+                check(status.endswith("200 OK") and json.loads(data).get("success"), f"request {i + 1}: {status}")
+                expected = "close" if i == MAX_REQUESTS - 1 else "keep-alive"
+                check(headers["connection"] == expected, f"request {i + 1}: Connection {headers['connection']}")
+            check(read_response(f) is None, f"still open after {MAX_REQUESTS} requests")
+        finally:
+            sock.close()
+    return run_test("host - One connection serves requests until the per-connection cap", body)
+
+
+def test_pipelining(fw):
+    def body():
+        sock, f = fw.connect()
+        try:
+            put = json.dumps({"Brightness": 123}).encode()
+            sock.sendall(b"PUT /api/v1/covercalibrator/0/setbrightness HTTP/1.1\r\n"
+                         b"Content-Type: application/json\r\n"
+                         b"Content-Length: " + str(len(put)).encode() + b"\r\n\r\n" + put + BRIGHTNESS)
+            first, second = read_response(f), read_response(f)
+            check(json.loads(first[2]).get("success"), f"setbrightness {first}")
+            check(json.loads(second[2]).get("brightness") == 123, f"brightness {second}")
+        finally:
+            sock.close()
+    return run_test("host - Pipelined requests answered in order on one connection", body)
+
+
+def test_connection_close(fw):
+    def body():
+        for request in (BRIGHTNESS.replace(b"\r\n\r\n", b"\r\nConnection: close\r\n\r\n"),
+                        BRIGHTNESS.replace(b"HTTP/1.1", b"HTTP/1.0")):
+            sock, f = fw.connect()
+            try:
+                sock.sendall(request)
+                status, headers, _ = read_response(f)
+                check(headers["connection"] == "close", f"{request.splitlines()[0]}: {headers['connection']}")
+                check(read_response(f) is None, "connection left open")
+            finally:
+                sock.close()
+    return run_test("host - Connection: close and HTTP/1.0 requests close the connection", body)
+
+
+def test_idle_timeout(fw):
+    def body():
+        sock, f = fw.connect()
+        try:
+            sock.sendall(BRIGHTNESS)
+            read_response(f)
+            t0 = time.monotonic()
+            check(read_response(f) is None, "unexpected response")
+            idle = time.monotonic() - t0
+            check(IDLE_TIMEOUT * 0.5 < idle < IDLE_TIMEOUT + 2, f"closed after {idle:.1f} s idle")
+        finally:
+            sock.close()
+    return run_test("host - Idle connection closed after KEEPALIVE_IDLE_TIMEOUT", body)
+
+
+REPL_FADE = """
+import json, os, sys, time
+sys.path[:0] = [{host!r}, {firmware!r}]
+import run_host
+run_host.prepare_flash({flash!r})
+os.chdir({flash!r})
+run_host.add_micropython_time()
+import ascom_api
+t0 = time.monotonic()
+reply = json.loads(ascom_api.fade_to_brightness(20000))
+print(json.dumps(dict(reply, led=ascom_api.led_device.get_brightness(), seconds=time.monotonic() - t0)))
+"""
+
+
+def test_repl_fade():
+    def body():
+        flash = tempfile.mkdtemp(prefix="flataf-host-test-")
+        try:
+            script = REPL_FADE.format(host=os.path.dirname(RUN_HOST), firmware=FIRMWARE_DIR, flash=flash)
+            out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=30)
+        finally:
+            shutil.rmtree(flash, ignore_errors=True)
+        check(out.returncode == 0, out.stderr.strip())
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        check(r["success"] and not r["changing"], f"fade_to_brightness {r}")
+        check(r["led"] == 20000 and r["brightness"] == 20000, f"LED at {r['led']} after the fade")
+        check(r["seconds"] > 0.5, f"returned after {r['seconds']:.2f} s, before the fade ran")
+    return run_test("host - fade_to_brightness() from the REPL (no event loop) fades before returning", body)
+
+
+def run_all():
+    fw = Firmware()
+    try:
+        tests = [
+            test_brightness_api,
+            test_routes,
+            test_static_files,
+            test_fade,
+            test_pwm_channel,
+            test_discovery,
+            test_keep_alive,
+            test_pipelining,
+            test_connection_close,
+            test_idle_timeout,
+            test_wifi_setup_reset,
+        ]
+        results = [test(fw) for test in tests]
+    finally:
+        output = fw.stop()
+    resets = "resets 1" in output
+    results.append(run_test("host - machine.reset() counted on exit", lambda: check(resets, output.strip())))
+    results.append(test_repl_fade())
+    passed = sum(results)
+    total = len(results)
+    print(f"\n[TEST] === TEST SUMMARY: {passed} of {total} tests passed ===")
+    return all(results)
+
+
+if __name__ == "__main__":
+    success = run_all()
+    if not success:
+        sys.exit(1)